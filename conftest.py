@@ -32,6 +32,12 @@ def pytest_addoption(parser):
         action=RFAction,
         help="run all regression tests, this will take a while. Implies --regression",
     )
+    parser.addoption(
+        "--timing-benchmarks",
+        action="store_true",
+        default=False,
+        help="run the timing benchmarks, which print how long the code takes",
+    )
 
 
 @pytest.fixture(scope="session")
@@ -40,6 +46,12 @@ def regression_test(request):
         pytest.skip("Test requires --regression-full option to run.")
 
 
+@pytest.fixture(scope="session")
+def timing_benchmark(request):
+    if not request.config.getoption("--timing-benchmarks"):
+        pytest.skip("Benchmark requires --timing-benchmarks option to run.")
+
+
 @pytest.fixture(scope="session")
 def ccp4():
     """
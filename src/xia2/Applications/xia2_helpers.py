@@ -1,11 +1,12 @@
 from __future__ import annotations
 
-import glob
+import json
 import logging
 import os
 import shutil
 import uuid
 
+import xia2.Driver.timing
 from xia2.Driver.DriverFactory import DriverFactory
 from xia2.lib.bits import auto_logfiler
 from xia2.Wrappers.XIA.Integrate import Integrate as XIA2Integrate
@@ -13,13 +14,16 @@ from xia2.Wrappers.XIA.Integrate import Integrate as XIA2Integrate
 logger = logging.getLogger("xia2.Applications.xia2_helpers")
 
 
-def process_one_sweep(args):
+def process_one_sweep(args, nproc=None):
+    """Process one sweep with xia2.integrate, using nproc processors if
+    given rather than args.nproc."""
     assert len(args) == 1
     args = args[0]
     # stop_after = args.stop_after
 
     command_line_args = args.command_line_args
-    nproc = args.nproc
+    if nproc is None:
+        nproc = args.nproc
     crystal_id = args.crystal_id
     wavelength_id = args.wavelength_id
     sweep_id = args.sweep_id
@@ -29,6 +33,9 @@ def process_one_sweep(args):
     default_driver_type = DriverFactory.get_driver_type()
     DriverFactory.set_driver_type(driver_type)
 
+    # this may be a pool process which has already run other sweeps
+    n_timing_records = len(xia2.Driver.timing.records())
+
     curdir = os.path.abspath(os.curdir)
 
     if "-xinfo" in command_line_args:
@@ -41,23 +48,25 @@ def process_one_sweep(args):
     # import tempfile
     # tmpdir = tempfile.mkdtemp(dir=curdir)
 
+    # xia2.integrate runs in a temporary directory, so that its log and
+    # xia2.json files do not collide with those of the other sweeps, but
+    # writes the sweep directory straight into the project directory
     tmpdir = os.path.join(curdir, str(uuid.uuid4()))
     os.makedirs(tmpdir)
     xia2_integrate.set_working_directory(tmpdir)
     xia2_integrate.add_command_line_args(args.command_line_args)
     xia2_integrate.set_phil_file(os.path.join(curdir, "xia2-working.phil"))
     xia2_integrate.add_command_line_args(["sweep.id=%s" % sweep_id])
+    xia2_integrate.set_project_directory(curdir)
     xia2_integrate.set_nproc(nproc)
     xia2_integrate.set_njob(1)
     xia2_integrate.set_mp_mode("serial")
     auto_logfiler(xia2_integrate)
 
-    sweep_tmp_dir = os.path.join(tmpdir, crystal_id, wavelength_id, sweep_id)
-    sweep_target_dir = os.path.join(curdir, crystal_id, wavelength_id, sweep_id)
-
     output = None
     success = False
     xsweep_dict = None
+    timing = []
 
     try:
         xia2_integrate.run()
@@ -68,38 +77,127 @@ def process_one_sweep(args):
         if not failover:
             raise
     finally:
-        from xia2.Schema.XProject import XProject
+        from xia2.Schema.XProject import dict_from_json
 
         xia2_json = os.path.join(tmpdir, "xia2.json")
-        json_files = glob.glob(os.path.join(sweep_tmp_dir, "*", "*.json"))
-        json_files.extend(glob.glob(os.path.join(sweep_tmp_dir, "*", "*.expt")))
-        if os.path.exists(xia2_json):
-            json_files.append(xia2_json)
 
-        import fileinput
-
-        for line in fileinput.FileInput(files=json_files, inplace=1):
-            line = line.replace(sweep_tmp_dir, sweep_target_dir)
-            print(line)
+        # pass back the timing records of xia2.integrate and the steps it ran
+        timing = xia2.Driver.timing.records()[n_timing_records:]
+        timing_json = os.path.join(tmpdir, "xia2-timing.json")
+        if os.path.exists(timing_json):
+            with open(timing_json) as fh:
+                timing.extend(json.load(fh)["steps"])
 
+        # the paths in the sweep state are already those in the project
+        # directory, so keep it there as xia2-<sweep>.json and pass the
+        # sweep back just as it was written
         if os.path.exists(xia2_json):
-            new_json = os.path.join(curdir, "xia2-%s.json" % sweep_id)
-
-            shutil.copyfile(xia2_json, new_json)
-
-        move_output_folder(sweep_tmp_dir, sweep_target_dir)
+            shutil.copyfile(xia2_json, os.path.join(curdir, "xia2-%s.json" % sweep_id))
 
         if success:
-            xinfo = XProject.from_json(new_json)
-            xcryst = list(xinfo.get_crystals().values())[0]
-            xsweep = xcryst.get_xwavelength(wavelength_id).get_sweeps()[0]
-            xsweep_dict = xsweep.to_dict()
+            xinfo = dict_from_json(xia2_json)
+            xcryst = find_by_name(xinfo["_crystals"], crystal_id)
+            xsweep_dict = find_by_name(xcryst["_wavelengths"], wavelength_id)[
+                "_sweeps"
+            ][0]
 
         shutil.rmtree(tmpdir, ignore_errors=True)
         if os.path.exists(tmpdir):
             shutil.rmtree(tmpdir, ignore_errors=True)
         DriverFactory.set_driver_type(default_driver_type)
-        return success, output, xsweep_dict
+        return success, output, xsweep_dict, timing
+
+
+# the project being processed by a sweep worker process, inherited from the
+# xia2 process which forked it (see init_sweep_worker)
+_worker_project = None
+
+
+class _SweepLogHandler(logging.Handler):
+    """Keep the log messages of the sweep being processed, to pass back to
+    the parent xia2 process in place of the output of xia2.integrate."""
+
+    def __init__(self):
+        super().__init__(level=logging.INFO)
+        self.setFormatter(logging.Formatter("%(message)s"))
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record) + "\n")
+
+
+_sweep_log = _SweepLogHandler()
+
+
+def init_sweep_worker(xinfo):
+    """Set up a worker process forked from xia2, which holds the project
+    xinfo and so the parsed parameters and the imagesets of all of the
+    sweeps, to run process_sweep_in_worker."""
+    global _worker_project
+    _worker_project = xinfo
+
+    # the log files belong to the parent process, which logs the output of
+    # each sweep once it has been processed
+    for name in ("xia2", "dials", "dxtbx"):
+        log = logging.getLogger(name)
+        for handler in list(log.handlers):
+            log.removeHandler(handler)
+    logging.getLogger("xia2").addHandler(_sweep_log)
+
+
+def process_sweep_in_worker(args, nproc=None):
+    """Process one sweep within a worker process set up by init_sweep_worker,
+    rather than in a new xia2.integrate, returning the same as
+    process_one_sweep."""
+    assert len(args) == 1
+    args = args[0]
+    if nproc is None:
+        nproc = args.nproc
+
+    from xia2.Handlers.Phil import PhilIndex
+
+    # the worker processes one sweep at a time on its share of the cores
+    PhilIndex.update(
+        "xia2.settings.multiprocessing.mode=serial\n"
+        "xia2.settings.multiprocessing.njob=1\n"
+        "xia2.settings.multiprocessing.nproc=%d" % nproc
+    )
+
+    n_timing_records = len(xia2.Driver.timing.records())
+    _sweep_log.lines = []
+
+    wavelength = _worker_project.get_crystals()[args.crystal_id].get_xwavelength(
+        args.wavelength_id
+    )
+    (sweep,) = [s for s in wavelength.get_sweeps() if s.get_name() == args.sweep_id]
+
+    success = False
+    xsweep_dict = None
+    try:
+        if args.stop_after == "index":
+            sweep.get_indexer_cell()
+        else:
+            sweep.get_integrater_intensities()
+        sweep.serialize()
+        xsweep_dict = sweep.get_processing_state()
+        success = True
+    except Exception as e:
+        logger.warning("Processing sweep %s failed: %s", args.sweep_id, str(e))
+        if not args.failover:
+            raise
+
+    timing = xia2.Driver.timing.records()[n_timing_records:]
+    return success, "".join(_sweep_log.lines), xsweep_dict, timing
+
+
+def find_by_name(objects, name):
+    """The dictionary representation of the crystal or wavelength called name
+    in objects, as read from xia2.json: they are looked up by name, since
+    their keys are read back as numbers if they look like numbers."""
+    for obj in objects.values():
+        if obj["_name"] == name:
+            return obj
+    raise RuntimeError("%s not found in %s" % (name, ", ".join(map(str, objects))))
 
 
 def get_sweep_output_only(all_output):
@@ -113,14 +211,3 @@ def get_sweep_output_only(all_output):
         elif line.startswith("Command line: "):
             in_sweep = True
     return "".join(sweep_lines)
-
-
-def move_output_folder(sweep_tmp_dir, sweep_target_dir):
-    """Move contents of xia2 sweep processing folder from sweep_tmp_dir to
-    sweep_target_dir, while also updating any absolute path in any xia2.json
-    file.
-    """
-    if os.path.exists(sweep_target_dir):
-        shutil.rmtree(sweep_target_dir)
-    # print "Moving %s to %s" %(sweep_tmp_dir, sweep_target_dir)
-    shutil.move(sweep_tmp_dir, sweep_target_dir)
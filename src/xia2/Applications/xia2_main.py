@@ -10,11 +10,10 @@ import os
 import platform
 import sys
 
-import h5py
-
 from dials.util import Sorry
 
 from xia2.cli import extra_help_lines
+from xia2.Experts.HDF5Files import inspect_hdf5_files
 from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Environment import df
 from xia2.XIA2Version import Version
@@ -77,13 +76,9 @@ def check_hdf5_master_files(master_files):
 
     bad = []
 
-    for filename in master_files:
-        try:
-            with h5py.File(filename, "r") as f:
-                if b"/data" in f and b"/entry" not in f:
-                    bad.append(filename)
-        except OSError:
-            bad.append(filename)
+    for info in inspect_hdf5_files(master_files):
+        if not info.is_master:
+            bad.append(info.filename)
 
     if bad:
 
@@ -105,8 +100,73 @@ def check_hdf5_master_files(master_files):
         sys.exit(message)
 
 
+def watch_images():
+    """Wait for the images given on the command line to be collected, finding
+    the spots on each wedge of images as soon as it has landed, for the DIALS
+    indexer to use once the sweep is complete."""
+
+    from xia2.Experts.WatchImages import ImageWatcher
+    from xia2.Handlers.CommandLine import CommandLine
+    from xia2.Handlers.Phil import PhilIndex
+    from xia2.Schema import imageset_cache, load_imagesets
+
+    params = PhilIndex.params.xia2.settings.watch
+    wedge = params.wedge
+    if wedge and PhilIndex.params.xia2.settings.indexer != "dials":
+        logger.debug("Not finding spots while watching: DIALS is not the indexer")
+        wedge = 0
+    if wedge and PhilIndex.params.dials.fast_mode:
+        logger.debug("Not finding spots while watching: fast_mode")
+        wedge = 0
+
+    indexer = None
+    if wedge:
+        from xia2.Modules.Indexer.DialsIndexer import DialsIndexer
+
+        working_directory = os.path.join(os.getcwd(), "watch")
+        os.makedirs(working_directory, exist_ok=True)
+        indexer = DialsIndexer()
+        indexer.set_working_directory(working_directory)
+
+    for full_template in CommandLine.get_template():
+        directory, template = os.path.split(full_template)
+        watcher = ImageWatcher(
+            template,
+            directory,
+            interval=params.interval,
+            quiet_period=params.quiet_period,
+            timeout=params.timeout,
+        )
+
+        start_ends = CommandLine.get_start_ends(full_template)
+        expected = max(end for start, end in start_ends) if start_ends else None
+
+        if indexer is None:
+            first, last = watcher.wait_for_completion(expected=expected)
+        else:
+            wedges = []
+            for first, last in watcher.wedges(wedge, expected=expected):
+                logger.info(
+                    "Finding spots on images %d to %d of %s", first, last, full_template
+                )
+                imageset = load_imagesets(
+                    template, directory, image_range=(first, last), use_cache=False
+                )[0]
+                refl = indexer.find_spots_in_wedge(
+                    imageset, "%s_%d_%d" % (template.split("#")[0], first, last)
+                )
+                logger.info("Found %d spots", refl.size())
+                wedges.append((first, last))
+            first, last = wedges[0][0], wedges[-1][1]
+        logger.info("Images %d to %d of %s collected", first, last, full_template)
+
+        # the imagesets read while the images were landing are incomplete
+        imageset_cache.pop(full_template, None)
+
+
 def get_command_line():
     from xia2.Handlers.CommandLine import CommandLine
+    from xia2.Handlers.Phil import PhilIndex
 
     CommandLine.print_command_line()
 
@@ -138,6 +198,9 @@ def get_command_line():
 
         check_hdf5_master_files(CommandLine.get_hdf5_master_files())
 
+        if PhilIndex.params.xia2.settings.watch.enabled:
+            watch_images()
+
         if CommandLine.get_template() or CommandLine.get_hdf5_master_files():
             write_xinfo(
                 xinfo,
@@ -5,18 +5,18 @@
 
 from __future__ import annotations
 
-import collections
+import concurrent.futures
 import logging
 import os
 import sys
+import time
 import traceback
 
-import h5py
-
 from libtbx import easy_mp
 
 from xia2.Applications.xia2setup_helpers import get_sweep
-from xia2.Experts.FindImages import image2template_directory
+from xia2.Experts.FindImages import image2template, image2template_directory
+from xia2.Experts.HDF5Files import inspect_hdf5, inspect_hdf5_files
 from xia2.Handlers.CommandLine import CommandLine
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Schema import imageset_cache
@@ -48,6 +48,8 @@ for c in compression:
         if ext:
             known_image_extensions.append(ext)
 
+_known_image_extensions = tuple(known_image_extensions)
+
 xds_file_names = [
     "ABS",
     "ABSORP",
@@ -76,46 +78,43 @@ target_template = None
 
 
 def is_sequence_name(file):
-    if os.path.isfile(file):
-        if file.split(".")[-1] in known_sequence_extensions:
-            return True
+    return os.path.isfile(file) and _is_sequence_file_name(file)
+
 
-    return False
+def _is_sequence_file_name(file):
+    return file.split(".")[-1] in known_sequence_extensions
 
 
 def is_image_name(filename):
-    if os.path.isfile(filename):
+    return os.path.isfile(filename) and _is_image_file_name(filename)
 
-        if os.path.split(filename)[-1] in XDSFiles:
-            return False
 
-        for xds_file in "ABSORP", "DECAY", "MODPIX":
-            if os.path.join("scale", xds_file) in filename:
-                return False
+def _is_image_file_name(filename):
+    """Whether filename looks like an image, judged by the name alone."""
+
+    if os.path.split(filename)[-1] in XDSFiles:
+        return False
 
-        for exten in known_image_extensions:
-            if filename.endswith(exten):
-                return True
+    for xds_file in "ABSORP", "DECAY", "MODPIX":
+        if os.path.join("scale", xds_file) in filename:
+            return False
 
-        end = filename.split(".")[-1]
-        try:
-            if ".log." not in filename and len(end) > 1:
-                return True
-        except Exception:
-            pass
+    if filename.endswith(_known_image_extensions):
+        return True
 
-        if is_hdf5_name(filename):
-            return True
+    end = filename.split(".")[-1]
+    if ".log." not in filename and len(end) > 1:
+        return True
 
-    return False
+    return _is_hdf5_file_name(filename)
 
 
 def is_hdf5_name(filename):
-    if os.path.isfile(filename):
-        if os.path.splitext(filename)[-1] in known_hdf5_extensions:
-            return True
+    return os.path.isfile(filename) and _is_hdf5_file_name(filename)
 
-    return False
+
+def _is_hdf5_file_name(filename):
+    return os.path.splitext(filename)[-1] in known_hdf5_extensions
 
 
 def is_xds_file(f):
@@ -189,50 +188,52 @@ def parse_sequence(sequence_file):
     latest_sequence = sequence
 
 
-def visit(directory, files):
+def visit(directory, files, known_files=False):
+    """Find the sweep templates (or HDF5 files) among the files in directory.
+    If known_files, all of the names are known to be files, e.g. from
+    os.scandir, so they are classified by name without a stat of each."""
     files.sort()
 
     templates = set()
 
+    # the directory part of the templates is the same for all of the files
+    abs_directory = os.path.abspath(directory)
+
     for f in files:
         full_path = os.path.join(directory, f)
 
-        if is_hdf5_name(full_path):
-            from dxtbx.format import Registry
+        if not known_files and not os.path.isfile(full_path):
+            continue
 
-            format_class = Registry.get_format_class_for_file(full_path)
-            if format_class is None:
+        if _is_hdf5_file_name(full_path):
+            info = inspect_hdf5(full_path)
+            if info.format_class is None:
                 logger.debug(
                     "Ignoring %s (Registry can not find format class)" % full_path
                 )
                 continue
-            elif format_class.is_abstract():
+            elif info.format_is_abstract:
                 continue
             templates.add(full_path)
 
-        elif is_image_name(full_path):
+        elif _is_image_file_name(full_path):
             try:
-                template = get_template(full_path)
+                template = os.path.join(abs_directory, image2template(f))
             except Exception as e:
                 logger.debug("Exception B: %s" % str(e))
-                logger.debug(traceback.format_exc())
                 continue
-            if template is not None:
-                templates.add(template)
+            if target_template and template not in target_template:
+                continue
+            templates.add(template)
 
-        elif is_sequence_name(full_path):
+        elif _is_sequence_file_name(full_path):
             parse_sequence(full_path)
 
     return templates
 
 
 def _linked_hdf5_data_files(h5_file):
-    data_path = "/entry/data"
-    with h5py.File(h5_file) as f:
-        filenames = [
-            f[data_path][k].file.filename for k in f[data_path] if k.startswith("data_")
-        ]
-    return frozenset(filenames)
+    return inspect_hdf5(h5_file).data_files
 
 
 def _filter_aliased_hdf5_sweeps(sweeps: list[str]) -> set[str]:
@@ -609,27 +610,82 @@ def _get_sweeps(templates):
         if sweeplist is not None:
             known_sweeps[template] = sweeplist
             for sweep in sweeplist:
-                imageset = sweep.get_imageset()
-                if template not in imageset_cache:
-                    imageset_cache[template] = collections.OrderedDict()
-                imageset_cache[template][
-                    imageset.get_scan().get_image_range()[0]
-                ] = imageset
+                imageset_cache.add_imageset(template, sweep.get_imageset())
     return known_sweeps
 
 
+def _scan_directory(path):
+    """List the files and subdirectories in path, following symbolic links,
+    returning them with the real path of the directory."""
+    files = []
+    subdirectories = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir():
+                        subdirectories.append(entry.path)
+                    elif entry.is_file():
+                        files.append(entry.name)
+                except OSError:
+                    continue
+    except OSError as e:
+        logger.debug("Could not read %s: %s" % (path, e))
+    return os.path.realpath(path), files, sorted(subdirectories)
+
+
+def _crawl(directories):
+    """Find the files in and below directories, listing all of the
+    directories at each depth concurrently. Returns (directory, files) for
+    each directory, in the same order whatever the timing of the listings,
+    with each real directory only included once."""
+    start = time.time()
+    found = []
+    visited = set()
+    paths = list(directories)
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        while paths:
+            next_paths = []
+            for path, (realpath, files, subdirectories) in zip(
+                paths, executor.map(_scan_directory, paths)
+            ):
+                if realpath in visited:
+                    # safety-check to avoid recursively symbolic links
+                    continue
+                visited.add(realpath)
+                found.append((path, files))
+                next_paths.extend(subdirectories)
+            paths = next_paths
+
+    elapsed = time.time() - start
+    n_files = sum(len(files) for _, files in found)
+    logger.debug(
+        "Found %d files in %d directories in %.1fs (%.0f files/s)"
+        % (n_files, len(found), elapsed, n_files / max(elapsed, 1e-6))
+    )
+    return found
+
+
 def _rummage(directories):
     """Walk through the directories looking for sweeps."""
+    found = _crawl(directories)
+
+    # read all of the HDF5 files at once, in parallel, before they are
+    # needed by visit and _filter_aliased_hdf5_sweeps
+    nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
+    inspect_hdf5_files(
+        [
+            os.path.join(root, f)
+            for root, files in found
+            for f in files
+            if _is_hdf5_file_name(f)
+        ],
+        nproc=nproc if isinstance(nproc, int) else 1,
+    )
+
     templates = set()
-    visited = set()
-    for path in directories:
-        for root, dirs, files in os.walk(path, followlinks=True):
-            realpath = os.path.realpath(root)
-            if realpath in visited:
-                # safety-check to avoid recursively symbolic links
-                continue
-            visited.add(realpath)
-            templates.update(visit(root, files))
+    for root, files in found:
+        templates.update(visit(root, files, known_files=True))
 
     return _get_sweeps(templates)
 
@@ -39,6 +39,10 @@ def CCP4DecoratorFactory(DriverInstance):
             # somewhere to store the loggraph output
             self._loggraph = {}
 
+            # the output is searched for errors, status and loggraphs so
+            # keep it in memory rather than reading back the log file
+            self.set_keep_all_output()
+
             # put the CCP4 library directory at the start of the
             # LD_LIBRARY_PATH in case it mashes CCP4 programs...
             if "CLIB" in os.environ and os.name == "posix":
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import queue
+import threading
+import time
+
+from xia2.Driver.DefaultDriver import DefaultDriver
+
+
+class _EventLoopThread:
+    """A single asyncio event loop, running in a daemon thread, which does
+    the process I/O for every AsyncDriver instance."""
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def run(self, coroutine):
+        """Run coroutine on the shared loop and wait for the result."""
+
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=self._loop.run_forever, name="xia2-async-driver", daemon=True
+                ).start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+
+_event_loop = _EventLoopThread()
+
+
+class AsyncDriver(DefaultDriver):
+    """Run programs as asyncio subprocesses, with the standard output read
+    continuously by the shared event loop rather than by the calling thread,
+    so that many jobs may run at once (see JobScheduler)."""
+
+    def __init__(self):
+        super().__init__()
+
+        self._process = None
+        self._process_status = None
+        self._output_queue = None
+        self._output_done = False
+
+    def start(self):
+        if self._executable is None:
+            raise RuntimeError("no executable is set.")
+
+        # as for the SimpleDriver, quote the tokens and let the shell parse
+        # the command line
+        command_line = self._executable
+        for c in self._command_line:
+            command_line += " '%s'" % c
+
+        self._output_queue = queue.Queue()
+        self._output_done = False
+        self._process_status = None
+        self._runtime_log["process start"] = time.time()
+        self._process = _event_loop.run(self._start(command_line))
+
+    async def _start(self, command_line):
+        process = await asyncio.create_subprocess_shell(
+            command_line,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            cwd=self._working_directory,
+            env=self._get_environment(),
+            limit=2**24,
+        )
+        asyncio.ensure_future(self._read_output(process, self._output_queue))
+        return process
+
+    @staticmethod
+    async def _read_output(process, output_queue):
+        while True:
+            record = await process.stdout.readline()
+            if not record:
+                break
+            output_queue.put(
+                record.decode("utf-8", errors="replace").replace("\r\n", "\n")
+            )
+        output_queue.put("")
+
+    async def _write(self, record):
+        self._process.stdin.write(record.encode("utf-8"))
+        await self._process.stdin.drain()
+
+    async def _close_stdin(self):
+        self._process.stdin.close()
+        try:
+            await self._process.stdin.wait_closed()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def check(self):
+        return self._process is not None and self._process.returncode is None
+
+    def _input(self, record):
+        if not self.check():
+            raise RuntimeError("child process has terminated")
+
+        _event_loop.run(self._write(record))
+
+    def _output(self):
+        if self._output_done:
+            return ""
+        record = self._output_queue.get()
+        if not record:
+            self._output_done = True
+        return record
+
+    def _status(self):
+        if self._process_status is not None:
+            return self._process_status
+
+        if self._process:
+            return self._process.returncode
+
+        return 0
+
+    def close(self):
+        if self._process is None:
+            raise RuntimeError("child process has not been started")
+
+        _event_loop.run(self._close_stdin())
+
+    def cleanup(self):
+        if self._process is not None:
+            self._process_status = _event_loop.run(self._process.wait())
+        self._process = None
+
+    def kill(self):
+        if self._process is not None and self._process.returncode is None:
+            if os.name == "nt":
+                self._process.terminate()
+            else:
+                self._process.kill()
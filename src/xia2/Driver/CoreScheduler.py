@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import concurrent.futures
+import heapq
+import logging
+import time
+
+logger = logging.getLogger("xia2.Driver.CoreScheduler")
+
+
+def allocate_cores(cores, costs):
+    """Share cores between jobs of the given costs, each getting at least
+    one: every spare core goes to the job with the most work per core, which
+    minimises the time for the slowest of the jobs to finish if the run time
+    is proportional to cost / cores. len(costs) must not exceed cores."""
+
+    allocation = [1] * len(costs)
+    if not costs:
+        return allocation
+    heap = [(-cost, j) for j, cost in enumerate(costs)]
+    heapq.heapify(heap)
+    for _ in range(cores - len(costs)):
+        _, j = heapq.heappop(heap)
+        allocation[j] += 1
+        heapq.heappush(heap, (-costs[j] / allocation[j], j))
+    return allocation
+
+
+class CoreScheduler:
+    """Run independent jobs of known relative cost, e.g. the processing of
+    sweeps of different numbers of images, on a fixed number of cores.
+
+    The most expensive jobs are started first. Whenever cores are free, the
+    next jobs are started and the free cores shared between them in
+    proportion to their cost (see allocate_cores), so the cores freed by
+    jobs which finish early are backfilled with the remaining work. Jobs
+    are called as function(*args, nproc=cores). As a running job cannot be
+    given more cores, any freed once all of the jobs have started stay idle.
+
+    Usage:
+
+    scheduler = CoreScheduler(total_cores=16, max_jobs=4)
+    for sweep in sweeps:
+        scheduler.submit(cost, process_sweep, sweep)
+    results = scheduler.run(executor)
+    logger.info(scheduler.summary())"""
+
+    def __init__(self, total_cores, max_jobs=None):
+        self._total_cores = total_cores
+        self._max_jobs = min(max_jobs or total_cores, total_cores)
+        self._jobs = []
+
+        # (cores, start, end) of each job once it has run
+        self._runs = []
+
+    def submit(self, cost, function, *args):
+        """Add a job which takes a time proportional to cost on one core."""
+
+        self._jobs.append((max(cost, 1), len(self._jobs), function, args))
+
+    def __len__(self):
+        return len(self._jobs)
+
+    def _by_cost(self):
+        return sorted(self._jobs, key=lambda job: (-job[0], job[1]))
+
+    def _next_jobs(self, pending, free_cores, running):
+        """Take the jobs to start now from pending (sorted by decreasing
+        cost), returning them with the cores to give to each."""
+
+        n = min(len(pending), free_cores, self._max_jobs - running)
+        if n <= 0:
+            return []
+        jobs = pending[:n]
+        del pending[:n]
+        return list(zip(jobs, allocate_cores(free_cores, [job[0] for job in jobs])))
+
+    def plan(self):
+        """Return the time the jobs should take, in units of cost on one
+        core assuming that each job scales perfectly with its cores, and
+        the fraction of the cores which would be in use over that time."""
+
+        pending = self._by_cost()
+        free_cores = self._total_cores
+        running = []
+        now = 0.0
+        while pending or running:
+            for job, cores in self._next_jobs(pending, free_cores, len(running)):
+                heapq.heappush(running, (now + job[0] / cores, job[1], cores))
+                free_cores -= cores
+            now, _, cores = heapq.heappop(running)
+            free_cores += cores
+
+        if not now:
+            return 0.0, 0.0
+        return now, sum(job[0] for job in self._jobs) / (self._total_cores * now)
+
+    def run(self, executor, callback=None):
+        """Run the jobs using executor (a concurrent.futures.Executor with
+        at least max_jobs workers), returning their results in the order
+        they were submitted. If given, callback(index, result) is called in
+        this thread as each job finishes. If any job fails no more are
+        started, and the first exception is raised once the running jobs
+        have finished."""
+
+        pending = self._by_cost()
+        results = [None] * len(self._jobs)
+        self._runs = []
+        free_cores = self._total_cores
+        running = {}
+        failure = None
+
+        while running or (pending and failure is None):
+            if failure is None:
+                for job, cores in self._next_jobs(pending, free_cores, len(running)):
+                    cost, index, function, args = job
+                    logger.debug("Starting job %d on %d cores", index + 1, cores)
+                    future = executor.submit(function, *args, nproc=cores)
+                    running[future] = (index, cores, time.time())
+                    free_cores -= cores
+
+            done, _ = concurrent.futures.wait(
+                running, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                index, cores, start = running.pop(future)
+                self._runs.append((cores, start, time.time()))
+                free_cores += cores
+                try:
+                    results[index] = future.result()
+                    if callback:
+                        callback(index, results[index])
+                except Exception as e:
+                    if failure is None:
+                        failure = e
+
+        if failure is not None:
+            raise failure
+        return results
+
+    def utilisation(self):
+        """The fraction of the cores which were allocated to jobs between
+        the first job starting and the last finishing."""
+
+        if not self._runs:
+            return 0.0
+        elapsed = max(r[2] for r in self._runs) - min(r[1] for r in self._runs)
+        if elapsed <= 0:
+            return 0.0
+        used = sum(cores * (end - start) for cores, start, end in self._runs)
+        return used / (self._total_cores * elapsed)
+
+    def summary(self):
+        """A line comparing the planned and achieved core utilisation."""
+
+        _, planned = self.plan()
+        return (
+            "Core utilisation for %d jobs on %d cores: %.0f%% planned, %.0f%%"
+            " achieved"
+            % (
+                len(self._jobs),
+                self._total_cores,
+                100 * planned,
+                100 * self.utilisation(),
+            )
+        )
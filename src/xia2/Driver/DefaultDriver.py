@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import collections
+import copy
 import logging
 import os
+import re
 import signal
 import time
 
@@ -22,6 +25,19 @@ from xia2.DriverExceptions.NotAvailableError import NotAvailableError
 
 logger = logging.getLogger("xia2.Driver.DefaultDriver")
 
+# the number of records of standard output kept in memory when the output
+# is being streamed to a log file: enough for the error checks and for the
+# debug output in close_wait()
+_output_tail_length = 50
+
+# anything which one of the single record checks in check_for_error_text
+# could match, so that each record need only be scanned once as it arrives
+_error_record_pattern = re.compile(
+    "dyld: Library not loaded|is not recognized as an internal|command not found"
+    "|error while loading shared libraries|Segmentation fault|Floating Exception"
+    "|Killed|Aborted|Abort trap"
+)
+
 
 class DefaultDriver:
     """A class to run other programs, specifically from the CCP4 suite
@@ -47,13 +63,25 @@ class DefaultDriver:
         # usually small
         self._standard_input_records = []
 
-        # this will be bigger but that is ok...
+        # once a log file is set, the standard output is streamed to it and
+        # only the tail (and any records which look like errors) are kept
+        # in memory, unless set_keep_all_output() has been called
         self._standard_output_records = []
+        self._standard_output_tail = collections.deque(maxlen=_output_tail_length)
+        self._error_records = collections.deque(maxlen=_output_tail_length)
+        self._output_record_count = 0
+        self._keep_all_output = False
+        self._log_file_characters = 0
+        self._log_file_flush_time = 0.0
 
         # optional - possibly useful if using a batch submission
         # system or wanting to describe better what the job is doing
         self._input_files = []
 
+        # the files the job reads and writes, if declared by the wrapper -
+        # jobs with declared output files may be cached, see ResultCache
+        self._output_files = []
+
         self._scratch_directories = []
 
         self._log_file = None
@@ -75,6 +103,14 @@ class DefaultDriver:
 
         self._runtime_log = {"object initialization": time.time()}
 
+        # resources used by the child process, if the implementation can
+        # find these out - see xia2.Driver.timing.resource_usage
+        self._resource_usage = None
+
+        # how long the job took when it was run, if the results came from
+        # the result cache
+        self._cached_runtime = None
+
     def __del__(self):
         # the destructor - close the log file etc.
 
@@ -93,6 +129,12 @@ class DefaultDriver:
     def set_cpu_threads(self, cpu_threads):
         self._cpu_threads = cpu_threads
 
+    def set_keep_all_output(self, keep_all_output=True):
+        """Keep all of the standard output in memory, not just in the log
+        file - for wrappers which look through the output many times."""
+
+        self._keep_all_output = keep_all_output
+
     def _check_executable(self, executable):
         """Pass this on to executable_exists."""
 
@@ -126,6 +168,36 @@ class DefaultDriver:
             self._working_environment[name] = []
         self._working_environment[name].append(value)
 
+    def _get_environment(self):
+        """Merge the working environment for this job into a copy of
+        os.environ."""
+
+        environment = copy.deepcopy(os.environ)
+
+        for name in self._working_environment:
+            added = self._working_environment[name][0]
+            for value in self._working_environment[name][1:]:
+                added += f"{os.pathsep}{value}"
+
+            if name in environment and name not in self._working_environment_exclusive:
+                environment[name] = f"{added}{os.pathsep}{environment[name]}"
+            else:
+                environment[name] = added
+
+        return environment
+
+    def set_input_files(self, input_files):
+        """Declare the files read by the job."""
+
+        self._input_files = list(input_files)
+
+    def set_output_files(self, output_files):
+        """Declare the files written by the job, which allows the job to
+        be cached if a result cache is in use: the input files which matter
+        must then be declared too, as only these are hashed."""
+
+        self._output_files = list(output_files)
+
     def add_scratch_directory(self, directory):
         """Add a scratch directory."""
 
@@ -189,12 +261,17 @@ class DefaultDriver:
 
         self._standard_input_records = []
         self._standard_output_records = []
+        self._standard_output_tail.clear()
+        self._error_records.clear()
+        self._output_record_count = 0
+        self._log_file_characters = 0
 
         self._command_line = []
 
         # optional - possibly useful if using a batch submission
         # system or wanting to describe better what the job is doing
         self._input_files = []
+        self._output_files = []
         self._scratch_directories = []
         if self._log_file is not None:
             self._log_file.flush()
@@ -222,14 +299,20 @@ class DefaultDriver:
         """Check records for error-like information."""
 
         for record in records:
-            error_library_not_loaded(record)
-            error_no_program(record)
-            error_missing_library(record)
-            error_segv(record)
-            error_kill(record)
-            error_abrt(record)
-            error_fp(record)
+            self._check_for_error_record(record)
+
+        self._check_for_python_traceback(records)
+
+    def _check_for_error_record(self, record):
+        error_library_not_loaded(record)
+        error_no_program(record)
+        error_missing_library(record)
+        error_segv(record)
+        error_kill(record)
+        error_abrt(record)
+        error_fp(record)
 
+    def _check_for_python_traceback(self, records):
         try:
             error_python_traceback(records)
         except Exception:
@@ -247,7 +330,16 @@ class DefaultDriver:
         # only look for errors in the last 30 lines of the standard
         # output - if something went wrong, it went wrong in there...
 
-        self.check_for_error_text(self._standard_output_records[-30:])
+        records = list(self._standard_output_tail)[-30:]
+        first = self._output_record_count - len(records)
+
+        # the records which could match a single record check were picked
+        # out by output() as they arrived
+        for index, record in self._error_records:
+            if index >= first:
+                self._check_for_error_record(record)
+        self._check_for_python_traceback(records)
+
         # next check the status
 
         self.check_return_code()
@@ -333,17 +425,24 @@ class DefaultDriver:
 
         record = self._output()
 
-        # copy record somehow
-        self._standard_output_records.append(record)
+        self._standard_output_tail.append(record)
+        if _error_record_pattern.search(record):
+            self._error_records.append((self._output_record_count, record))
+        self._output_record_count += 1
 
-        if self._log_file is not None:
-            self._log_file.write(record)
+        if self._keep_all_output or self._log_file is None or not record:
+            self._standard_output_records.append(record)
 
-            # FIXME 07/NOV/06 I have noticed that sometimes
-            # information is missed from the log files - perhaps
-            # flushing here will help??
+        if self._log_file is not None and record:
+            self._log_file.write(record)
+            self._log_file_characters += len(record)
 
-            self._log_file.flush()
+            # flush now and then rather than for every record, so the log
+            # file can still be followed while the program is running
+            now = time.time()
+            if now - self._log_file_flush_time > 1.0:
+                self._log_file.flush()
+                self._log_file_flush_time = now
 
         # presume if there is no output that the program has finished
         if not record:
@@ -360,17 +459,24 @@ class DefaultDriver:
 
     def write_log_file(self, filename):
 
+        records = self.get_all_output()
+
         if self._log_file:
             # close the existing log file
             self._log_file.close()
             self._log_file = None
 
-        # should have bufsize = 0 here... won't work on mac!
-
-        self._log_file = open(filename, "w", encoding="utf-8")
-        if self._standard_output_records:
-            for s in self._standard_output_records:
+        # no newline translation, so that the output can be read back
+        # exactly by get_all_output()
+        self._log_file = open(filename, "w", encoding="utf-8", newline="")
+        self._log_file_characters = 0
+        self._standard_output_records = []
+        for s in records:
+            if self._keep_all_output or not s:
+                self._standard_output_records.append(s)
+            if s:
                 self._log_file.write(s)
+                self._log_file_characters += len(s)
 
         self._log_file_name = self._log_file.name
 
@@ -383,9 +489,20 @@ class DefaultDriver:
         return ""
 
     def get_all_output(self):
-        """Return all of the output of the job."""
+        """Return all of the output of the job. Unless set_keep_all_output()
+        was called this is read back from the log file."""
 
-        return self._standard_output_records
+        if self._keep_all_output or not self._log_file_characters:
+            return self._standard_output_records
+
+        if self._log_file is not None:
+            self._log_file.flush()
+        with open(self._log_file_name, encoding="utf-8", newline="") as fh:
+            output = fh.read(self._log_file_characters).split("\n")
+        records = [record + "\n" for record in output[:-1]]
+        if output[-1]:
+            records.append(output[-1])
+        return records + self._standard_output_records
 
     def close(self):
         """Close the standard input channel."""
@@ -414,20 +531,20 @@ class DefaultDriver:
                 command_line += " '%s'" % c.replace(
                     self._working_directory + os.sep, ""
                 )
-            self._log_file.write("# command line:\n")
-            self._log_file.write("# %s\n" % command_line)
+            trailer = ["# command line:\n", "# %s\n" % command_line]
             if hasattr(self, "_runtime_log") and self._runtime_log:
-                self._log_file.write("#\n# timing information:\n")
+                trailer.append("#\n# timing information:\n")
                 for k in self._runtime_log:
-                    self._log_file.write(
+                    trailer.append(
                         "#   time since {name}: {time:.1f} seconds\n".format(
                             name=k, time=endtime - self._runtime_log[k]
                         )
                     )
+            for line in trailer:
+                self._log_file.write(line)
             self._log_file.close()
             self._log_file = None
-            with open(self._log_file_name, encoding="latin-1") as fh:
-                lines = fh.readlines()
+            lines = "".join(list(self._standard_output_tail) + trailer).splitlines()
             n = min(50, len(lines))
             logger.debug("Last %i lines of %s:", n, self._log_file_name)
             for line in lines[-n:]:
@@ -441,18 +558,27 @@ class DefaultDriver:
                     )
             else:
                 command_line = "(unknown)"
-        if self._runtime_log:
-            xia2.Driver.timing.record(
-                {
-                    "command": command_line.strip(),
-                    "time_end": endtime,
-                    "time_start": min(self._runtime_log.values()),
-                    "details": self._runtime_log,
-                }
-            )
-
         self.cleanup()
 
+        if self._runtime_log:
+            timing = {
+                "command": command_line.strip(),
+                "time_end": endtime,
+                "time_start": min(self._runtime_log.values()),
+                "details": self._runtime_log,
+            }
+            if self._resource_usage:
+                timing["resources"] = self._resource_usage
+            if self._cached_runtime is not None:
+                timing["cached"] = True
+                timing["cached_runtime"] = self._cached_runtime
+            xia2.Driver.timing.record(timing)
+
+    def get_resource_usage(self):
+        """Get the resources used by the finished child process, if known."""
+
+        return self._resource_usage
+
     def kill(self):
         """Kill the child process."""
 
@@ -2,21 +2,29 @@ from __future__ import annotations
 
 import os
 
+from xia2.Driver.AsyncDriver import AsyncDriver
 from xia2.Driver.InteractiveDriver import InteractiveDriver
+from xia2.Driver.QSubArrayDriver import QSubArrayDriver
 from xia2.Driver.QSubDriver import QSubDriver
+from xia2.Driver.ResultCache import CachedDriverFactory
 from xia2.Driver.ScriptDriver import ScriptDriver
 from xia2.Driver.SimpleDriver import SimpleDriver
+from xia2.Driver.WorkerDriver import WorkerDriver
 
 
 class _DriverFactory:
     def __init__(self):
         self._driver_type = "simple"
+        self._result_cache = None
 
         self._implemented_types = [
             "simple",
             "script",
             "interactive",
             "qsub",
+            "worker",
+            "async",
+            "qsub_array",
         ]
 
         # should probably write a message or something explaining
@@ -35,6 +43,14 @@ class _DriverFactory:
     def get_driver_type(self):
         return self._driver_type
 
+    def set_result_cache(self, result_cache):
+        """Look up the results of jobs in result_cache (a ResultCache, or
+        None to always run the jobs) before running them."""
+        self._result_cache = result_cache
+
+    def get_result_cache(self):
+        return self._result_cache
+
     def Driver(self, driver_type=None):
         """Create a new Driver instance, optionally providing the
         type of Driver we want."""
@@ -47,8 +63,13 @@ class _DriverFactory:
             "script": ScriptDriver,
             "interactive": InteractiveDriver,
             "qsub": QSubDriver,
+            "worker": WorkerDriver,
+            "async": AsyncDriver,
+            "qsub_array": QSubArrayDriver,
         }.get(driver_type)
         if driver_class:
+            if self._result_cache:
+                return CachedDriverFactory(driver_class(), self._result_cache)
             return driver_class()
 
         raise RuntimeError('Driver class "%s" unknown' % driver_type)
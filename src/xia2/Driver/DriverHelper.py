@@ -6,6 +6,8 @@ import signal
 import stat
 import string
 
+import xia2.Driver.timing
+
 
 def script_writer(
     working_directory,
@@ -136,6 +138,24 @@ def kill_process(process):
         os.kill(pid, signal.SIGKILL)
 
 
+def wait_for_process(process):
+    """Wait for a subprocess.Popen process to finish, returning the exit code
+    and the resources used by the process and its children (see
+    xia2.Driver.timing.resource_usage), or None if these are not known."""
+
+    if process.returncode is None and hasattr(os, "wait4"):
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            # already reaped elsewhere
+            pass
+        else:
+            process.returncode = os.waitstatus_to_exitcode(status)
+            return process.returncode, xia2.Driver.timing.resource_usage(rusage)
+
+    return process.wait(), None
+
+
 def error_library_not_loaded(record):
     """Look in a record (output from program) for signs that this died
     due to a missing library."""
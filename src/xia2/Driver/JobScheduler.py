@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import os
+import threading
+
+logger = logging.getLogger("xia2.Driver.JobScheduler")
+
+
+def default_max_jobs():
+    """The number of jobs to run at once, from multiprocessing.nproc."""
+
+    from xia2.Handlers.Phil import PhilIndex
+
+    nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
+    if isinstance(nproc, int) and nproc > 0:
+        return nproc
+    return os.cpu_count() or 1
+
+
+class _CpuBudget:
+    """Weighted counting semaphore: a job using n threads takes n slots."""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._capacity = None
+        self._in_use = 0
+
+    def set_capacity(self, capacity):
+        with self._condition:
+            self._capacity = capacity
+            self._condition.notify_all()
+
+    def acquire(self, n):
+        with self._condition:
+            if self._capacity is None:
+                self._capacity = default_max_jobs()
+            n = max(1, min(n, self._capacity))
+            while self._in_use + n > self._capacity:
+                self._condition.wait()
+            self._in_use += n
+            return n
+
+    def release(self, n):
+        with self._condition:
+            self._in_use -= n
+            self._condition.notify_all()
+
+
+# shared by every scheduler so that (say) an indexer and a scaler running
+# jobs at the same time cannot oversubscribe the machine between them
+CpuBudget = _CpuBudget()
+
+
+class JobScheduler:
+    """Run a number of independent jobs - typically the run() methods of
+    program wrappers - concurrently, limited by the number of processors
+    available to xia2. Jobs are run in threads, so any Driver type may be
+    used, though the AsyncDriver avoids a blocking read per job.
+
+    Usage:
+
+    scheduler = JobScheduler()
+    for hklin in hklins:
+        pointless = Pointless()
+        pointless.set_hklin(hklin)
+        scheduler.submit(pointless.decide_pointgroup)
+    results = scheduler.wait()
+
+    Jobs must not write to shared state: set up the wrappers before
+    submitting them and use the results afterwards, in order.
+
+    A job may also depend on jobs submitted before it, so that chains of
+    programs for different sweeps can be run at the same time:
+
+    spots = scheduler.submit(spotfinder.run, cpu_threads=nproc)
+    scheduler.submit(detectblanks.run, after=[spots])
+
+    starts detectblanks once spotfinder has finished, while the other jobs
+    continue to run."""
+
+    def __init__(self, max_jobs=None):
+        self._max_jobs = max_jobs
+        self._jobs = []
+
+    def submit(self, function, *args, cpu_threads=1, after=(), **kwargs):
+        """Add a job, to be run as function(*args, **kwargs) using up to
+        cpu_threads processors once the jobs after (the values returned by
+        submit() for them) have finished. Returns the job."""
+
+        job = len(self._jobs)
+        for earlier in after:
+            if not 0 <= earlier < job:
+                raise RuntimeError(
+                    "job %d can only follow jobs submitted before it" % job
+                )
+        self._jobs.append(
+            (functools.partial(function, *args, **kwargs), cpu_threads, tuple(after))
+        )
+        return job
+
+    def __len__(self):
+        return len(self._jobs)
+
+    async def wait_async(self):
+        """Run all of the submitted jobs, returning their results in the
+        order they were submitted. If any job fails, the first exception is
+        raised once all of the jobs have finished: the jobs which depend on
+        it are not run."""
+
+        jobs, self._jobs = self._jobs, []
+        if not jobs:
+            return []
+
+        max_jobs = self._max_jobs or default_max_jobs()
+        logger.debug("Running %d jobs, up to %d at a time", len(jobs), max_jobs)
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(max_jobs, len(jobs)), thread_name_prefix="xia2-job"
+        ) as executor:
+            tasks = []
+            for function, cpu_threads, after in jobs:
+                tasks.append(
+                    asyncio.ensure_future(
+                        self._run_after(
+                            [tasks[j] for j in after], executor, function, cpu_threads
+                        )
+                    )
+                )
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
+
+    def wait(self):
+        """Synchronous version of wait_async."""
+
+        return asyncio.run(self.wait_async())
+
+    @classmethod
+    async def _run_after(cls, tasks, executor, function, cpu_threads):
+        # a job whose dependency failed fails with the same exception
+        for task in tasks:
+            await task
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, cls._run_job, function, cpu_threads)
+
+    @staticmethod
+    def _run_job(function, cpu_threads):
+        n = CpuBudget.acquire(cpu_threads)
+        try:
+            return function()
+        finally:
+            CpuBudget.release(n)
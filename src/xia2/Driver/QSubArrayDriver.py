@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import logging
+import os
+import re
+import shlex
+import subprocess
+import threading
+import time
+
+from xia2.Driver.DriverHelper import generate_random_name, script_writer
+from xia2.Driver.QSubDriver import QSubDriver
+
+logger = logging.getLogger("xia2.Driver.QSubArrayDriver")
+
+default_submit_template = (
+    "{qsub} -V -cwd -o {directory} -e {directory} {resources} -t 1-{n_tasks} {script}"
+)
+default_status_template = "qstat -j {job_id}"
+default_resources_template = "-pe smp {cpu_threads}"
+# what SGE's qstat says about a job which has left the queue
+default_job_gone_pattern = "Following jobs do not exist"
+
+# each task of the array looks up its working directory and script in the
+# task list, runs it and then marks it as done by renaming the status file,
+# which is atomic, so the watcher never sees a half-written status
+_array_script = """#!/bin/bash
+TASK_ID=${SGE_TASK_ID:-${SLURM_ARRAY_TASK_ID:-${PBS_ARRAYID:-$1}}}
+IFS=$'\\t' read -r WORKING_DIRECTORY SCRIPT < <(sed -n "${TASK_ID}p" %(tasks)s)
+cd "$WORKING_DIRECTORY" || exit 1
+bash "$SCRIPT.sh" 2> "$SCRIPT.xerr"
+STATUS=$?
+if [ ! -f "$SCRIPT.xstatus" ]; then
+  echo "$STATUS" > "$SCRIPT.xstatus"
+fi
+mv "$SCRIPT.xstatus" "$SCRIPT.xdone"
+"""
+
+
+def get_array_templates():
+    from xia2.Handlers.Phil import PhilIndex
+
+    mp_params = PhilIndex.get_python_object().xia2.settings.multiprocessing
+    return (
+        mp_params.qsub_command or "qsub",
+        mp_params.qsub_array_template or default_submit_template,
+        mp_params.qstat_template or default_status_template,
+        mp_params.qsub_array_resources or default_resources_template,
+        mp_params.qstat_job_gone or default_job_gone_pattern,
+    )
+
+
+class _ArrayTask:
+    def __init__(self, working_directory, script_name, cpu_threads):
+        self.working_directory = working_directory
+        self.script_name = script_name
+        self.cpu_threads = cpu_threads
+        self.done_file = os.path.join(working_directory, "%s.xdone" % script_name)
+        self.queued = time.time()
+        self.finished = threading.Event()
+        self.status = None
+        self.error = None
+        self.array = None
+
+
+class _ArraySubmitter:
+    """Collect the jobs queued by QSubArrayDriver instances, submit them in
+    batches as job arrays and use a single thread to watch for the status
+    files written by each task on completion, so the queue only needs to be
+    polled occasionally to find tasks which were lost."""
+
+    def __init__(self):
+        self.qsub = None
+        self.submit_template = None
+        self.status_template = None
+        self.resources_template = None
+        self.job_gone_pattern = None
+
+        # how long to wait for more jobs before submitting an array, how
+        # often to look for finished tasks and how often to ask the queue
+        self.batch_delay = 0.5
+        self.poll_interval = 1.0
+        self.queue_check_interval = 60.0
+
+        self._pending = []
+        self._running = []
+        self._arrays = {}
+        self._condition = threading.Condition()
+        self._watcher = None
+
+    _template_names = (
+        "qsub",
+        "submit_template",
+        "status_template",
+        "resources_template",
+        "job_gone_pattern",
+    )
+
+    def _templates(self):
+        """The templates set on the submitter, or else those given in the
+        parameters, in the order of get_array_templates()."""
+        templates = [getattr(self, name) for name in self._template_names]
+        if None in templates:
+            for name, template in zip(self._template_names, get_array_templates()):
+                if getattr(self, name) is None:
+                    setattr(self, name, template)
+        return tuple(getattr(self, name) for name in self._template_names)
+
+    def run(self, working_directory, script_name, cpu_threads=1):
+        """Queue the job script working_directory/script_name.sh for
+        submission and wait for it to finish: returns the exit status."""
+
+        task = _ArrayTask(working_directory, script_name, cpu_threads)
+        if os.path.exists(task.done_file):
+            os.remove(task.done_file)
+        with self._condition:
+            self._pending.append(task)
+            if self._watcher is None or not self._watcher.is_alive():
+                self._watcher = threading.Thread(
+                    target=self._watch, name="xia2-qsub-array", daemon=True
+                )
+                self._watcher.start()
+            self._condition.notify_all()
+
+        task.finished.wait()
+        if task.error:
+            raise RuntimeError(task.error)
+        return task.status
+
+    def _watch(self):
+        last_queue_check = time.time()
+        while True:
+            with self._condition:
+                if not self._pending and not self._running:
+                    self._watcher = None
+                    return
+                now = time.time()
+                batch = []
+                if self._pending and now - self._pending[0].queued >= self.batch_delay:
+                    batch, self._pending = self._pending, []
+                running = list(self._running)
+
+            if batch:
+                self._submit(batch)
+
+            for task in running:
+                if os.path.exists(task.done_file):
+                    self._finish(task)
+
+            if time.time() - last_queue_check >= self.queue_check_interval:
+                last_queue_check = time.time()
+                self._check_queue()
+
+            with self._condition:
+                self._condition.wait(
+                    self.batch_delay if self._pending else self.poll_interval
+                )
+
+    def _finish(self, task, error=None):
+        if error is None:
+            try:
+                with open(task.done_file) as fh:
+                    task.status = int(fh.read().strip() or 0)
+            except ValueError:
+                task.status = 0
+        task.error = error
+        with self._condition:
+            if task in self._running:
+                self._running.remove(task)
+        task.finished.set()
+
+    def _submit(self, tasks):
+        # tasks asking for different numbers of processors have to go in
+        # different arrays
+        by_threads = {}
+        for task in tasks:
+            by_threads.setdefault(task.cpu_threads, []).append(task)
+        for cpu_threads, group in by_threads.items():
+            try:
+                self._submit_array(group, cpu_threads)
+            except Exception as e:
+                for task in group:
+                    self._finish(task, error=str(e))
+
+    def _submit_array(self, tasks, cpu_threads):
+        qsub, submit_template, _, resources_template, _ = self._templates()
+        directory = os.path.join(tasks[0].working_directory, "jobs")
+        os.makedirs(directory, exist_ok=True)
+
+        name = "A%s" % generate_random_name()
+        task_list = os.path.join(directory, "%s.tasks" % name)
+        with open(task_list, "w") as fh:
+            for task in tasks:
+                fh.write(f"{task.working_directory}\t{task.script_name}\n")
+        script = os.path.join(directory, "%s.sh" % name)
+        with open(script, "w") as fh:
+            fh.write(_array_script % {"tasks": shlex.quote(task_list)})
+        os.chmod(script, 0o755)
+
+        resources = (
+            resources_template.format(cpu_threads=cpu_threads)
+            if cpu_threads > 1
+            else ""
+        )
+        command = submit_template.format(
+            qsub=qsub,
+            directory=shlex.quote(directory),
+            resources=resources,
+            n_tasks=len(tasks),
+            cpu_threads=cpu_threads,
+            script=shlex.quote(script),
+        )
+        logger.debug("Submitting %d jobs as array: %s", len(tasks), command)
+        result = subprocess.run(
+            shlex.split(command),
+            cwd=tasks[0].working_directory,
+            capture_output=True,
+            universal_newlines=True,
+        )
+        if "error opening" in result.stderr:
+            raise RuntimeError(result.stderr.strip())
+        job_id = re.search(r"(\d+)", result.stdout)
+        if result.returncode or not job_id:
+            raise RuntimeError(
+                "job array submission failed: %s"
+                % (result.stderr.strip() or result.stdout.strip())
+            )
+
+        job_id = job_id.group(1)
+        with self._condition:
+            self._arrays[job_id] = tasks
+            for task in tasks:
+                task.array = job_id
+                self._running.append(task)
+
+    def _check_queue(self):
+        """Ask the queue about each array with unfinished tasks: if it has
+        gone, any tasks which have still not reported were lost."""
+
+        _, _, status_template, _, job_gone_pattern = self._templates()
+        with self._condition:
+            arrays = {
+                job_id: [t for t in tasks if not t.finished.is_set()]
+                for job_id, tasks in self._arrays.items()
+            }
+        for job_id, tasks in arrays.items():
+            if not tasks:
+                with self._condition:
+                    del self._arrays[job_id]
+                continue
+            result = subprocess.run(
+                shlex.split(status_template.format(job_id=job_id)),
+                capture_output=True,
+                universal_newlines=True,
+            )
+            if not re.search(job_gone_pattern, result.stdout + result.stderr):
+                continue
+            # the last task may have finished since we looked
+            for task in tasks:
+                if os.path.exists(task.done_file):
+                    self._finish(task)
+                else:
+                    self._finish(
+                        task,
+                        error="job %s.%s left the queue without finishing"
+                        % (job_id, task.script_name),
+                    )
+
+
+ArraySubmitter = _ArraySubmitter()
+
+
+class QSubArrayDriver(QSubDriver):
+    """A QSubDriver which submits jobs as tasks of job arrays, so that
+    jobs started together (e.g. from a JobScheduler) are sent to the queue
+    in one submission, and which waits for each job to write a status file
+    rather than polling qstat."""
+
+    def close(self):
+        script_name = os.path.join("jobs", self._script_name)
+
+        os.makedirs(os.path.join(self._working_directory, "jobs"), exist_ok=True)
+
+        # copy in LD_LIBRARY_PATH - SGE squashes this
+        if (
+            "LD_LIBRARY_PATH" in os.environ
+            and "LD_LIBRARY_PATH" not in self._working_environment
+        ):
+            self._working_environment["LD_LIBRARY_PATH"] = os.environ[
+                "LD_LIBRARY_PATH"
+            ].split(os.pathsep)
+
+        script_writer(
+            self._working_directory,
+            script_name,
+            self._executable,
+            self._script_command_line,
+            self._working_environment,
+            self._script_standard_input,
+        )
+
+        self._script_status = ArraySubmitter.run(
+            self._working_directory, script_name, self._cpu_threads
+        )
+
+        error_file = os.path.join(self._working_directory, "%s.xerr" % script_name)
+        if os.path.exists(error_file):
+            with open(error_file) as fh:
+                self.check_sge_errors(fh.readlines())
+            os.remove(error_file)
+
+        # set this up for reading the "standard output" of the job.
+        self._output_file = open(
+            os.path.join(self._working_directory, "%s.xout" % script_name)
+        )
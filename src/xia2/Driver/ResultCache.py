@@ -0,0 +1,364 @@
+from __future__ import annotations
+
+import collections
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import xia2.Driver.DefaultDriver
+
+logger = logging.getLogger("xia2.Driver.ResultCache")
+
+# content hashes of input files, keyed on (path, size, mtime) so that large
+# files used by many jobs are only read once
+_file_hashes = {}
+_file_hashes_lock = threading.Lock()
+
+
+def file_hash(filename):
+    """The SHA-256 of the contents of filename."""
+
+    st = os.stat(filename)
+    identity = (os.path.realpath(filename), st.st_size, st.st_mtime_ns)
+    with _file_hashes_lock:
+        if identity in _file_hashes:
+            return _file_hashes[identity]
+
+    sha256 = hashlib.sha256()
+    with open(filename, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            sha256.update(block)
+
+    with _file_hashes_lock:
+        _file_hashes[identity] = sha256.hexdigest()
+    return _file_hashes[identity]
+
+
+# the versions of the Python packages providing programs, keyed on the
+# package name, since the version is needed for every job
+_package_versions = {}
+_package_versions_lock = threading.Lock()
+
+
+def package_version(executable):
+    """The version of the Python package named by the first part of the name
+    of the program, e.g. dials for dials.integrate, or None if there is no
+    such package."""
+
+    package = os.path.basename(executable).split(".")[0]
+    with _package_versions_lock:
+        if package in _package_versions:
+            return _package_versions[package]
+
+    try:
+        version = importlib.metadata.version(package)
+    except (importlib.metadata.PackageNotFoundError, ValueError):
+        version = None
+
+    with _package_versions_lock:
+        _package_versions[package] = version
+    return version
+
+
+def executable_identity(executable):
+    """Something which changes when the program is updated: the resolved
+    path, size and modification time of the executable, and the version of
+    the package which provides it, since the executable itself may be just
+    a launcher which is not changed when the package is."""
+
+    version = package_version(executable)
+    executable = os.path.realpath(executable)
+    st = os.stat(executable)
+    return "%s:%d:%d:%s" % (executable, st.st_size, st.st_mtime_ns, version)
+
+
+class ResultCache:
+    """An on-disk cache of the results of running programs, keyed on the
+    program, the command line, the standard input and the contents of the
+    input files declared by the wrapper. Each entry holds the declared output
+    files and the standard output of the program. Once the cache is larger
+    than max_size bytes, the least recently used entries are removed.
+
+    Only the declared input files are hashed, so anything else a program
+    reads (e.g. the images behind an experiment list) is assumed not to
+    change while it is in the cache."""
+
+    def __init__(self, directory, max_size=10 * 1024**3):
+        self._directory = os.path.abspath(directory)
+        self._max_size = max_size
+        os.makedirs(self._directory, exist_ok=True)
+
+    def get_directory(self):
+        return self._directory
+
+    def key(
+        self,
+        executable,
+        command_line,
+        input_records,
+        input_files,
+        output_files,
+        working_directory="",
+    ):
+        """Compute the key for a job. The names of the input and output files
+        are replaced by the input file hashes and by placeholders, so that
+        the same job writing to differently numbered files has the same key.
+        Relative file names are relative to working_directory."""
+
+        input_hashes = [
+            file_hash(os.path.join(working_directory, filename))
+            for filename in input_files
+        ]
+        substitutions = [
+            (filename, "{input %s}" % input_hash)
+            for filename, input_hash in zip(input_files, input_hashes)
+        ]
+        substitutions += [
+            (filename, "{output %d}" % j) for j, filename in enumerate(output_files)
+        ]
+        substitutions.sort(key=lambda s: len(s[0]), reverse=True)
+
+        def normalise(token):
+            for filename, replacement in substitutions:
+                token = token.replace(filename, replacement)
+            return token
+
+        job = {
+            "executable": executable_identity(executable),
+            "command_line": [normalise(token) for token in command_line],
+            "input": [normalise(record) for record in input_records],
+            "input_files": input_hashes,
+            "output_files": len(output_files),
+        }
+        return hashlib.sha256(json.dumps(job, sort_keys=True).encode()).hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self._directory, key[:2], key)
+
+    def restore(self, key, output_files):
+        """Copy the output files of a cached job to output_files, returning
+        the standard output records and how long the job originally took,
+        or None if the job is not in the cache."""
+
+        entry = self._entry(key)
+        try:
+            with open(os.path.join(entry, "result.json")) as fh:
+                result = json.load(fh)
+            if result["output_files"] != len(output_files):
+                return None
+            for j, filename in enumerate(output_files):
+                directory = os.path.dirname(filename)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                shutil.copyfile(os.path.join(entry, str(j)), filename)
+            with open(os.path.join(entry, "output.log"), newline="\n") as fh:
+                records = list(fh)
+            # mark the entry as recently used
+            os.utime(os.path.join(entry, "result.json"))
+        except (OSError, ValueError, KeyError):
+            return None
+        return records, result["runtime"]
+
+    def store(self, key, output_files, records, runtime):
+        """Add the results of a job to the cache, then evict old entries if
+        the cache has grown too large."""
+
+        size = sum(os.path.getsize(filename) for filename in output_files)
+        if size > self._max_size:
+            logger.debug("Not caching %s: too large (%d bytes)", key, size)
+            return
+
+        entry = self._entry(key)
+        if os.path.exists(entry):
+            return
+
+        # build the entry in a temporary directory and rename it into place,
+        # so other processes sharing the cache never see half an entry
+        tmp = tempfile.mkdtemp(prefix=".tmp", dir=self._directory)
+        try:
+            for j, filename in enumerate(output_files):
+                shutil.copyfile(filename, os.path.join(tmp, str(j)))
+            with open(os.path.join(tmp, "output.log"), "w", newline="\n") as fh:
+                fh.writelines(records)
+            with open(os.path.join(tmp, "result.json"), "w") as fh:
+                json.dump(
+                    {
+                        "output_files": len(output_files),
+                        "runtime": runtime,
+                        "created": time.time(),
+                    },
+                    fh,
+                )
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            os.rename(tmp, entry)
+        except OSError:
+            # most likely another process stored the same job first
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def entries(self):
+        """Return (last used, size, path) for each entry in the cache."""
+
+        entries = []
+        for prefix in os.scandir(self._directory):
+            if prefix.name.startswith(".") or not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                try:
+                    last_used = os.stat(
+                        os.path.join(entry.path, "result.json")
+                    ).st_mtime
+                    size = sum(f.stat().st_size for f in os.scandir(entry.path))
+                except OSError:
+                    continue
+                entries.append((last_used, size, entry.path))
+        return entries
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is no
+        larger than max_size."""
+
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        while entries and total > self._max_size:
+            _, size, path = entries.pop(0)
+            logger.debug("Evicting %s from the result cache", path)
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def CachedDriverFactory(DriverInstance, cache):
+    """Create a Driver instance which looks up the results of the job in
+    cache before running it, based on the Driver instance which is passed
+    in, in the same way as the CCP4Decorator. Only jobs for which the
+    wrapper has declared output files are cached."""
+
+    DriverInstanceClass = DriverInstance.__class__
+
+    assert issubclass(DriverInstanceClass, xia2.Driver.DefaultDriver.DefaultDriver), (
+        "%s is not a Driver implementation" % DriverInstance
+    )
+
+    class CachedDriver(DriverInstanceClass):
+        _original_class = DriverInstanceClass
+        _result_cache = cache
+
+        def __init__(self):
+            self._original_class.__init__(self)
+
+            # standard input is held back until close() when the job may
+            # be cached, as it is part of the key
+            self._cache_deferred = False
+            self._cache_input = []
+            self._cache_key = None
+            self._cache_records = None
+
+        def start(self):
+            self._cache_key = None
+            self._cache_records = None
+            self._cached_runtime = None
+            if not self._output_files:
+                return self._original_class.start(self)
+
+            self._cache_deferred = True
+            self._cache_input = []
+            self._runtime_log["process start"] = time.time()
+
+        def check(self):
+            if self._cache_deferred or self._cache_records is not None:
+                return True
+            return self._original_class.check(self)
+
+        def _input(self, record):
+            if self._cache_deferred:
+                self._cache_input.append(record)
+                return
+            return self._original_class._input(self, record)
+
+        def close(self):
+            if not self._cache_deferred:
+                return self._original_class.close(self)
+            self._cache_deferred = False
+
+            try:
+                key = self._result_cache.key(
+                    self._executable,
+                    self._command_line,
+                    self._cache_input,
+                    self._input_files,
+                    self._output_files,
+                    self._working_directory,
+                )
+            except OSError as e:
+                logger.debug("Not using the result cache: %s", e)
+                key = None
+
+            result = None
+            if key is not None:
+                result = self._result_cache.restore(key, self._output_paths())
+            if result is not None:
+                logger.debug(
+                    "Using cached result for %s", os.path.basename(self._executable)
+                )
+                records, self._cached_runtime = result
+                self._cache_records = collections.deque(records)
+                return
+
+            self._cache_key = key
+            self._original_class.start(self)
+            for record in self._cache_input:
+                self._original_class._input(self, record)
+            self._original_class.close(self)
+
+        def _output_paths(self):
+            return [
+                os.path.join(self._working_directory, filename)
+                for filename in self._output_files
+            ]
+
+        def _output(self):
+            if self._cache_records is None:
+                return self._original_class._output(self)
+            if not self._cache_records:
+                return ""
+            return self._cache_records.popleft()
+
+        def _status(self):
+            if self._cached_runtime is not None:
+                return 0
+            return self._original_class._status(self)
+
+        def cleanup(self):
+            if self._cached_runtime is not None:
+                self._cache_records = None
+                return
+
+            self._original_class.cleanup(self)
+
+            key, self._cache_key = self._cache_key, None
+            if key is None or self.status():
+                return
+            output_paths = self._output_paths()
+            if not all(os.path.isfile(f) for f in output_paths):
+                return
+            records = [record for record in self.get_all_output() if record]
+            runtime = time.time() - self._runtime_log["process start"]
+            try:
+                self._result_cache.store(key, output_paths, records, runtime)
+            except OSError as e:
+                logger.debug("Could not store result in the cache: %s", e)
+
+        def kill(self):
+            if self._cache_deferred or self._cached_runtime is not None:
+                return
+            return self._original_class.kill(self)
+
+    return CachedDriver()
@@ -4,7 +4,7 @@ import os
 import subprocess
 
 from xia2.Driver.DefaultDriver import DefaultDriver
-from xia2.Driver.DriverHelper import script_writer
+from xia2.Driver.DriverHelper import script_writer, wait_for_process
 
 
 class ScriptDriver(DefaultDriver):
@@ -84,7 +84,7 @@ class ScriptDriver(DefaultDriver):
                 ["%s.bat" % self._script_name], cwd=self._working_directory, shell=True
             )
 
-        self._script_status = pipe.wait()
+        self._script_status, self._resource_usage = wait_for_process(pipe)
 
         # at this stage I should read the .xstatus file to determine if the
         # process has indeed finished - though it should have done...
@@ -1,12 +1,11 @@
 from __future__ import annotations
 
-import copy
 import os
 import subprocess
 import time
 
 from xia2.Driver.DefaultDriver import DefaultDriver
-from xia2.Driver.DriverHelper import kill_process
+from xia2.Driver.DriverHelper import kill_process, wait_for_process
 
 
 class SimpleDriver(DefaultDriver):
@@ -35,17 +34,7 @@ class SimpleDriver(DefaultDriver):
             for c in self._command_line:
                 command_line += " '%s'" % c
 
-        environment = copy.deepcopy(os.environ)
-
-        for name in self._working_environment:
-            added = self._working_environment[name][0]
-            for value in self._working_environment[name][1:]:
-                added += f"{os.pathsep}{value}"
-
-            if name in environment and name not in self._working_environment_exclusive:
-                environment[name] = f"{added}{os.pathsep}{environment[name]}"
-            else:
-                environment[name] = added
+        environment = self._get_environment()
 
         self._runtime_log["process start"] = time.time()
         self._popen = subprocess.Popen(
@@ -98,7 +87,7 @@ class SimpleDriver(DefaultDriver):
         self._popen.stdin.close()
 
     def cleanup(self):
-        self._popen_status = self._popen.poll()
+        self._popen_status, self._resource_usage = wait_for_process(self._popen)
         self._popen = None
 
     def kill(self):
@@ -0,0 +1,341 @@
+from __future__ import annotations
+
+import atexit
+import importlib
+import importlib.metadata
+import importlib.util
+import json
+import logging
+import os
+import runpy
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+from xia2.Driver.SimpleDriver import SimpleDriver
+from xia2.Driver.timing import resource_usage
+
+logger = logging.getLogger("xia2.Driver.WorkerDriver")
+
+# modules imported by each worker before it accepts any jobs - this is the
+# start-up cost which every dials.* subprocess would otherwise pay again
+_preload_modules = (
+    "libtbx.phil",
+    "cctbx.sgtbx",
+    "cctbx.uctbx",
+    "cctbx.miller",
+    "dxtbx.model.experiment_list",
+    "dials.array_family.flex",
+    "dials.util.log",
+    "dials.util.options",
+    "dials.util.version",
+)
+
+_worker_targets: dict[str, str | None] = {}
+
+
+def _console_scripts():
+    entry_points = importlib.metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        return entry_points.select(group="console_scripts")
+    return entry_points.get("console_scripts", [])
+
+
+def worker_target(executable):
+    """Work out what a worker should run in-process for this executable:
+    either "module:function" from the console_scripts entry points or a
+    module to run as __main__. Returns None if the program is not a DIALS
+    program which can be run in a worker."""
+
+    program = os.path.basename(executable)
+    if program in _worker_targets:
+        return _worker_targets[program]
+
+    target = None
+    if program.startswith("dials.") and os.name == "posix":
+        for entry_point in _console_scripts():
+            if entry_point.name == program:
+                target = entry_point.value
+                break
+        else:
+            module = "dials.command_line.%s" % program[len("dials.") :]
+            try:
+                if importlib.util.find_spec(module):
+                    target = module
+            except ImportError:
+                pass
+
+    _worker_targets[program] = target
+    return target
+
+
+class _Worker:
+    """A long-lived python process with the DIALS modules already imported,
+    which forks a child to run each job it is sent."""
+
+    def __init__(self):
+        self._popen = subprocess.Popen(
+            [sys.executable, "-m", "xia2.Driver.WorkerDriver"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            bufsize=1,
+        )
+
+    def alive(self):
+        return self._popen.poll() is None
+
+    def _reply(self):
+        reply = self._popen.stdout.readline()
+        if not reply:
+            raise RuntimeError("xia2 worker process %d died" % self._popen.pid)
+        return json.loads(reply)
+
+    def run(self, job, started=None):
+        """Send a job to the worker and wait for it to finish, returning the
+        exit code and resource usage. started is called with the pid of the
+        child process."""
+
+        self._popen.stdin.write(json.dumps(job) + "\n")
+        pid = self._reply()["pid"]
+        if started:
+            started(pid)
+        reply = self._reply()
+        return reply["status"], reply.get("resources")
+
+    def shutdown(self):
+        if self.alive():
+            self._popen.stdin.close()
+            try:
+                self._popen.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self._popen.kill()
+
+
+class _WorkerPool:
+    def __init__(self):
+        self._idle = []
+        self._lock = threading.Lock()
+        self._max_idle = os.cpu_count() or 1
+
+    def acquire(self):
+        with self._lock:
+            while self._idle:
+                worker = self._idle.pop()
+                if worker.alive():
+                    return worker
+        logger.debug("Starting new xia2 worker process")
+        return _Worker()
+
+    def release(self, worker):
+        with self._lock:
+            if worker.alive() and len(self._idle) < self._max_idle:
+                self._idle.append(worker)
+                return
+        worker.shutdown()
+
+    def shutdown(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.shutdown()
+
+
+WorkerPool = _WorkerPool()
+atexit.register(WorkerPool.shutdown)
+
+
+class WorkerDriver(SimpleDriver):
+    """Run DIALS programs in a pool of pre-imported worker processes rather
+    than starting a new python for every job. Anything which cannot be run
+    in a worker is run exactly as by the SimpleDriver."""
+
+    def __init__(self):
+        super().__init__()
+
+        self._worker_target = None
+        self._worker_input = []
+        self._worker_status = None
+        self._worker_pid = None
+
+        # this is written by the worker and read by output once the job
+        # has finished, as for the ScriptDriver
+        self._output_file = None
+        self._output_file_name = None
+
+    def start(self):
+        if self._executable is None:
+            raise RuntimeError("no executable is set.")
+
+        self._worker_target = worker_target(self._executable)
+        if self._worker_target is None:
+            return super().start()
+
+        self._worker_input = []
+        self._worker_status = None
+        self._runtime_log["process start"] = time.time()
+
+    def check(self):
+        if self._worker_target is None:
+            return super().check()
+        return True
+
+    def _input(self, record):
+        if self._worker_target is None:
+            return super()._input(record)
+        self._worker_input.append(record)
+
+    def _output(self):
+        if self._worker_target is None:
+            return super()._output()
+        if self._output_file is None:
+            return ""
+        return self._output_file.readline()
+
+    def _status(self):
+        if self._worker_target is None:
+            return super()._status()
+        return self._worker_status or 0
+
+    def close(self):
+        if self._worker_target is None:
+            return super().close()
+
+        fd, self._output_file_name = tempfile.mkstemp(
+            prefix="%s_" % self._name, suffix=".xout"
+        )
+        os.close(fd)
+
+        job = {
+            "target": self._worker_target,
+            "argv": [self._executable] + self._command_line,
+            "working_directory": self._working_directory,
+            "environment": dict(self._get_environment()),
+            "input": "".join(self._worker_input),
+            "output": self._output_file_name,
+        }
+
+        worker = WorkerPool.acquire()
+        try:
+            self._worker_status, self._resource_usage = worker.run(
+                job, started=self._set_worker_pid
+            )
+        finally:
+            self._worker_pid = None
+            WorkerPool.release(worker)
+
+        self._output_file = open(self._output_file_name, errors="replace")
+
+    def _set_worker_pid(self, pid):
+        self._worker_pid = pid
+
+    def cleanup(self):
+        if self._worker_target is None:
+            return super().cleanup()
+
+        if self._output_file is not None:
+            self._output_file.close()
+            self._output_file = None
+        if self._output_file_name and os.path.exists(self._output_file_name):
+            os.remove(self._output_file_name)
+        self._output_file_name = None
+
+    def kill(self):
+        if self._worker_target is None:
+            return super().kill()
+        if self._worker_pid:
+            os.kill(self._worker_pid, signal.SIGKILL)
+
+
+def _run_target(target, argv):
+    sys.argv = argv
+    if ":" in target:
+        module, function = target.split(":", 1)
+        result = importlib.import_module(module)
+        for attribute in function.split("."):
+            result = getattr(result, attribute)
+        return result()
+    runpy.run_module(target, run_name="__main__", alter_sys=True)
+
+
+def _run_job(job, channel):
+    """Fork a child to run the job with the standard output and error
+    redirected to the job output file; returns the exit code of the child
+    and the resources it used."""
+
+    pid = os.fork()
+    if pid:
+        channel.write(json.dumps({"pid": pid}) + "\n")
+        channel.flush()
+        _, status, rusage = os.wait4(pid, 0)
+        return os.waitstatus_to_exitcode(status), resource_usage(rusage)
+
+    code = 1
+    try:
+        os.setpgrp()
+        channel.close()
+        os.chdir(job["working_directory"])
+        os.environ.clear()
+        os.environ.update(job["environment"])
+
+        with tempfile.TemporaryFile() as stdin:
+            stdin.write(job["input"].encode("utf-8"))
+            stdin.seek(0)
+            os.dup2(stdin.fileno(), 0)
+        output = os.open(job["output"], os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+        os.dup2(output, 1)
+        os.dup2(output, 2)
+        os.close(output)
+        sys.stdin = open(0, closefd=False)
+        sys.stdout = open(1, "w", buffering=1, closefd=False)
+        sys.stderr = open(2, "w", buffering=1, closefd=False)
+
+        result = _run_target(job["target"], job["argv"])
+        code = result if isinstance(result, int) else 0
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def serve():
+    """Worker main loop: read one job per line from the standard input and
+    report the child pid and exit code for each on the standard output."""
+
+    # keep the original standard output to talk to the driver and send
+    # anything else which gets printed to the standard error
+    channel = os.fdopen(os.dup(1), "w")
+    os.dup2(2, 1)
+
+    for module in _preload_modules:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            pass
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        status, resources = _run_job(json.loads(line), channel)
+        channel.write(json.dumps({"status": status, "resources": resources}) + "\n")
+        channel.flush()
+
+
+if __name__ == "__main__":
+    serve()
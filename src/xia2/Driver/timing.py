@@ -1,10 +1,28 @@
 from __future__ import annotations
 
 import contextlib
+import json
+import os
+import sys
+import threading
 import time
 
+try:
+    import resource
+except ImportError:
+    resource = None
+
 _timing_db = []
 
+# keys added to the records by visualise_db, which are not worth saving
+_annotations = {
+    "index",
+    "index_readable",
+    "runtime",
+    "runtime_readable",
+    "short_command",
+}
+
 
 def record(timing_information):
     """
@@ -14,10 +32,67 @@ def record(timing_information):
        {"command": "command line string",
         "time_start": unix epoch timestamp,
         "time_end": unix epoch timestamp}
+       optionally with "resources" (see resource_usage) and the "pid" and
+       "thread" the step ran in, which default to the current ones. Steps
+       whose results came from the result cache have "cached": True and
+       the "cached_runtime" of the original run.
     """
+    timing_information.setdefault("pid", os.getpid())
+    timing_information.setdefault("thread", threading.get_ident())
     _timing_db.append(timing_information)
 
 
+def records():
+    """
+    :return: A copy of the list of all timing records
+    """
+    return list(_timing_db)
+
+
+def resource_usage(rusage):
+    """
+    Convert a resource.struct_rusage, as returned by os.wait4 or
+    resource.getrusage, to a dictionary of CPU times in seconds and peak
+    RSS and block I/O in bytes.
+    """
+    # ru_maxrss is in kilobytes, except on macOS where it is in bytes
+    maxrss_unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "cpu_user": rusage.ru_utime,
+        "cpu_system": rusage.ru_stime,
+        "max_rss": rusage.ru_maxrss * maxrss_unit,
+        "bytes_read": rusage.ru_inblock * 512,
+        "bytes_written": rusage.ru_oublock * 512,
+    }
+
+
+def _current_usage():
+    """Resources used so far by this thread (or process, where per-thread
+    accounting is not available) and by any children which have exited."""
+    if resource is None:
+        return None
+    who = getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF)
+    return (
+        resource_usage(resource.getrusage(who)),
+        resource_usage(resource.getrusage(resource.RUSAGE_CHILDREN)),
+    )
+
+
+def _usage_since(before):
+    """Resources used since _current_usage() returned before. Programs run
+    by other threads at the same time will also be counted as children."""
+    after = _current_usage()
+    if before is None or after is None:
+        return None
+    usage = {
+        key: sum(a[key] - b[key] for a, b in zip(after, before))
+        for key in after[0]
+        if key != "max_rss"
+    }
+    usage["max_rss"] = max(after[0]["max_rss"], after[1]["max_rss"])
+    return usage
+
+
 @contextlib.contextmanager
 def record_step(name):
     """
@@ -32,10 +107,14 @@ def record_step(name):
                  shortened to the first word.
     """
     timing = {"command": name, "time_start": time.time()}
+    usage = _current_usage()
     try:
         yield
     finally:
         timing["time_end"] = time.time()
+        resources = _usage_since(usage)
+        if resources:
+            timing["resources"] = resources
         record(timing)
 
 
@@ -56,6 +135,73 @@ def reset():
     _timing_db = []
 
 
+def _saved_record(t):
+    return {k: v for k, v in t.items() if k not in _annotations}
+
+
+def write_json(filename, timing_db=None):
+    """
+    Write the timing records, including resource usage where known, to a
+    JSON file.
+
+    :param timing_db: A list of timing records, defaults to all records
+    """
+    if timing_db is None:
+        timing_db = _timing_db
+    with open(filename, "w") as fh:
+        json.dump(
+            {"steps": [_saved_record(t) for t in timing_db]}, fh, indent=1, default=str
+        )
+
+
+def trace_events(timing_db):
+    """
+    Convert timing records to trace events in the Chrome trace event
+    format, which can be viewed with chrome://tracing or Perfetto. Each
+    process and thread which ran steps gets its own timeline.
+
+    :param timing_db: A list of timing records
+    :return: A dictionary in the JSON object trace format
+    """
+    events = []
+    if timing_db:
+        t0 = min(t["time_start"] for t in timing_db)
+    for t in sorted(timing_db, key=lambda t: t["time_start"]):
+        args = {"command": t["command"]}
+        args.update(t.get("resources") or {})
+        if t.get("cached"):
+            category = "cached"
+        elif "details" in t:
+            category = "program"
+        else:
+            category = "step"
+        events.append(
+            {
+                "name": t["command"].split(" ")[0],
+                "cat": category,
+                "ph": "X",
+                "ts": round((t["time_start"] - t0) * 1e6),
+                "dur": round((t["time_end"] - t["time_start"]) * 1e6),
+                "pid": t.get("pid", 0),
+                "tid": t.get("thread", 0),
+                "args": args,
+            }
+        )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_trace(filename, timing_db=None):
+    """
+    Write the timing records as a Chrome/Perfetto trace event file.
+
+    :param timing_db: A list of timing records, defaults to all records
+    """
+    if timing_db is None:
+        timing_db = _timing_db
+    with open(filename, "w") as fh:
+        json.dump(trace_events(timing_db), fh, default=str)
+
+
 def visualise_db(timing_db):
     """
     Visualises program execution in a flow diagram given a list of timestamps.
@@ -91,6 +237,8 @@ def visualise_db(timing_db):
             t["runtime_readable"] = "%.1fs" % t["runtime"]
         else:
             t["runtime_readable"] = "%.1fm" % (t["runtime"] / 60)
+        if t.get("cached"):
+            t["runtime_readable"] += ", cached"
 
     # highlight any significant unaccounted periods which either take more
     # than 0.5% of the total runtime or would be featured in the top 10
@@ -186,6 +334,13 @@ def visualise_db(timing_db):
                 )
 
     output.append("")
+    cached = [t for t in timing_db if t.get("cached")]
+    if cached:
+        output.append(
+            "%d results taken from the result cache, saving %.1fs"
+            % (len(cached), sum(t.get("cached_runtime", 0) for t in cached))
+        )
+        output.append("")
     output.append("Longest times:")
     timing_by_time = sorted(
         timing_db + thinking_breaks, key=lambda x: x["runtime"], reverse=True
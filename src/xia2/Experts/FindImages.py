@@ -8,11 +8,14 @@
 
 from __future__ import annotations
 
+import concurrent.futures
 import logging
 import math
 import os
 import re
 import string
+import threading
+import time
 
 logger = logging.getLogger("xia2.Experts.FindImages")
 
@@ -102,38 +105,70 @@ def image2template_directory(filename):
     return template, directory
 
 
-def find_matching_images(template, directory):
-    """Find images which match the input template in the directory
-    provided."""
+class _DirectoryIndex:
+    """An index of the files in each directory, from one listing of the
+    directory, with the image numbers matching each template found in it.
+    The listing is made again when the modification time of the directory
+    changes, i.e. when files are added, removed or renamed."""
 
-    files = os.listdir(directory)
+    def __init__(self):
+        # directory: (mtime, time listed, file names, {template: images})
+        self._directories = {}
+        self._lock = threading.Lock()
 
-    # to turn the template to a regular expression want to replace
-    # however many #'s with EXACTLY the same number of [0-9] tokens,
-    # e.g. ### -> ([0-9]{3})
+    def _entry(self, directory):
+        mtime = os.stat(directory).st_mtime_ns
+        with self._lock:
+            entry = self._directories.get(directory)
+        # a listing made within a second of a change may have missed files
+        # changed within the resolution of the timestamps
+        if entry and entry[0] == mtime and entry[1] - mtime / 1e9 > 1:
+            return entry
 
-    # change 30/may/2008 - now escape the template in this search to cope with
-    # file templates with special characters in them, such as "+" -
-    # fix to a problem reported by Joel B.
+        with os.scandir(directory) as entries:
+            names = sorted(entry.name for entry in entries)
+        entry = (mtime, time.time(), names, {})
+        with self._lock:
+            self._directories[directory] = entry
+        return entry
 
-    length = template.count("#")
-    regexp_text = re.escape(template).replace("\\#" * length, "([0-9]{%d})" % length)
-    regexp = re.compile(regexp_text)
+    def get_images(self, template, directory):
+        """Return the sorted image numbers of the files in directory which
+        match template."""
 
-    # FIXME there are faster ways of determining this - by generating the lists
-    # of possible images. That said, the code for this is now in dxtbx...
+        _, _, names, images = self._entry(directory)
+        if template not in images:
+            # to turn the template to a regular expression want to replace
+            # however many #'s with EXACTLY the same number of [0-9] tokens,
+            # e.g. ### -> ([0-9]{3})
 
-    images = []
+            # change 30/may/2008 - now escape the template in this search to
+            # cope with file templates with special characters in them, such
+            # as "+" - fix to a problem reported by Joel B.
 
-    for f in files:
-        match = regexp.match(f)
+            length = template.count("#")
+            regexp_text = re.escape(template).replace(
+                "\\#" * length, "([0-9]{%d})" % length
+            )
+            regexp = re.compile(regexp_text)
 
-        if match:
-            images.append(int(match.group(1)))
+            matches = (regexp.fullmatch(f) for f in names)
+            images[template] = sorted(int(m.group(1)) for m in matches if m)
+        return images[template]
 
-    images.sort()
+    def clear(self):
+        with self._lock:
+            self._directories = {}
 
-    return images
+
+directory_index = _DirectoryIndex()
+
+
+def find_matching_images(template, directory):
+    """Find images which match the input template in the directory
+    provided."""
+
+    return list(directory_index.get_images(template, directory))
 
 
 def template_directory_number2image(template, directory, number):
@@ -238,5 +273,54 @@ def digest_template(template, images):
     return template, images, offset
 
 
+def summarise_ranges(numbers):
+    """Describe a list of image numbers as ranges, e.g. "1-3, 7, 9-12"."""
+
+    ranges = []
+    for number in sorted(numbers):
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ", ".join(
+        "%d" % first if first == last else "%d-%d" % (first, last)
+        for first, last in ranges
+    )
+
+
+def sample_images(images, every=None):
+    """Choose the images to check: all of them, or if every is set then the
+    first, the last and every nth in between."""
+
+    if not every or every <= 1:
+        return list(images)
+    sample = list(images[::every])
+    if images and sample[-1] != images[-1]:
+        sample.append(images[-1])
+    return sample
+
+
+def _map(function, items, nproc):
+    if nproc > 1 and len(items) > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=nproc) as executor:
+            return list(executor.map(function, items))
+    return [function(item) for item in items]
+
+
+def find_unreadable_files(paths, nproc=1):
+    """Return those of paths which can not be read, checking nproc at a time
+    (which helps on network file systems, where each check waits for the
+    server)."""
+
+    readable = _map(lambda path: os.access(path, os.R_OK), paths, nproc)
+    return [path for path, ok in zip(paths, readable) if not ok]
+
+
+def file_mtimes(paths, nproc=1):
+    """Return the modification time of each of paths, nproc at a time."""
+
+    return _map(lambda path: float(os.stat(path).st_mtime), paths, nproc)
+
+
 if __name__ == "__main__":
     work_template_regex()
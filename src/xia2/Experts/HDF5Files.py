@@ -0,0 +1,152 @@
+# Everything xia2 needs to know about an HDF5 (or NeXus) file, read once.
+#
+# Setting up from HDF5 data needs to know for each file whether it is a
+# master file or a data file, its dxtbx format class, the data files it links
+# to (to spot several master files for the same data) and the Eiger trigger
+# parameters (to unroll multiple trigger data sets). inspect_hdf5 finds all of
+# these from one opening of the file and remembers them while the file is
+# unchanged.
+
+
+from __future__ import annotations
+
+import concurrent.futures
+import logging
+import os
+import threading
+
+import h5py
+
+logger = logging.getLogger("xia2.Experts.HDF5Files")
+
+
+class HDF5FileInfo:
+    """What was found in an HDF5 file:
+
+    is_master: the file is readable and does not look like an Eiger data file
+    n_images: the number of images in /entry/data/data, if known
+    data_files: the files linked from /entry/data/data_*, which identify
+        the data for master files which are aliases of each other
+    ntrigger, nimages: the Eiger detectorSpecific trigger parameters
+    format_class: the name of the dxtbx format class which understands the
+        file, or None if there is none
+    format_is_abstract: whether that format class is abstract"""
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.is_master = False
+        self.n_images = None
+        self.data_files = frozenset()
+        self.ntrigger = None
+        self.nimages = None
+        self.format_class = None
+        self.format_is_abstract = False
+
+    def __repr__(self):
+        return "<HDF5FileInfo %s: %s>" % (self.filename, self.format_class)
+
+
+def _data_files(filename, data):
+    """The files holding the data_* data sets of the group data, from the
+    external links where possible so that the data files are not opened."""
+
+    directory = os.path.dirname(os.path.abspath(filename))
+    data_files = set()
+    for k in data:
+        if not k.startswith("data_"):
+            continue
+        link = data.get(k, getlink=True)
+        if isinstance(link, h5py.ExternalLink):
+            data_files.add(os.path.normpath(os.path.join(directory, link.filename)))
+        else:
+            data_files.add(data[k].file.filename)
+    return frozenset(data_files)
+
+
+def _read(filename):
+    info = HDF5FileInfo(filename)
+
+    try:
+        with h5py.File(filename, "r") as f:
+            info.is_master = not ("/data" in f and "/entry" not in f)
+            if "/entry/data" in f:
+                data = f["/entry/data"]
+                info.data_files = _data_files(filename, data)
+                try:
+                    info.n_images = data["data"].shape[0]
+                except Exception:
+                    pass
+            detector_specific = "/entry/instrument/detector/detectorSpecific"
+            if detector_specific in f:
+                try:
+                    info.ntrigger = int(f[detector_specific + "/ntrigger"][()])
+                    info.nimages = int(f[detector_specific + "/nimages"][()])
+                except Exception:
+                    pass
+    except OSError as e:
+        logger.debug("Could not read %s: %s" % (filename, e))
+        return info
+
+    from dxtbx.format import Registry
+
+    format_class = Registry.get_format_class_for_file(filename)
+    if format_class is not None:
+        info.format_class = format_class.__name__
+        info.format_is_abstract = bool(format_class.is_abstract())
+    return info
+
+
+# the HDF5FileInfo for each file, keyed on (path, size, mtime)
+_inspected = {}
+_inspected_lock = threading.Lock()
+
+
+def _identity(filename):
+    try:
+        st = os.stat(filename)
+    except OSError:
+        return None
+    return os.path.realpath(filename), st.st_size, st.st_mtime_ns
+
+
+def inspect_hdf5(filename):
+    """Return the HDF5FileInfo for filename, opening the file only if it has
+    not been inspected since it last changed."""
+
+    filename = os.fspath(filename)
+    identity = _identity(filename)
+    if identity is None:
+        return HDF5FileInfo(filename)
+    with _inspected_lock:
+        if identity in _inspected:
+            return _inspected[identity]
+
+    info = _read(filename)
+    with _inspected_lock:
+        _inspected[identity] = info
+    return info
+
+
+def inspect_hdf5_files(filenames, nproc=1):
+    """Inspect all of the files, nproc at a time in separate processes,
+    returning their HDF5FileInfo in the same order."""
+
+    filenames = [os.fspath(f) for f in filenames]
+    identities = [_identity(f) for f in filenames]
+    with _inspected_lock:
+        todo = sorted(
+            {f for f, i in zip(filenames, identities) if i and i not in _inspected}
+        )
+
+    if len(todo) > 1 and nproc > 1:
+        with concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(nproc, len(todo))
+        ) as executor:
+            results = list(executor.map(_read, todo))
+        with _inspected_lock:
+            for info in results:
+                identity = _identity(info.filename)
+                if identity is not None:
+                    _inspected[identity] = info
+
+    return [inspect_hdf5(f) for f in filenames]
@@ -89,3 +89,33 @@ def SortLattices(lattice_list):
 
 def s2l(spacegroup):
     return spacegroup_to_lattice[spacegroup]
+
+
+def SameLattice(
+    lattice1, cell1, lattice2, cell2, relative_length_tolerance=0.01, angle_tolerance=1
+):
+    """Check whether cell1 in lattice1 and cell2 in lattice2 describe the
+    same lattice points, perhaps in different settings, by comparing their
+    reduced primitive cells. The lengths must agree to within the relative
+    tolerance and the angles to within angle_tolerance degrees."""
+
+    from cctbx import crystal, sgtbx
+
+    reduced = [
+        crystal.symmetry(
+            unit_cell=cell,
+            space_group_info=sgtbx.space_group_info(
+                number=lattice_to_spacegroup[lattice]
+            ),
+        )
+        .primitive_setting()
+        .unit_cell()
+        .niggli_cell()
+        for lattice, cell in ((lattice1, cell1), (lattice2, cell2))
+    ]
+
+    return reduced[0].is_similar_to(
+        reduced[1],
+        relative_length_tolerance=relative_length_tolerance,
+        absolute_angle_tolerance=angle_tolerance,
+    )
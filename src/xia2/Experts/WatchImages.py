@@ -0,0 +1,164 @@
+# Watching a directory for images as they are collected.
+#
+# In watch mode xia2 may be started while data collection is still running:
+# the images of each sweep are found by polling the directory (which is cheap,
+# since the directory listing is only read again once it has changed), so the
+# spots may be found on each wedge of images as soon as it has landed and the
+# rest of the processing started as soon as the sweep is complete, or once no
+# new images have arrived for a while. An image counts as landed once the next image
+# exists or the images have stopped arriving, so that an image which is still
+# being written is not read; the last expected image counts as landed once
+# its size stops changing.
+
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+
+from xia2.Experts.FindImages import (
+    find_matching_images,
+    template_directory_number2image,
+)
+
+logger = logging.getLogger("xia2.Experts.WatchImages")
+
+
+def wait_for_file(filename, interval=5, timeout=None):
+    """Wait for filename to exist, raising RuntimeError if it does not exist
+    after timeout seconds."""
+
+    start = time.monotonic()
+    while not os.path.exists(filename):
+        if timeout is not None and time.monotonic() - start > timeout:
+            raise RuntimeError("timed out waiting for %s" % filename)
+        logger.debug("Waiting for %s" % filename)
+        time.sleep(interval)
+
+
+def contiguous(images):
+    """The images from the first, up to the first missing image."""
+
+    images = sorted(images)
+    for j in range(1, len(images)):
+        if images[j] != images[j - 1] + 1:
+            return images[:j]
+    return images
+
+
+class ImageWatcher:
+    """Watch the images matching template in directory as they land, polling
+    every interval seconds. Collection is considered complete when
+    quiet_period seconds pass with no new images, or when the last expected
+    image lands. The waits raise RuntimeError if they take longer than
+    timeout seconds."""
+
+    def __init__(self, template, directory, interval=5, quiet_period=60, timeout=None):
+        self._template = template
+        self._directory = directory
+        self._interval = interval
+        self._quiet_period = quiet_period
+        self._timeout = timeout
+        self._images = []
+        self._last_size = None
+        self._settled = False
+        self._last_change = time.monotonic()
+
+    def poll(self):
+        """Look for new images, returning the contiguous run of images from
+        the first."""
+
+        images = contiguous(find_matching_images(self._template, self._directory))
+        last_size = None
+        if images:
+            try:
+                last_size = os.stat(
+                    template_directory_number2image(
+                        self._template, self._directory, images[-1]
+                    )
+                ).st_size
+            except OSError:
+                pass
+        self._settled = images == self._images and last_size == self._last_size
+        if images != self._images:
+            self._images = images
+            self._last_change = time.monotonic()
+        self._last_size = last_size
+        return self._images
+
+    def is_quiet(self):
+        return time.monotonic() - self._last_change >= self._quiet_period
+
+    def _wait(self, done, what):
+        start = time.monotonic()
+        while True:
+            images = self.poll()
+            if done(images):
+                return images
+            if self._timeout is not None and time.monotonic() - start > self._timeout:
+                raise RuntimeError(
+                    "timed out waiting for %s of %s"
+                    % (what, os.path.join(self._directory, self._template))
+                )
+            time.sleep(self._interval)
+
+    def wait_for_images(self, count):
+        """Wait for the first count images to land, returning the range of
+        those that have, which is shorter if collection stops before then."""
+
+        images = self._wait(
+            lambda images: len(images) > count or (images and self.is_quiet()),
+            "%d images" % count,
+        )
+        if len(images) > count:
+            images = images[:count]
+        logger.debug("Images %d to %d have landed" % (images[0], images[-1]))
+        return images[0], images[-1]
+
+    def _complete(self, images, expected):
+        return images and (
+            self.is_quiet()
+            or expected is not None
+            and images[-1] >= expected
+            and self._settled
+        )
+
+    def wait_for_completion(self, expected=None):
+        """Wait for collection to finish, i.e. for image number expected (if
+        given) or for the images to stop arriving, returning the range of
+        images collected."""
+
+        images = self._wait(
+            lambda images: self._complete(images, expected), "the sweep"
+        )
+        logger.debug(
+            "Collection of %s complete: images %d to %d"
+            % (self._template, images[0], images[-1])
+        )
+        return images[0], images[-1]
+
+    def wedges(self, count, expected=None):
+        """Wait for collection to finish as wait_for_completion, yielding the
+        range of each wedge of count images as soon as it has landed, then
+        that of the images left once collection is complete."""
+
+        landed = 0
+        while True:
+            images = self._wait(
+                lambda images: (
+                    len(images) > landed + count or self._complete(images, expected)
+                ),
+                "%d images" % (landed + count),
+            )
+            if len(images) > landed + count:
+                yield images[landed], images[landed + count - 1]
+                landed += count
+                continue
+            if len(images) > landed:
+                yield images[landed], images[-1]
+            logger.debug(
+                "Collection of %s complete: images %d to %d"
+                % (self._template, images[0], images[-1])
+            )
+            return
@@ -8,7 +8,6 @@
 
 from __future__ import annotations
 
-import collections
 import copy
 import logging
 import os
@@ -20,11 +19,14 @@ from dials.util import Sorry
 from dials.util.mp import available_cores
 from dxtbx.serialize import load
 
+from xia2.Driver.DriverFactory import DriverFactory
+from xia2.Driver.ResultCache import ResultCache
 from xia2.Experts.FindImages import image2template_directory
 from xia2.Handlers.Flags import Flags
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Handlers.PipelineSelection import add_preference
 from xia2.Schema import imageset_cache, update_with_reference_geometry
+from xia2.Schema.MetadataCache import MetadataCache
 from xia2.Schema.XProject import XProject
 
 logger = logging.getLogger("xia2.Handlers.CommandLine")
@@ -41,10 +43,7 @@ def load_experiments(filename):
     if reference_geometry is not None and len(reference_geometry) > 0:
         update_with_reference_geometry(imagesets, reference_geometry)
     for imageset in imagesets:
-        template = imageset.get_template()
-        if template not in imageset_cache:
-            imageset_cache[template] = collections.OrderedDict()
-        imageset_cache[template][imageset.get_scan().get_image_range()[0]] = imageset
+        imageset_cache.add_imageset(imageset.get_template(), imageset)
 
 
 def unroll_parameters(hdf5_master):
@@ -54,17 +53,11 @@ def unroll_parameters(hdf5_master):
 
     assert hdf5_master.endswith(".h5")
 
-    import h5py
+    from xia2.Experts.HDF5Files import inspect_hdf5
 
-    try:
-        with h5py.File(hdf5_master, "r") as master:
-            root = master["/entry/instrument/detector"]
-            ntrigger = root["detectorSpecific/ntrigger"][()]
-            nimages = root["detectorSpecific/nimages"][()]
-        if ntrigger > 1 and nimages > 1:
-            return ntrigger, nimages
-    except Exception:
-        return None
+    info = inspect_hdf5(hdf5_master)
+    if info.ntrigger and info.nimages and info.ntrigger > 1 and info.nimages > 1:
+        return info.ntrigger, info.nimages
 
 
 def unroll_datasets(datasets):
@@ -235,7 +228,7 @@ class _CommandLine:
         params = PhilIndex.get_python_object()
         mp_params = params.xia2.settings.multiprocessing
         if mp_params.mode == "parallel":
-            if mp_params.type == "qsub":
+            if mp_params.type in ("qsub", "qsub_array"):
                 if not shutil.which("qsub"):
                     raise Sorry("qsub not available")
             if mp_params.njob is Auto:
@@ -245,7 +238,7 @@ class _CommandLine:
             elif mp_params.nproc is Auto:
                 mp_params.nproc = available_cores()
         elif mp_params.mode == "serial":
-            if mp_params.type == "qsub":
+            if mp_params.type in ("qsub", "qsub_array"):
                 if not shutil.which("qsub"):
                     raise Sorry("qsub not available")
             if mp_params.njob is Auto:
@@ -261,6 +254,26 @@ class _CommandLine:
         if mp_params.nproc > 1 and os.name == "nt":
             raise Sorry("nproc > 1 is not supported on Windows.")  # #191
 
+        cache_params = params.xia2.settings.result_cache
+        if cache_params.directory:
+            DriverFactory.set_result_cache(
+                ResultCache(
+                    cache_params.directory, max_size=int(cache_params.max_size * 1e9)
+                )
+            )
+            logger.debug("Result cache: %s" % cache_params.directory)
+
+        imageset_params = params.xia2.settings.imageset_cache
+        imageset_cache.set_max_size(imageset_params.max_sweeps)
+        if imageset_params.metadata_file:
+            imageset_cache.set_metadata_cache(
+                MetadataCache(
+                    imageset_params.metadata_file,
+                    max_entries=imageset_params.metadata_max_entries,
+                )
+            )
+            logger.debug("Metadata cache: %s" % imageset_params.metadata_file)
+
         if params.xia2.settings.indexer is not None:
             add_preference("indexer", params.xia2.settings.indexer)
         if params.xia2.settings.refiner is not None:
@@ -424,6 +437,16 @@ class _CommandLine:
 
             from xia2.Applications.xia2setup import is_hdf5_name
 
+            watch_params = params.xia2.settings.watch
+            if watch_params.enabled:
+                from xia2.Experts.WatchImages import wait_for_file
+
+                wait_for_file(
+                    os.path.abspath(dataset),
+                    interval=watch_params.interval,
+                    timeout=watch_params.timeout,
+                )
+
             if os.path.exists(os.path.abspath(dataset)):
                 dataset = os.path.abspath(dataset)
             else:
@@ -511,7 +534,9 @@ class _CommandLine:
         with open(xinfo) as fh:
             logger.debug(fh.read().strip())
         logger.debug(60 * "-")
-        self._xinfo = XProject(xinfo)
+        self._xinfo = XProject(
+            xinfo, base_path=PhilIndex.params.xia2.settings.project_directory
+        )
 
     def get_xinfo(self):
         """Return the XProject."""
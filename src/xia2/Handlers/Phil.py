@@ -23,6 +23,19 @@ general
   check_image_files_readable = True
     .type = bool
     .expert_level = 2
+  check_images
+    .expert_level = 2
+  {
+    every = None
+      .type = int(value_min=1)
+      .help = "Only check that the first, the last and every nth image of" \
+              " each sweep can be read, e.g. on trusted storage, rather" \
+              " than all of them. Missing images are always found."
+    nproc = 1
+      .type = int(value_min=1)
+      .help = "Check this many image files at once, which helps on network" \
+              " file systems."
+  }
   check_for_saturated_pixels = False
     .type = bool
     .expert_level = 2
@@ -319,6 +332,13 @@ dials
     method = fft1d *fft3d real_space_grid_search
       .type = choice
       .short_caption = "Indexing method"
+    concurrent_methods = False
+      .type = bool
+      .help = "If no indexing method is chosen, try fft3d and fft1d indexing " \
+              "at the same time, sharing the processors between them, and " \
+              "record the log and report only for the solution chosen."
+      .short_caption = "Try the indexing methods concurrently"
+      .expert_level = 1
     max_cell = 0.0
       .type = float
       .help = "Maximum length of candidate unit cell basis vectors (in Angstrom)."
@@ -421,6 +441,27 @@ dials
         .help = "Minimum number of reflections per degree of sweep required to perform "
                 "profile modelling."
     }
+    wedges
+      .short_caption = "Integrate each sweep in wedges of images"
+      .expert_level = 2
+    {
+      max_memory = None
+        .type = float(value_min=0)
+        .help = "Integrate each sweep as separate dials.integrate jobs for wedges "
+                "of images, each small enough that its images take no more than "
+                "this many GB in memory (at 8 bytes a pixel), rather than as one "
+                "job. This is the memory of each job: up to max_jobs of them run "
+                "at once. The reflections of the wedges are merged for export."
+      overlap = 2.0
+        .type = float(value_min=0)
+        .help = "Rotation in degrees by which each wedge is extended into its "
+                "neighbours, so that the reflections centred on the images of a "
+                "wedge, which are taken from that wedge, are fully recorded."
+      max_jobs = None
+        .type = int(value_min=1)
+        .help = "The number of wedges to integrate at once, each using its share "
+                "of the processors (by default, as many as there are processors)."
+    }
   }
 
   high_pressure
@@ -694,6 +735,11 @@ xia2.settings
   crystal = 'DEFAULT'
     .type = str
     .help = "A name for the crystal"
+  project_directory = None
+    .type = path
+    .help = "The directory in which to create the crystal and sweep" \
+            " directories, if not the current directory"
+    .expert_level = 3
   input
     .short_caption = "xia2 input settings"
   {
@@ -943,6 +989,23 @@ xia2.settings
     .type = bool
     .short_caption = "Reintegrate using a corrected lattice"
     .expert_level = 1
+  reindex_lattice_change = False
+    .type = bool
+    .help = "When a lower symmetry lattice is chosen after integration, reindex " \
+            "the reflections already integrated rather than integrating them " \
+            "again, if the unit cell of the new lattice found when indexing " \
+            "describes the same lattice as the cell used for integration, to " \
+            "within reindex_lattice_change_tolerance. Otherwise, and if the " \
+            "data were integrated in P1, reintegrate_correct_lattice applies."
+    .short_caption = "Reindex rather than reintegrate on a change of lattice"
+    .expert_level = 1
+  reindex_lattice_change_tolerance = 0.01
+    .type = float(value_min=0)
+    .help = "The relative tolerance on the lengths of the reduced cells compared " \
+            "for reindex_lattice_change: the angles must agree to within one " \
+            "degree."
+    .short_caption = "Relative cell tolerance to reindex on a change of lattice"
+    .expert_level = 2
   lattice_rejection = True
     .type = bool
     .short_caption = "Reject lattice if constraints increase RMSD"
@@ -1014,14 +1077,119 @@ xia2.settings
       .type = int(value_min=1)
       .help = "The number of sweeps to process simultaneously."
       .expert_level = 1
-    type = *simple qsub
+    type = *simple qsub qsub_array
       .type = choice
-      .help = "How to run the parallel processing jobs, e.g. over a cluster"
+      .help = "How to run the parallel processing jobs, e.g. over a cluster." \
+              " qsub_array submits jobs started together as one job array."
       .expert_level = 1
     qsub_command = ''
       .type = str
       .help = "The command to use to submit qsub jobs"
       .expert_level = 1
+    qsub_array_template = ''
+      .type = str
+      .help = "Command template to submit a job array for type=qsub_array," \
+              " with {qsub}, {n_tasks}, {cpu_threads}, {resources}," \
+              " {directory} and {script} substituted. Defaults to SGE syntax."
+      .expert_level = 2
+    qsub_array_resources = ''
+      .type = str
+      .help = "The {resources} of qsub_array_template for jobs using more" \
+              " than one processor, with {cpu_threads} substituted. Defaults" \
+              " to SGE syntax, -pe smp {cpu_threads}."
+      .expert_level = 2
+    qstat_template = ''
+      .type = str
+      .help = "Command template to check whether job array {job_id} is" \
+              " still queued for type=qsub_array"
+      .expert_level = 2
+    qstat_job_gone = ''
+      .type = str
+      .help = "Regular expression matching the output of qstat_template" \
+              " once the job array has left the queue. Defaults to SGE's" \
+              " message, Following jobs do not exist."
+      .expert_level = 2
+    pipeline_scaling = False
+      .type = bool
+      .help = "Start the preparation for scaling which depends only on one" \
+              " sweep (currently the dials.symmetry analysis for the DIALS" \
+              " scaler) as soon as that sweep has been integrated, while" \
+              " other sweeps are still being integrated."
+      .expert_level = 1
+    concurrent_index_prepare = False
+      .type = bool
+      .help = "When indexing several sweeps together with DIALS, run the" \
+              " spot finding and the other preparation for each sweep at the" \
+              " same time, sharing the processors between the sweeps."
+      .expert_level = 1
+    sweep_workers = False
+      .type = bool
+      .help = "In parallel mode, process the sweeps in worker processes" \
+              " forked from xia2 once the parameters and images have been" \
+              " read, rather than starting xia2.integrate for every sweep." \
+              " Only used for type=simple, and not on Windows."
+      .expert_level = 1
+  }
+  result_cache
+    .short_caption = "Result cache"
+    .expert_level = 1
+  {
+    directory = None
+      .type = path
+      .help = "Keep the results of DIALS spot finding, indexing and" \
+              " integration here and reuse them when the same job is run" \
+              " again with the same input, e.g. in a later xia2 run."
+    max_size = 10
+      .type = float(value_min=0)
+      .help = "The maximum size of the result cache in GB: beyond this the" \
+              " least recently used results are removed."
+  }
+  imageset_cache
+    .short_caption = "Imageset cache"
+    .expert_level = 1
+  {
+    metadata_file = None
+      .type = path
+      .help = "Keep the models read from the image headers in this SQLite" \
+              " file, and use them in place of reading the headers again" \
+              " while the image files are unchanged, e.g. in a later xia2" \
+              " run or in the parallel processing of sweeps."
+    metadata_max_entries = 10000
+      .type = int(value_min=1)
+      .help = "The number of templates to keep the models of in the" \
+              " metadata_file: beyond this the least recently used are" \
+              " removed."
+    max_sweeps = 1000
+      .type = int(value_min=1)
+      .help = "The number of templates to keep the imagesets of in memory."
+  }
+  watch
+    .short_caption = "Watch mode"
+    .expert_level = 1
+  {
+    enabled = False
+      .type = bool
+      .help = "Start while the images given with image= are still being" \
+              " collected: wait for the images to land, finding the spots on" \
+              " each wedge of images as soon as it has, and go on to process" \
+              " the whole sweep, with the spots found, once it is complete."
+    interval = 5
+      .type = float(value_min=0)
+      .help = "How often to look for new images, in seconds."
+    quiet_period = 60
+      .type = float(value_min=0)
+      .help = "Consider a sweep complete when no new images have arrived" \
+              " for this many seconds, unless an image range was given, in" \
+              " which case the sweep is complete when its last image lands."
+    timeout = None
+      .type = float(value_min=0)
+      .help = "Give up if waiting for images takes longer than this many" \
+              " seconds."
+    wedge = 20
+      .type = int(value_min=0)
+      .help = "The number of images at a time to find the spots on while the" \
+              " rest are collected, for the DIALS indexer, or 0 to just wait" \
+              " for the sweep."
   }
   report
     .expert_level = 1
@@ -10,6 +10,8 @@ import os
 import string
 import time
 
+import numpy as np
+
 import libtbx
 from cctbx import crystal, sgtbx
 from cctbx.sgtbx import bravais_types
@@ -17,6 +19,7 @@ from dials.array_family import flex
 from dials.util.ascii_art import spot_counts_per_image_plot
 from dxtbx.serialize import load
 
+from xia2.Driver.JobScheduler import JobScheduler
 from xia2.Experts.SymmetryExpert import lattice_to_spacegroup_number
 from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Files import FileHandler
@@ -44,6 +47,38 @@ from xia2.Wrappers.Dials.Spotfinder import Spotfinder as _Spotfinder
 
 logger = logging.getLogger("xia2.Modules.Indexer.DialsIndexer")
 
+# the spots found in watch mode while the images were being collected, as
+# (first image, last image, spot filename) for each wedge of images, by the
+# full template of the images
+watched_spots = {}
+
+
+def overload_histograms(shoeboxes, count_limit):
+    """Histograms, in five slots from 0 to 1.25 * count_limit, of the
+    maximum pixel value of each of the shoeboxes and of every pixel value in
+    them, returned as the (spot, pixel) slot counts. The pixels of all the
+    shoeboxes are gathered into one array and reduced together, rather than
+    making a histogram for each shoebox. Empty shoeboxes, which have no
+    maximum, are left out."""
+
+    data = [b.data.as_numpy_array().ravel() for b in shoeboxes]
+    data = [d for d in data if d.size]
+    if data:
+        offsets = np.cumsum([0] + [d.size for d in data[:-1]])
+        pixels = np.concatenate(data).astype(np.float64)
+        maxima = np.maximum.reduceat(pixels, offsets)
+    else:
+        pixels = maxima = np.zeros(0)
+
+    data_max = 1.25 * count_limit
+    maximum_histogram = flex.histogram(
+        flex.double(maxima), data_min=0, data_max=data_max, n_slots=5
+    )
+    pixel_histogram = flex.histogram(
+        flex.double(pixels), data_min=0, data_max=data_max, n_slots=5
+    )
+    return maximum_histogram.slots(), pixel_histogram.slots()
+
 
 class DialsIndexer(Indexer):
     def __init__(self):
@@ -56,6 +91,11 @@ class DialsIndexer(Indexer):
         self._data_files = {}
         self._solutions = {}
 
+        # the solution chosen by _index(), not yet made (see _index_finish),
+        # and the number of those replaced before they were made
+        self._pending_solution = None
+        self._reindex_avoided = 0
+
         # FIXME this is a stupid low resolution limit to use...
         self._indxr_low_resolution = 40.0
 
@@ -240,6 +280,13 @@ class DialsIndexer(Indexer):
         # first = min(all_images)
         # last = max(all_images)
 
+        if (
+            PhilIndex.params.xia2.settings.multiprocessing.concurrent_index_prepare
+            and len(self._indxr_imagesets) > 1
+        ):
+            self._index_prepare_concurrently()
+            return
+
         spot_lists = []
         experiments_filenames = []
 
@@ -247,248 +294,58 @@ class DialsIndexer(Indexer):
 
             logger.notice(banner("Spotfinding %s" % xsweep.get_name()))
 
-            first, last = imageset.get_scan().get_image_range()
-
             # at this stage, break out to run the DIALS code: this sets itself up
             # now cheat and pass in some information... save re-reading all of the
             # image headers
 
             # FIXME need to adjust this to allow (say) three chunks of images
 
-            from dxtbx.model.experiment_list import ExperimentListFactory
-
-            sweep_filename = os.path.join(
-                self.get_working_directory(), "%s_import.expt" % xsweep.get_name()
-            )
-            ExperimentListFactory.from_imageset_and_crystal(imageset, None).as_file(
-                sweep_filename
-            )
-
-            genmask = self.GenerateMask()
-            genmask.set_input_experiments(sweep_filename)
-            genmask.set_output_experiments(
-                os.path.join(
-                    self.get_working_directory(),
-                    f"{genmask.get_xpid()}_{xsweep.get_name()}_masked.expt",
-                )
-            )
-            genmask.set_params(PhilIndex.params.dials.masking)
+            genmask, _ = self._prepare_generate_mask(imageset, xsweep.get_name())
             sweep_filename, mask_pickle = genmask.run()
             logger.debug("Generated mask for %s: %s", xsweep.get_name(), mask_pickle)
 
-            gain = PhilIndex.params.xia2.settings.input.gain
-            if gain is libtbx.Auto:
-                gain_estimater = self.EstimateGain()
-                gain_estimater.set_sweep_filename(sweep_filename)
-                gain_estimater.run()
-                gain = gain_estimater.get_gain()
-                logger.info("Estimated gain: %.2f", gain)
-                PhilIndex.params.xia2.settings.input.gain = gain
+            watched = self._watched_spots(imageset, xsweep.get_name())
+            if watched:
+                spot_filename, refl = watched
+                experiments_filenames.append(sweep_filename)
 
-            # FIXME this should really use the assigned spot finding regions
-            # offset = self.get_frame_offset()
-            dfs_params = PhilIndex.params.dials.find_spots
-            spotfinder = self.Spotfinder()
-            if last - first > 10:
-                spotfinder.set_write_hot_mask(True)
-            spotfinder.set_input_sweep_filename(sweep_filename)
-            spotfinder.set_output_sweep_filename(
-                f"{spotfinder.get_xpid()}_{xsweep.get_name()}_strong.expt"
-            )
-            spotfinder.set_input_spot_filename(
-                f"{spotfinder.get_xpid()}_{xsweep.get_name()}_strong.refl"
-            )
-            if PhilIndex.params.dials.fast_mode:
-                wedges = self._index_select_images_i(imageset)
-                spotfinder.set_scan_ranges(wedges)
             else:
-                spotfinder.set_scan_ranges([(first, last)])
-            if dfs_params.phil_file is not None:
-                spotfinder.set_phil_file(dfs_params.phil_file)
-            if dfs_params.min_spot_size is not None:
-                spotfinder.set_min_spot_size(dfs_params.min_spot_size)
-            if dfs_params.min_local is not None:
-                spotfinder.set_min_local(dfs_params.min_local)
-            if dfs_params.sigma_strong:
-                spotfinder.set_sigma_strong(dfs_params.sigma_strong)
-            gain = PhilIndex.params.xia2.settings.input.gain
-            if gain:
-                spotfinder.set_gain(gain)
-
-            # set a limit for spot finding which is 25% greater than we
-            # actually trust - can use this to measure overloads
-
-            if PhilIndex.params.general.check_for_saturated_pixels:
-                count_limit = imageset.get_detector()[0].get_trusted_range()[1]
-                spotfinder.set_maximum_trusted_value(count_limit * 1.25)
-
-            if dfs_params.filter_ice_rings:
-                spotfinder.set_filter_ice_rings(dfs_params.filter_ice_rings)
-            if dfs_params.kernel_size:
-                spotfinder.set_kernel_size(dfs_params.kernel_size)
-            if dfs_params.global_threshold is not None:
-                spotfinder.set_global_threshold(dfs_params.global_threshold)
-            if dfs_params.threshold.algorithm is not None:
-                spotfinder.set_threshold_algorithm(dfs_params.threshold.algorithm)
-            spotfinder.run()
-
-            spot_filename = spotfinder.get_spot_filename()
-            if not os.path.exists(spot_filename):
-                raise RuntimeError(
-                    "Spotfinding failed: %s does not exist."
-                    % os.path.basename(spot_filename)
+                gain = PhilIndex.params.xia2.settings.input.gain
+                if gain is libtbx.Auto:
+                    gain_estimater = self.EstimateGain()
+                    gain_estimater.set_sweep_filename(sweep_filename)
+                    gain_estimater.run()
+                    gain = gain_estimater.get_gain()
+                    logger.info("Estimated gain: %.2f", gain)
+                    PhilIndex.params.xia2.settings.input.gain = gain
+
+                spotfinder = self._prepare_spotfinder(
+                    imageset, xsweep.get_name(), sweep_filename
                 )
+                spotfinder.run()
+                refl = self._read_spots(spotfinder)
+                spot_filename = spotfinder.get_spot_filename()
+                experiments_filenames.append(spotfinder.get_output_sweep_filename())
 
             spot_lists.append(spot_filename)
-            experiments_filenames.append(spotfinder.get_output_sweep_filename())
-
-            refl = flex.reflection_table.from_file(spot_filename)
-            if not len(refl):
-                raise RuntimeError("No spots found in sweep %s" % xsweep.get_name())
-            logger.info(spot_counts_per_image_plot(refl))
-
-            # in terms of checking for saturation; measure (i) the maximum pixel
-            # in each spot then also a histogram of the totals to get a sense of
-            # _how_ overloaded things are
-
-            if PhilIndex.params.general.check_for_saturated_pixels:
-                t0 = time.time()
-                count_limit = imageset.get_detector()[0].get_trusted_range()[1]
-                maxima = flex.double()
-                boxes = refl["shoebox"]
-                nn = boxes.size()
-
-                pixel_histogram = flex.histogram(
-                    flex.double(), data_min=0, data_max=1.25 * count_limit, n_slots=5
-                )
-
-                for j in range(nn):
-                    b = boxes[j]
-                    pixel_histogram.update(
-                        flex.histogram(
-                            b.data.as_double().as_1d(),
-                            data_min=0,
-                            data_max=1.25 * count_limit,
-                            n_slots=5,
-                        )
-                    )
-                    maxima.append(flex.max(b.data))
-
-                maximum_histogram = flex.histogram(
-                    maxima, data_min=0, data_max=1.25 * count_limit, n_slots=5
-                )
-
-                maximum_counts = maximum_histogram.slots()
-                pixel_counts = pixel_histogram.slots()
-
-                if maximum_counts[4] > 0:
-                    logger.warn(
-                        f"Overloads found: {maximum_counts[4]} spots / {pixel_counts[4]} pixels"
-                    )
-                elif maximum_counts[3] > 0:
-                    logger.warn(
-                        f"Near overloads found: {maximum_counts[3]} spots / {pixel_counts[3]} pixels"
-                    )
-                logger.debug(f"Overload detection took {time.time() - t0:.2f}s")
+            self._check_spots(imageset, xsweep, refl)
 
             if not PhilIndex.params.dials.fast_mode:
                 detectblanks = self.DetectBlanks()
                 detectblanks.set_sweep_filename(experiments_filenames[-1])
                 detectblanks.set_reflections_filename(spot_filename)
                 detectblanks.run()
-                json = detectblanks.get_results()
-                blank_regions = json["strong"]["blank_regions"]
-                if len(blank_regions):
-                    blank_regions = [(int(s), int(e)) for s, e in blank_regions]
-                    for blank_start, blank_end in blank_regions:
-                        logger.info(
-                            "WARNING: Potential blank images: %i -> %i",
-                            blank_start + 1,
-                            blank_end,
-                        )
-
-                    if PhilIndex.params.xia2.settings.remove_blanks:
-                        non_blanks = []
-                        start, end = imageset.get_array_range()
-                        last_blank_end = start
-                        for blank_start, blank_end in blank_regions:
-                            if blank_start > start:
-                                non_blanks.append((last_blank_end, blank_start))
-                            last_blank_end = blank_end
-
-                        if last_blank_end + 1 < end:
-                            non_blanks.append((last_blank_end, end))
-
-                        xsweep = self.get_indexer_sweep()
-                        xwav = xsweep.get_wavelength()
-                        xsample = xsweep.sample
-
-                        sweep_name = xsweep.get_name()
-
-                        for i, (nb_start, nb_end) in enumerate(non_blanks):
-                            assert i < 26
-                            if i == 0:
-                                sub_imageset = imageset[
-                                    nb_start - start : nb_end - start
-                                ]
-                                xsweep._frames_to_process = (nb_start + 1, nb_end + 1)
-                                self.set_indexer_prepare_done(done=False)
-                                self._indxr_imagesets[
-                                    self._indxr_imagesets.index(imageset)
-                                ] = sub_imageset
-                                xsweep._integrater._setup_from_imageset(sub_imageset)
-                            else:
-                                min_images = (
-                                    PhilIndex.params.xia2.settings.input.min_images
-                                )
-                                if (nb_end - nb_start) < min_images:
-                                    continue
-                                new_name = "_".join(
-                                    (sweep_name, string.ascii_lowercase[i])
-                                )
-                                new_sweep = xwav.add_sweep(
-                                    new_name,
-                                    xsample,
-                                    directory=os.path.join(
-                                        os.path.basename(xsweep.get_directory()),
-                                        new_name,
-                                    ),
-                                    image=imageset.get_path(nb_start - start),
-                                    frames_to_process=(nb_start + 1, nb_end),
-                                    beam=xsweep.get_beam_centre(),
-                                    reversephi=xsweep.get_reversephi(),
-                                    distance=xsweep.get_distance(),
-                                    gain=xsweep.get_gain(),
-                                    dmin=xsweep.get_resolution_high(),
-                                    dmax=xsweep.get_resolution_low(),
-                                    polarization=xsweep.get_polarization(),
-                                    user_lattice=xsweep.get_user_lattice(),
-                                    user_cell=xsweep.get_user_cell(),
-                                    epoch=xsweep._epoch,
-                                    ice=xsweep._ice,
-                                    excluded_regions=xsweep._excluded_regions,
-                                )
-                                logger.info(
-                                    "Generating new sweep: %s (%s:%i:%i)",
-                                    new_sweep.get_name(),
-                                    new_sweep.get_image(),
-                                    new_sweep.get_frames_to_process()[0],
-                                    new_sweep.get_frames_to_process()[1],
-                                )
-                        return
+                if self._remove_blanks(imageset, detectblanks.get_results()):
+                    return
 
             if not PhilIndex.params.xia2.settings.trust_beam_centre:
                 discovery = self.SearchBeamPosition()
                 discovery.set_sweep_filename(experiments_filenames[-1])
                 discovery.set_spot_filename(spot_filename)
-
-                # set scan_range to correspond to not more than 180 degrees
-                # if we have > 20000 reflections
-                width = imageset.get_scan().get_oscillation()[1]
-                if (last - first) * width > 180.0 and len(refl) > 20000:
-                    end = first + int(round(180.0 / width)) - 1
-                    logger.debug("Using %d to %d for beam search", first, end)
-                    discovery.set_image_range((first, end))
+                image_range = self._beam_search_image_range(imageset, refl)
+                if image_range:
+                    logger.debug("Using %d to %d for beam search", *image_range)
+                    discovery.set_image_range(image_range)
 
                 try:
                     discovery.run()
@@ -503,25 +360,437 @@ class DialsIndexer(Indexer):
         self.set_indexer_payload("spot_lists", spot_lists)
         self.set_indexer_payload("experiments", experiments_filenames)
 
+    def _index_prepare_concurrently(self):
+        """As _index_prepare, but with the programs for each sweep run at the
+        same time as those for the other sweeps, each program starting as
+        soon as those it depends on have finished, and the processors shared
+        between the sweeps. The wrappers are all made before any are run, and
+        the results are reported sweep by sweep afterwards, so the log files
+        and the output are the same from one run to the next."""
+
+        sweeps = list(zip(self._indxr_imagesets, self._indxr_sweeps))
+        nproc = max(
+            1, PhilIndex.params.xia2.settings.multiprocessing.nproc // len(sweeps)
+        )
+
+        scheduler = JobScheduler()
+        gain_estimater = None
+        estimated = estimated_for = None
+        programs = []
+        spots = {}
+        search_failures = {}
+
+        def find_spots(j, spotfinder):
+            if gain_estimater is not None:
+                spotfinder.set_gain(gain_estimater.get_gain())
+            spotfinder.run()
+            spots[j] = self._read_spots(spotfinder)
+
+        def search_beam_position(j, imageset, discovery):
+            image_range = self._beam_search_image_range(imageset, spots[j])
+            if image_range:
+                discovery.set_image_range(image_range)
+            try:
+                discovery.run()
+            except Exception as e:
+                search_failures[j] = e
+
+        for j, (imageset, xsweep) in enumerate(sweeps):
+            genmask, sweep_filename = self._prepare_generate_mask(
+                imageset, xsweep.get_name()
+            )
+            masked = scheduler.submit(genmask.run)
+            after = [masked]
+
+            watched = self._watched_spots(imageset, xsweep.get_name())
+            if watched:
+                spot_filename, spots[j] = watched
+                experiments_filename = sweep_filename
+                found = masked
+
+            else:
+                if (
+                    estimated is None
+                    and PhilIndex.params.xia2.settings.input.gain is libtbx.Auto
+                ):
+                    gain_estimater = self.EstimateGain()
+                    gain_estimater.set_sweep_filename(sweep_filename)
+                    estimated = scheduler.submit(gain_estimater.run, after=[masked])
+                    estimated_for = j
+
+                # as in _index_prepare, the gain estimated for the first sweep
+                # is used for all of them
+                if estimated is not None:
+                    after.append(estimated)
+
+                spotfinder = self._prepare_spotfinder(
+                    imageset, xsweep.get_name(), sweep_filename
+                )
+                spotfinder.set_nproc(nproc)
+                spot_filename = spotfinder.get_spot_filename()
+                experiments_filename = spotfinder.get_output_sweep_filename()
+                found = scheduler.submit(
+                    find_spots, j, spotfinder, cpu_threads=nproc, after=after
+                )
+
+            detectblanks = None
+            if not PhilIndex.params.dials.fast_mode:
+                detectblanks = self.DetectBlanks()
+                detectblanks.set_sweep_filename(experiments_filename)
+                detectblanks.set_reflections_filename(spot_filename)
+                scheduler.submit(detectblanks.run, after=[found])
+
+            discovery = None
+            if not PhilIndex.params.xia2.settings.trust_beam_centre:
+                discovery = self.SearchBeamPosition()
+                discovery.set_sweep_filename(experiments_filename)
+                discovery.set_spot_filename(spot_filename)
+                discovery.set_nproc(nproc)
+                scheduler.submit(
+                    search_beam_position,
+                    j,
+                    imageset,
+                    discovery,
+                    cpu_threads=nproc,
+                    after=[found],
+                )
+
+            programs.append(
+                (masked, spot_filename, experiments_filename, detectblanks, discovery)
+            )
+
+        results = scheduler.wait()
+
+        spot_lists = []
+        experiments_filenames = []
+
+        for j, (imageset, xsweep) in enumerate(sweeps):
+            (
+                masked,
+                spot_filename,
+                experiments_filename,
+                detectblanks,
+                discovery,
+            ) = programs[j]
+
+            logger.notice(banner("Spotfinding %s" % xsweep.get_name()))
+            logger.debug(
+                "Generated mask for %s: %s", xsweep.get_name(), results[masked][1]
+            )
+            if j == estimated_for:
+                gain = gain_estimater.get_gain()
+                logger.info("Estimated gain: %.2f", gain)
+                PhilIndex.params.xia2.settings.input.gain = gain
+
+            spot_lists.append(spot_filename)
+            experiments_filenames.append(experiments_filename)
+            self._check_spots(imageset, xsweep, spots[j])
+
+            if detectblanks is not None:
+                if self._remove_blanks(imageset, detectblanks.get_results()):
+                    return
+
+            if discovery is not None:
+                image_range = self._beam_search_image_range(imageset, spots[j])
+                if image_range:
+                    logger.debug("Used %d to %d for beam search", *image_range)
+                if j in search_failures:
+                    logger.debug(
+                        "DIALS beam centre search failed: %s",
+                        str(search_failures[j]),
+                        exc_info=search_failures[j],
+                    )
+                else:
+                    # overwrite indexed.expt in experiments list
+                    experiments_filenames[
+                        -1
+                    ] = discovery.get_optimized_experiments_filename()
+
+        self.set_indexer_payload("spot_lists", spot_lists)
+        self.set_indexer_payload("experiments", experiments_filenames)
+
+    def _prepare_generate_mask(self, imageset, name):
+        """The GenerateMask wrapper for imageset, of the sweep name, ready to
+        run, with the name of the experiments file it will write."""
+
+        from dxtbx.model.experiment_list import ExperimentListFactory
+
+        sweep_filename = os.path.join(
+            self.get_working_directory(), "%s_import.expt" % name
+        )
+        ExperimentListFactory.from_imageset_and_crystal(imageset, None).as_file(
+            sweep_filename
+        )
+
+        genmask = self.GenerateMask()
+        genmask.set_input_experiments(sweep_filename)
+        masked_filename = os.path.join(
+            self.get_working_directory(),
+            f"{genmask.get_xpid()}_{name}_masked.expt",
+        )
+        genmask.set_output_experiments(masked_filename)
+        genmask.set_params(PhilIndex.params.dials.masking)
+        return genmask, masked_filename
+
+    def _prepare_spotfinder(self, imageset, name, sweep_filename):
+        first, last = imageset.get_scan().get_image_range()
+
+        # FIXME this should really use the assigned spot finding regions
+        # offset = self.get_frame_offset()
+        dfs_params = PhilIndex.params.dials.find_spots
+        spotfinder = self.Spotfinder()
+        if last - first > 10:
+            spotfinder.set_write_hot_mask(True)
+        spotfinder.set_input_sweep_filename(sweep_filename)
+        spotfinder.set_output_sweep_filename(
+            f"{spotfinder.get_xpid()}_{name}_strong.expt"
+        )
+        spotfinder.set_input_spot_filename(
+            f"{spotfinder.get_xpid()}_{name}_strong.refl"
+        )
+        if PhilIndex.params.dials.fast_mode:
+            wedges = self._index_select_images_i(imageset)
+            spotfinder.set_scan_ranges(wedges)
+        else:
+            spotfinder.set_scan_ranges([(first, last)])
+        if dfs_params.phil_file is not None:
+            spotfinder.set_phil_file(dfs_params.phil_file)
+        if dfs_params.min_spot_size is not None:
+            spotfinder.set_min_spot_size(dfs_params.min_spot_size)
+        if dfs_params.min_local is not None:
+            spotfinder.set_min_local(dfs_params.min_local)
+        if dfs_params.sigma_strong:
+            spotfinder.set_sigma_strong(dfs_params.sigma_strong)
+        gain = PhilIndex.params.xia2.settings.input.gain
+        if gain and gain is not libtbx.Auto:
+            spotfinder.set_gain(gain)
+
+        # set a limit for spot finding which is 25% greater than we
+        # actually trust - can use this to measure overloads
+
+        if PhilIndex.params.general.check_for_saturated_pixels:
+            count_limit = imageset.get_detector()[0].get_trusted_range()[1]
+            spotfinder.set_maximum_trusted_value(count_limit * 1.25)
+
+        if dfs_params.filter_ice_rings:
+            spotfinder.set_filter_ice_rings(dfs_params.filter_ice_rings)
+        if dfs_params.kernel_size:
+            spotfinder.set_kernel_size(dfs_params.kernel_size)
+        if dfs_params.global_threshold is not None:
+            spotfinder.set_global_threshold(dfs_params.global_threshold)
+        if dfs_params.threshold.algorithm is not None:
+            spotfinder.set_threshold_algorithm(dfs_params.threshold.algorithm)
+        return spotfinder
+
+    @staticmethod
+    def _read_spots(spotfinder):
+        spot_filename = spotfinder.get_spot_filename()
+        if not os.path.exists(spot_filename):
+            raise RuntimeError(
+                "Spotfinding failed: %s does not exist."
+                % os.path.basename(spot_filename)
+            )
+        return flex.reflection_table.from_file(spot_filename)
+
+    def find_spots_in_wedge(self, imageset, name):
+        """Find the spots on imageset, a wedge of the images of a sweep which
+        is still being collected, as they would be found for indexing, and
+        keep them in watched_spots for the indexer of the sweep once it is
+        complete. The gain is estimated from the first wedge, if it is to be
+        estimated."""
+
+        genmask, sweep_filename = self._prepare_generate_mask(imageset, name)
+        genmask.run()
+
+        if PhilIndex.params.xia2.settings.input.gain is libtbx.Auto:
+            gain_estimater = self.EstimateGain()
+            gain_estimater.set_sweep_filename(sweep_filename)
+            gain_estimater.run()
+            gain = gain_estimater.get_gain()
+            logger.info("Estimated gain: %.2f", gain)
+            PhilIndex.params.xia2.settings.input.gain = gain
+
+        spotfinder = self._prepare_spotfinder(imageset, name, sweep_filename)
+        spotfinder.run()
+        refl = self._read_spots(spotfinder)
+
+        first, last = imageset.get_scan().get_image_range()
+        watched_spots.setdefault(imageset.get_template(), []).append(
+            (first, last, spotfinder.get_spot_filename())
+        )
+        return refl
+
+    def _watched_spots(self, imageset, name):
+        """The spots found in watch mode on the images of imageset, as the
+        name of a file of all of them and the reflections, or None unless
+        spots were found on every image."""
+
+        first, last = imageset.get_scan().get_image_range()
+        wedges = sorted(
+            wedge
+            for wedge in watched_spots.get(imageset.get_template(), [])
+            if first <= wedge[0] and wedge[1] <= last
+        )
+        expected = first
+        for start, end, _ in wedges:
+            if start != expected:
+                return None
+            expected = end + 1
+        if expected != last + 1:
+            return None
+
+        refl = None
+        for _, _, spot_filename in wedges:
+            wedge_refl = flex.reflection_table.from_file(spot_filename)
+            if refl is None:
+                refl = wedge_refl
+            else:
+                refl.extend(wedge_refl)
+        # the wedges were spot found as experiments of their own
+        refl["id"] = flex.int(refl.size(), 0)
+        identifiers = refl.experiment_identifiers()
+        for i in list(identifiers.keys()):
+            del identifiers[i]
+
+        spot_filename = os.path.join(
+            self.get_working_directory(), "%s_watched_strong.refl" % name
+        )
+        refl.as_file(spot_filename)
+        logger.info(
+            "Using the spots found on images %d to %d while they were collected",
+            first,
+            last,
+        )
+        return spot_filename, refl
+
+    def _check_spots(self, imageset, xsweep, refl):
+        if not len(refl):
+            raise RuntimeError("No spots found in sweep %s" % xsweep.get_name())
+        logger.info(spot_counts_per_image_plot(refl))
+
+        # in terms of checking for saturation; measure (i) the maximum pixel
+        # in each spot then also a histogram of the totals to get a sense of
+        # _how_ overloaded things are
+
+        if PhilIndex.params.general.check_for_saturated_pixels:
+            t0 = time.time()
+            count_limit = imageset.get_detector()[0].get_trusted_range()[1]
+            maximum_counts, pixel_counts = overload_histograms(
+                refl["shoebox"], count_limit
+            )
+
+            if maximum_counts[4] > 0:
+                logger.warn(
+                    f"Overloads found: {maximum_counts[4]} spots / {pixel_counts[4]} pixels"
+                )
+            elif maximum_counts[3] > 0:
+                logger.warn(
+                    f"Near overloads found: {maximum_counts[3]} spots / {pixel_counts[3]} pixels"
+                )
+            logger.debug(f"Overload detection took {time.time() - t0:.2f}s")
+
+    def _remove_blanks(self, imageset, json):
+        """Report the blank regions found by DetectBlanks, and if they are to
+        be removed split the sweep around them, returning True if so: the
+        preparation must then be done again."""
+
+        blank_regions = json["strong"]["blank_regions"]
+        if len(blank_regions):
+            blank_regions = [(int(s), int(e)) for s, e in blank_regions]
+            for blank_start, blank_end in blank_regions:
+                logger.info(
+                    "WARNING: Potential blank images: %i -> %i",
+                    blank_start + 1,
+                    blank_end,
+                )
+
+            if PhilIndex.params.xia2.settings.remove_blanks:
+                non_blanks = []
+                start, end = imageset.get_array_range()
+                last_blank_end = start
+                for blank_start, blank_end in blank_regions:
+                    if blank_start > start:
+                        non_blanks.append((last_blank_end, blank_start))
+                    last_blank_end = blank_end
+
+                if last_blank_end + 1 < end:
+                    non_blanks.append((last_blank_end, end))
+
+                xsweep = self.get_indexer_sweep()
+                xwav = xsweep.get_wavelength()
+                xsample = xsweep.sample
+
+                sweep_name = xsweep.get_name()
+
+                for i, (nb_start, nb_end) in enumerate(non_blanks):
+                    assert i < 26
+                    if i == 0:
+                        sub_imageset = imageset[nb_start - start : nb_end - start]
+                        xsweep._frames_to_process = (nb_start + 1, nb_end + 1)
+                        self.set_indexer_prepare_done(done=False)
+                        self._indxr_imagesets[
+                            self._indxr_imagesets.index(imageset)
+                        ] = sub_imageset
+                        xsweep._integrater._setup_from_imageset(sub_imageset)
+                    else:
+                        min_images = PhilIndex.params.xia2.settings.input.min_images
+                        if (nb_end - nb_start) < min_images:
+                            continue
+                        new_name = "_".join((sweep_name, string.ascii_lowercase[i]))
+                        new_sweep = xwav.add_sweep(
+                            new_name,
+                            xsample,
+                            directory=os.path.join(
+                                os.path.basename(xsweep.get_directory()),
+                                new_name,
+                            ),
+                            image=imageset.get_path(nb_start - start),
+                            frames_to_process=(nb_start + 1, nb_end),
+                            beam=xsweep.get_beam_centre(),
+                            reversephi=xsweep.get_reversephi(),
+                            distance=xsweep.get_distance(),
+                            gain=xsweep.get_gain(),
+                            dmin=xsweep.get_resolution_high(),
+                            dmax=xsweep.get_resolution_low(),
+                            polarization=xsweep.get_polarization(),
+                            user_lattice=xsweep.get_user_lattice(),
+                            user_cell=xsweep.get_user_cell(),
+                            epoch=xsweep._epoch,
+                            ice=xsweep._ice,
+                            excluded_regions=xsweep._excluded_regions,
+                        )
+                        logger.info(
+                            "Generating new sweep: %s (%s:%i:%i)",
+                            new_sweep.get_name(),
+                            new_sweep.get_image(),
+                            new_sweep.get_frames_to_process()[0],
+                            new_sweep.get_frames_to_process()[1],
+                        )
+                return True
+        return False
+
+    @staticmethod
+    def _beam_search_image_range(imageset, refl):
+        # set scan_range to correspond to not more than 180 degrees
+        # if we have > 20000 reflections
+        first, last = imageset.get_scan().get_image_range()
+        width = imageset.get_scan().get_oscillation()[1]
+        if (last - first) * width > 180.0 and len(refl) > 20000:
+            return first, first + int(round(180.0 / width)) - 1
+        return None
+
     def _index(self):
         if PhilIndex.params.dials.index.method in (libtbx.Auto, None):
             if self._indxr_input_cell is not None:
                 indexer = self._do_indexing("real_space_grid_search")
             else:
-                try:
-                    indexer_fft3d = self._do_indexing(method="fft3d")
-                    nref_3d, rmsd_3d = indexer_fft3d.get_nref_rmsds()
-                except Exception as e:
-                    nref_3d = None
-                    rmsd_3d = None
-                    indexing_failure = e
-                try:
-                    indexer_fft1d = self._do_indexing(method="fft1d")
-                    nref_1d, rmsd_1d = indexer_fft1d.get_nref_rmsds()
-                except Exception as e:
-                    nref_1d = None
-                    rmsd_1d = None
-                    indexing_failure = e
+                in_parallel = PhilIndex.params.dials.index.concurrent_methods
+                (
+                    (indexer_fft3d, nref_3d, rmsd_3d),
+                    (indexer_fft1d, nref_1d, rmsd_1d),
+                ) = attempts = self._try_indexing_methods(
+                    ("fft3d", "fft1d"), in_parallel=in_parallel
+                )
 
                 if (
                     nref_1d is not None
@@ -537,7 +806,15 @@ class DialsIndexer(Indexer):
                 elif nref_3d is not None:
                     indexer = indexer_fft3d
                 else:
-                    raise RuntimeError(indexing_failure)
+                    # the exception from the last method tried
+                    raise RuntimeError(attempts[-1][0])
+
+                if in_parallel:
+                    FileHandler.record_log_file(
+                        "%s INDEX" % self.get_indexer_full_name(),
+                        indexer.get_log_file(),
+                    )
+                    self._index_report(indexer)
 
         else:
             indexer = self._do_indexing(method=PhilIndex.params.dials.index.method)
@@ -623,14 +900,7 @@ class DialsIndexer(Indexer):
                     if not summary["recommended"]:
                         continue
 
-                experiments = load.experiment_list(
-                    summary["experiments_file"], check_format=False
-                )
-                cryst = experiments.crystals()[0]
-                cs = crystal.symmetry(
-                    unit_cell=cryst.get_unit_cell(), space_group=cryst.get_space_group()
-                )
-                lattice = str(bravais_types.bravais_lattice(group=cs.space_group()))
+                lattice, cell = self._bravais_setting_lattice_cell(summary)
                 cb_op = sgtbx.change_of_basis_op(str(summary["cb_op"]))
 
                 self._solutions[k] = {
@@ -640,7 +910,7 @@ class DialsIndexer(Indexer):
                     "rmsd": summary["rmsd"],
                     "nspots": summary["nspots"],
                     "lattice": lattice,
-                    "cell": cs.unit_cell().parameters(),
+                    "cell": cell,
                     "experiments_file": summary["experiments_file"],
                     "cb_op": str(cb_op),
                 }
@@ -669,24 +939,14 @@ class DialsIndexer(Indexer):
 
             self._indxr_mosaic = self._solution["mosaic"]
 
-            experiments_file = self._solution["experiments_file"]
-            experiment_list = load.experiment_list(experiments_file)
-            self.set_indexer_experiment_list(experiment_list)
-
-            self.set_indexer_payload("experiments_filename", experiments_file)
-
-            # reindex the output reflection list to this solution
-            reindex = self.Reindex()
-            reindex.set_indexed_filename(indexed_file)
-            reindex.set_cb_op(self._solution["cb_op"])
-            reindex.set_space_group(
-                str(lattice_to_spacegroup_number(self._solution["lattice"]))
-            )
-            reindex.run()
-            indexed_file = reindex.get_reindexed_reflections_filename()
-            self.set_indexer_payload("indexed_filename", indexed_file)
+            # the experiments and reflections for this solution are only made
+            # in _index_finish, as index() may yet choose another lattice and
+            # index again, replacing this solution
+            self._discard_pending_solution()
+            self._pending_solution = (self._solution, indexed_file)
 
         else:
+            self._discard_pending_solution()
             experiment_list = load.experiment_list(indexed_experiments)
             self.set_indexer_experiment_list(experiment_list)
             self.set_indexer_payload("experiments_filename", indexed_experiments)
@@ -712,8 +972,10 @@ class DialsIndexer(Indexer):
                 "cell": self._solutions[0]["cell"],
             }
 
-    def _do_indexing(self, method=None):
+    def _do_indexing(self, method=None, nproc=None, report=True):
         indexer = self.Index()
+        if nproc is not None:
+            indexer.set_nproc(nproc)
         for spot_list in self._indxr_payload["spot_lists"]:
             indexer.add_spot_filename(spot_list)
         for filename in self._indxr_payload["experiments"]:
@@ -750,9 +1012,10 @@ class DialsIndexer(Indexer):
             else:
                 method = PhilIndex.params.dials.index.method
 
-        FileHandler.record_log_file(
-            "%s INDEX" % self.get_indexer_full_name(), indexer.get_log_file()
-        )
+        if report:
+            FileHandler.record_log_file(
+                "%s INDEX" % self.get_indexer_full_name(), indexer.get_log_file()
+            )
         indexer.run(method)
 
         if not os.path.exists(indexer.get_experiments_filename()):
@@ -765,6 +1028,44 @@ class DialsIndexer(Indexer):
                 % indexer.get_indexed_filename()
             )
 
+        if report:
+            self._index_report(indexer)
+
+        return indexer
+
+    def _try_indexing_methods(self, methods, in_parallel=False):
+        """Index with each of methods, giving for each (indexer, nref, rmsds),
+        or (exception, None, None) if indexing failed. If in_parallel the
+        methods are tried at the same time, sharing the processors between
+        them, and the log file and report are left to be recorded for the
+        solution chosen."""
+
+        def attempt(method, nproc=None):
+            try:
+                indexer = self._do_indexing(
+                    method=method, nproc=nproc, report=not in_parallel
+                )
+                nref, rmsds = indexer.get_nref_rmsds()
+            except Exception as e:
+                return e, None, None
+            return indexer, nref, rmsds
+
+        if not in_parallel:
+            return [attempt(method) for method in methods]
+
+        nproc = max(
+            1, PhilIndex.params.xia2.settings.multiprocessing.nproc // len(methods)
+        )
+        logger.debug(
+            "Indexing with %s concurrently, %d processors each"
+            % (", ".join(methods), nproc)
+        )
+        scheduler = JobScheduler(max_jobs=len(methods))
+        for method in methods:
+            scheduler.submit(attempt, method, nproc, cpu_threads=nproc)
+        return scheduler.wait()
+
+    def _index_report(self, indexer):
         report = self.Report()
         report.set_experiments_filename(indexer.get_experiments_filename())
         report.set_reflections_filename(indexer.get_indexed_filename())
@@ -778,8 +1079,6 @@ class DialsIndexer(Indexer):
             "%s INDEX" % self.get_indexer_full_name(), html_filename
         )
 
-        return indexer
-
     def _compare_cell(self, c_ref, c_test):
         """Compare two sets of unit cell constants: if they differ by
         less than 5% / 5 degrees return True, else False."""
@@ -830,7 +1129,63 @@ class DialsIndexer(Indexer):
                     "no solution for lattice %s" % self._indxr_input_lattice
                 )
 
+    @staticmethod
+    def _bravais_setting_lattice_cell(summary):
+        """The lattice and unit cell of a Bravais setting, from its summary
+        from dials.refine_bravais_settings, reading the experiments for the
+        setting only if they are not given there."""
+
+        if "bravais" in summary and "unit_cell" in summary:
+            return str(summary["bravais"]), tuple(summary["unit_cell"])
+
+        experiments = load.experiment_list(
+            summary["experiments_file"], check_format=False
+        )
+        cryst = experiments.crystals()[0]
+        cs = crystal.symmetry(
+            unit_cell=cryst.get_unit_cell(), space_group=cryst.get_space_group()
+        )
+        lattice = str(bravais_types.bravais_lattice(group=cs.space_group()))
+        return lattice, cs.unit_cell().parameters()
+
+    def _discard_pending_solution(self):
+        if self._pending_solution is not None:
+            self._pending_solution = None
+            self._reindex_avoided += 1
+
+    def _make_pending_solution(self):
+        """Load the experiments for the chosen solution, and reindex the
+        indexed reflections to it."""
+
+        if self._pending_solution is None:
+            return
+        solution, indexed_file = self._pending_solution
+        self._pending_solution = None
+
+        experiments_file = solution["experiments_file"]
+        experiment_list = load.experiment_list(experiments_file)
+        self.set_indexer_experiment_list(experiment_list)
+
+        self.set_indexer_payload("experiments_filename", experiments_file)
+
+        # reindex the output reflection list to this solution
+        reindex = self.Reindex()
+        reindex.set_indexed_filename(indexed_file)
+        reindex.set_cb_op(solution["cb_op"])
+        reindex.set_space_group(str(lattice_to_spacegroup_number(solution["lattice"])))
+        reindex.run()
+        indexed_file = reindex.get_reindexed_reflections_filename()
+        self.set_indexer_payload("indexed_filename", indexed_file)
+
+        if self._reindex_avoided:
+            logger.debug(
+                "Avoided reindexing for %d solutions replaced before use"
+                % self._reindex_avoided
+            )
+
     def _index_finish(self):
+        self._make_pending_solution()
+
         # get estimate of low resolution limit from lowest resolution indexed
         # reflection
 
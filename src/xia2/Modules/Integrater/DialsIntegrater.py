@@ -11,6 +11,7 @@ import os
 from dxtbx.serialize import load
 
 import xia2.Wrappers.Dials.Integrate
+from xia2.Driver.JobScheduler import JobScheduler, default_max_jobs
 from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Files import FileHandler
 from xia2.Handlers.Phil import PhilIndex
@@ -117,6 +118,15 @@ class DialsIntegrater(Integrater):
 
         integrate.set_reflections_filename(self._intgr_indexed_filename)
 
+        if params.d_max:
+            integrate.set_d_max(params.d_max)
+        else:
+            integrate.set_d_max(self._intgr_reso_low)
+        if params.d_min:
+            integrate.set_d_min(params.d_min)
+        else:
+            integrate.set_d_min(self._intgr_reso_high)
+
         auto_logfiler(integrate, "INTEGRATE")
 
         return integrate
@@ -162,6 +172,11 @@ class DialsIntegrater(Integrater):
         self._data_files = {}
         self._integrate_parameters = {}
 
+        # including any analysis of them started for the scaler
+        from xia2.Modules.Scaler.DialsScaler import discard_sweep_symmetry
+
+        discard_sweep_symmetry(self)
+
     def _integrate_prepare(self):
         """Prepare for integration - in XDS terms this may mean rerunning
         IDXREF to get the XPARM etc. DEFPIX is considered part of the full
@@ -226,8 +241,6 @@ class DialsIntegrater(Integrater):
         """Actually do the integration - in XDS terms this will mean running
         DEFPIX and INTEGRATE to measure all the reflections."""
 
-        integrate = self.Integrate()
-
         # decide what images we are going to process, if not already
         # specified
 
@@ -250,27 +263,26 @@ class DialsIntegrater(Integrater):
             )
             self._intgr_reso_high = d_min_limit
 
-        integrate.set_experiments_filename(self._intgr_experiments_filename)
-        integrate.set_reflections_filename(self._intgr_indexed_filename)
-        if PhilIndex.params.dials.integrate.d_max:
-            integrate.set_d_max(PhilIndex.params.dials.integrate.d_max)
-        else:
-            integrate.set_d_max(self._intgr_reso_low)
-        if PhilIndex.params.dials.integrate.d_min:
-            integrate.set_d_min(PhilIndex.params.dials.integrate.d_min)
-        else:
-            integrate.set_d_min(self._intgr_reso_high)
-
         pname, xname, dname = self.get_integrater_project_info()
         sweep = self.get_integrater_sweep_name()
-        FileHandler.record_log_file(
-            f"{pname} {xname} {dname} {sweep} INTEGRATE",
-            integrate.get_log_file(),
-        )
 
-        integrate.run()
+        wedges = self._integrate_wedge_ranges()
+        if len(wedges) > 1:
+            profiles = self._integrate_in_wedges(wedges)
 
-        self._intgr_experiments_filename = integrate.get_integrated_experiments()
+        else:
+            integrate = self.Integrate()
+            FileHandler.record_log_file(
+                f"{pname} {xname} {dname} {sweep} INTEGRATE",
+                integrate.get_log_file(),
+            )
+
+            integrate.run()
+
+            self._intgr_experiments_filename = integrate.get_integrated_experiments()
+            self._intgr_integrated_reflections = integrate.get_integrated_reflections()
+            self._intgr_per_image_statistics = integrate.get_per_image_statistics()
+            profiles = load.experiment_list(self._intgr_experiments_filename).profiles()
 
         # also record the batch range - needed for the analysis of the
         # radiation damage in chef...
@@ -281,14 +293,12 @@ class DialsIntegrater(Integrater):
         # integration log on the quality of the data and (iii) the mosaic spread
         # range observed and R.M.S. deviations.
 
-        self._intgr_integrated_reflections = integrate.get_integrated_reflections()
         if not os.path.isfile(self._intgr_integrated_reflections):
             raise RuntimeError(
                 "Integration failed: %s does not exist."
                 % self._intgr_integrated_reflections
             )
 
-        self._intgr_per_image_statistics = integrate.get_per_image_statistics()
         logger.info(self.show_per_image_statistics())
 
         report = self.Report()
@@ -302,14 +312,17 @@ class DialsIntegrater(Integrater):
             f"{pname} {xname} {dname} {sweep} INTEGRATE", html_filename
         )
 
-        experiments = load.experiment_list(self._intgr_experiments_filename)
-        profile = experiments.profiles()[0]
-        mosaic = profile.sigma_m()
-        try:
-            m_min, m_max, m_mean = mosaic.min_max_mean().as_tuple()
-            self.set_integrater_mosaic_min_mean_max(m_min, m_mean, m_max)
-        except AttributeError:
-            self.set_integrater_mosaic_min_mean_max(mosaic, mosaic, mosaic)
+        # one profile model per wedge, each scan varying or not
+        mosaic = []
+        for profile in profiles:
+            sigma_m = profile.sigma_m()
+            try:
+                mosaic.extend(sigma_m)
+            except TypeError:
+                mosaic.append(sigma_m)
+        self.set_integrater_mosaic_min_mean_max(
+            min(mosaic), sum(mosaic) / len(mosaic), max(mosaic)
+        )
 
         logger.info(
             "Mosaic spread: %.3f < %.3f < %.3f"
@@ -324,6 +337,102 @@ class DialsIntegrater(Integrater):
 
         return self._intgr_integrated_reflections
 
+    def _integrate_wedge_ranges(self):
+        """The wedges in which to integrate the images, as from wedge_ranges(),
+        each small enough for dials.integrate.wedges.max_memory with its
+        overlap: a single wedge of all of the images if that is not set."""
+
+        params = PhilIndex.params.dials.integrate.wedges
+        first, last = self._intgr_wedge
+
+        if not params.max_memory or first == last:
+            return [((first, last), (first, last))]
+
+        overlap = int(math.ceil(params.overlap / self.get_phi_width()))
+        image_bytes = 8 * sum(
+            panel.get_image_size()[0] * panel.get_image_size()[1]
+            for panel in self.get_imageset().get_detector()
+        )
+        images = int(params.max_memory * 2**30 / image_bytes) - 2 * overlap
+
+        return wedge_ranges(first, last, max(images, 1), overlap)
+
+    def _integrate_in_wedges(self, wedges):
+        """Integrate each of wedges in a dials.integrate job of its own, with
+        the jobs run at the same time, sharing the processors, then merge the
+        reflections and the per-image statistics of the wedges. Returns the
+        profile models of the wedges."""
+
+        params = PhilIndex.params.dials.integrate.wedges
+        max_jobs = min(len(wedges), params.max_jobs or default_max_jobs())
+        nproc = max(1, PhilIndex.params.xia2.settings.multiprocessing.nproc // max_jobs)
+
+        pname, xname, dname = self.get_integrater_project_info()
+        sweep = self.get_integrater_sweep_name()
+
+        logger.info(
+            "Integrating images %d to %d in %d wedges, %d at a time",
+            self._intgr_wedge[0],
+            self._intgr_wedge[1],
+            len(wedges),
+            max_jobs,
+        )
+
+        scheduler = JobScheduler(max_jobs=max_jobs)
+        integrates = []
+        for images, integrate_images in wedges:
+            integrate = self.Integrate()
+            # as an array range, counting from 0 with the end excluded
+            integrate.add_scan_range(integrate_images[0] - 1, integrate_images[1])
+            integrate.set_nproc(nproc)
+            FileHandler.record_log_file(
+                "%s %s %s %s INTEGRATE %d-%d" % (pname, xname, dname, sweep, *images),
+                integrate.get_log_file(),
+            )
+            scheduler.submit(integrate.run, cpu_threads=nproc)
+            integrates.append(integrate)
+        scheduler.wait()
+
+        experiments = load.experiment_list(self._intgr_experiments_filename)
+        profiles = []
+        self._intgr_per_image_statistics = {}
+        for ((first, last), _), integrate in zip(wedges, integrates):
+            profiles.extend(
+                load.experiment_list(
+                    integrate.get_integrated_experiments(), check_format=False
+                ).profiles()
+            )
+            statistics = integrate.get_per_image_statistics()
+            self._intgr_per_image_statistics.update(
+                {i: statistics[i] for i in statistics if first <= i <= last}
+            )
+
+        # the merged reflections belong to the experiment integrated, which
+        # takes the profile model of the first wedge
+        experiments[0].profile = profiles[0]
+        prefix = os.path.join(
+            self.get_working_directory(),
+            "%d_integrated_wedges" % integrates[0].get_xpid(),
+        )
+        self._intgr_experiments_filename = prefix + ".expt"
+        self._intgr_integrated_reflections = prefix + ".refl"
+        experiments.as_file(self._intgr_experiments_filename)
+
+        n_ref = merge_wedge_reflections(
+            [
+                (images, integrate.get_integrated_reflections())
+                for (images, _), integrate in zip(wedges, integrates)
+            ],
+            experiments[0].identifier,
+            self._intgr_integrated_reflections,
+        )
+        logger.debug(
+            "Merged %d reflections from %d wedges into %s"
+            % (n_ref, len(wedges), self._intgr_integrated_reflections)
+        )
+
+        return profiles
+
     def _integrate_finish(self):
         """
         Finish off the integration.
@@ -641,3 +750,50 @@ class DialsIntegrater(Integrater):
         auto_logfiler(anvil_correct)
         anvil_correct.run()
         self._intgr_integrated_reflections = output_reflections
+
+
+def wedge_ranges(first, last, images, overlap):
+    """Split the images first to last into wedges of about the same size, of
+    no more than images images each. Returns, for each wedge, its own images
+    and the images to integrate for it, which extend its own by overlap
+    images on either side, as long as there are images there."""
+
+    n = -(-(last - first + 1) // images)
+    bounds = [first + j * (last - first + 1) // n for j in range(n + 1)]
+    return [
+        (
+            (start, end - 1),
+            (max(first, start - overlap), min(last, end - 1 + overlap)),
+        )
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def merge_wedge_reflections(wedges, identifier, filename):
+    """Merge the reflections integrated for wedges, a list of (images,
+    reflections filename) pairs, taking from each wedge the reflections whose
+    predicted centres lie on its own images, and write them to filename as
+    the reflections of the experiment with identifier. The tables are read
+    one at a time, so that only one is held alongside the merged table.
+    Returns the number of reflections merged."""
+
+    from dials.array_family import flex
+
+    merged = None
+    for (first, last), wedge_filename in wedges:
+        reflections = flex.reflection_table.from_file(wedge_filename)
+        z = reflections["xyzcal.px"].parts()[2]
+        reflections = reflections.select((z >= first - 1) & (z < last))
+        reflections["id"] = flex.int(reflections.size(), 0)
+        identifiers = reflections.experiment_identifiers()
+        for i in list(identifiers.keys()):
+            del identifiers[i]
+        identifiers[0] = identifier
+        if merged is None:
+            merged = reflections
+        else:
+            merged.extend(reflections)
+        del reflections
+
+    merged.as_file(filename)
+    return merged.size()
@@ -7,8 +7,9 @@ import math
 import os
 import pathlib
 import subprocess
+import time
 from dataclasses import asdict, dataclass, field
-from typing import List, Optional, Tuple
+from typing import Callable, List, Optional, Tuple
 
 import numpy as np
 
@@ -19,7 +20,7 @@ from dials.algorithms.indexing.ssx.analysis import generate_html_report
 from dials.array_family import flex
 from dials.util.image_grouping import ParsedYAML
 from dxtbx import flumpy
-from dxtbx.model import ExperimentList
+from dxtbx.model import Experiment, ExperimentList
 from dxtbx.serialize import load
 from libtbx import phil
 
@@ -70,6 +71,10 @@ class AlgorithmParams:
     multiprocessing_method: str = "multiprocessing"
     enable_live_reporting: bool = False
     parsed_grouping: Optional[ParsedYAML] = None
+    watch: bool = False
+    watch_interval: float = 30
+    watch_quiet_period: float = 300
+    watch_timeout: Optional[float] = None
 
 
 def process_batch(
@@ -902,13 +907,21 @@ def process_batches(
     integration_params: IntegrationParams,
     setup_data: dict,
     options: AlgorithmParams,
+    progress: Optional[ProgressReport] = None,
+    batch_callback: Optional[Callable[[dict], None]] = None,
 ):
+    """Process the batches, reporting the cumulative progress after each in
+    progress (a new ProgressReport if not given), after first passing the
+    summary data for the batch to batch_callback, if given."""
 
-    progress = ProgressReport(setup_data)
+    if progress is None:
+        progress = ProgressReport(setup_data)
 
     def process_output(summary_data, add_all_to_progress=True):
         if add_all_to_progress:
             progress.add_all(summary_data)
+        if batch_callback:
+            batch_callback(summary_data)
         progress.summarise()
         if "DataFiles" in summary_data:
             for tag, file in zip(
@@ -946,6 +959,142 @@ def process_batches(
             process_output(summary_data, add_all_to_progress=False)
 
 
+def _input_signature(file_input: FileInput) -> list:
+    """The names, sizes and modification times of the files in the input
+    directories, which change as new images (or HDF5 data files) are written."""
+    if file_input.directories:
+        directories = set(file_input.directories)
+    else:
+        # strip any image range slicing e.g. image.h5:1:100
+        paths = [
+            obj[:2] + obj[2:].split(":")[0]
+            for obj in file_input.images + file_input.templates
+        ]
+        directories = {os.path.dirname(p) for p in paths}
+    signature = []
+    for directory in sorted(directories):
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                signature.append((entry.path, st.st_size, st.st_mtime_ns))
+    return sorted(signature)
+
+
+class CumulativeCellAssessment(object):
+
+    """Keep the unit cell clustering of all crystals indexed so far up to
+    date, as each batch is processed."""
+
+    def __init__(self, progress_reporter: ProgressReport):
+        self.progress_reporter = progress_reporter
+        self.crystals = ExperimentList()
+        self.large_clusters: List[Cluster] = []
+
+    def __call__(self, summary_data: dict) -> None:
+        indexed = summary_data["directory"] / "indexed.expt"
+        if not summary_data.get("n_images_indexed") or not indexed.is_file():
+            return
+        # only the crystal models are needed for the clustering
+        for expt in load.experiment_list(indexed, check_format=False):
+            self.crystals.append(Experiment(crystal=expt.crystal))
+        _, self.large_clusters = clusters_from_experiments(
+            self.crystals, threshold="auto"
+        )
+        if self.large_clusters:
+            self.progress_reporter.add_latest_clustering(
+                f"{condensed_unit_cell_info(self.large_clusters)}"
+            )
+
+
+def process_batches_as_collected(
+    root_working_directory: pathlib.Path,
+    import_wd: pathlib.Path,
+    file_input: FileInput,
+    spotfinding_params: SpotfindingParams,
+    indexing_params: IndexingParams,
+    integration_params: IntegrationParams,
+    options: AlgorithmParams,
+) -> List[pathlib.Path]:
+    """
+    Process the images in batches while they are being collected.
+
+    The input is imported again whenever new files appear, and a new batch is
+    formed and processed as soon as there are batch_size new images. Once no
+    new images have arrived for options.watch_quiet_period seconds (or after
+    options.watch_timeout seconds in total), the remaining images are
+    processed as a final batch.
+    """
+    imported_expts = import_wd / "imported.expt"
+    setup_data: dict = {"images_per_batch": {}}
+    progress = ProgressReport(setup_data)
+    assessment = CumulativeCellAssessment(progress)
+    batch_directories: List[pathlib.Path] = []
+    n_batched = 0
+    n_imported = 0
+    signature = _input_signature(file_input)
+    start = last_change = time.monotonic()
+
+    while True:
+        expts = load.experiment_list(imported_expts, check_format=False)
+        if len(expts) > n_imported:
+            n_imported = len(expts)
+            last_change = time.monotonic()
+        finished = time.monotonic() - last_change >= options.watch_quiet_period
+        if (
+            options.watch_timeout is not None
+            and time.monotonic() - start >= options.watch_timeout
+        ):
+            xia2_logger.warning("Timed out waiting for new images")
+            finished = True
+
+        new_batches = []
+        while n_imported - n_batched >= options.batch_size or (
+            finished and n_imported > n_batched
+        ):
+            end = min(n_batched + options.batch_size, n_imported)
+            subdir = root_working_directory / f"batch_{len(batch_directories) + 1}"
+            if not subdir.is_dir():
+                pathlib.Path.mkdir(subdir)
+            expts[n_batched:end].as_file(subdir / "imported.expt")
+            setup_data["images_per_batch"][subdir] = end - n_batched
+            batch_directories.append(subdir)
+            new_batches.append(subdir)
+            n_batched = end
+        if new_batches:
+            process_batches(
+                new_batches,
+                spotfinding_params,
+                indexing_params,
+                integration_params,
+                setup_data,
+                options,
+                progress=progress,
+                batch_callback=assessment,
+            )
+        if finished:
+            break
+
+        xia2_logger.info(
+            f"{n_imported} images imported, {n_imported - n_batched} awaiting processing; waiting for new images"
+        )
+        time.sleep(options.watch_interval)
+        new_signature = _input_signature(file_input)
+        if new_signature != signature:
+            try:
+                run_import(import_wd, file_input)
+            except ValueError as e:
+                # e.g. an image was still being written, so try again later
+                xia2_logger.info(f"Unable to import the new images yet:\n{e}")
+            else:
+                signature = new_signature
+
+    _report_on_assess_crystals(assessment.crystals, assessment.large_clusters)
+    return batch_directories
+
+
 def check_for_gaps_in_steps(steps: List[str]) -> bool:
     if "find_spots" not in steps:
         if "index" in steps or "integrate" in steps:
@@ -1070,6 +1219,16 @@ def run_data_integration(
         raise ValueError(
             "New data was imported, but there are gaps in the processing steps. Please adjust input."
         )
+    if options.watch:
+        return process_batches_as_collected(
+            root_working_directory,
+            import_wd,
+            file_input,
+            spotfinding_params,
+            indexing_params,
+            integration_params,
+            options,
+        )
     if import_was_run:  # need to setup the batch folders again with new imported.expt
         batch_directories, setup_data = setup_main_process(
             root_working_directory,
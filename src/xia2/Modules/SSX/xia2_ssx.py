@@ -98,6 +98,29 @@ dials_import.phil = None
           "xia2.ssx phil scope will take precedent over identical options"
           "defined in the phil file."
   .expert_level=3
+watch {
+  enabled = False
+    .type = bool
+    .help = "Process the images while they are being collected: check the"
+            "input for new images every watch.interval seconds, and"
+            "integrate a new batch as soon as there are batch_size new images."
+            "The collection is taken to be finished (and the remaining images"
+            "integrated as a final, smaller batch) when there have been no new"
+            "images for watch.quiet_period seconds."
+    .expert_level=2
+  interval = 30
+    .type = float(value_min=0)
+    .help = "How often to check for new images, in seconds."
+    .expert_level=2
+  quiet_period = 300
+    .type = float(value_min=0)
+    .help = "Finish once there have been no new images for this many seconds."
+    .expert_level=2
+  timeout = None
+    .type = float(value_min=0)
+    .help = "Stop waiting for new images after this many seconds in total."
+    .expert_level=3
+}
 spotfinding {
   min_spot_size = 3
     .type = int
@@ -272,6 +295,10 @@ def run_xia2_ssx(
         steps=params.workflow.steps,
         enable_live_reporting=params.enable_live_reporting,
         parsed_grouping=parsed_grouping,
+        watch=params.watch.enabled,
+        watch_interval=params.watch.interval,
+        watch_quiet_period=params.watch.quiet_period,
+        watch_timeout=params.watch.timeout,
     )
 
     if params.assess_crystals.images_to_use:
@@ -9,6 +9,7 @@ import math
 import os
 import re
 
+from xia2.Driver.JobScheduler import JobScheduler
 from xia2.Handlers.CIF import CIF, mmCIF
 from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Files import FileHandler
@@ -677,15 +678,22 @@ class CCP4ScalerA(Scaler):
 
             # ---------- REINDEX TO CORRECT (REFERENCE) SETTING ----------
 
-            for epoch in self._sweep_handler.get_epochs():
+            # if we are working with unified UB matrix then this should not
+            # be a problem here (note, *if*; *should*)
+
+            # what about e.g. alternative P1 settings?
+            # see JIRA MXSW-904
+            if PhilIndex.params.xia2.settings.unify_setting:
+                epochs = []
+            else:
+                epochs = self._sweep_handler.get_epochs()
 
-                # if we are working with unified UB matrix then this should not
-                # be a problem here (note, *if*; *should*)
+            # the pointless runs against the reference are independent of one
+            # another so run them all at once, then apply the results in order
+            scheduler = JobScheduler()
+            pointless_jobs = {}
 
-                # what about e.g. alternative P1 settings?
-                # see JIRA MXSW-904
-                if PhilIndex.params.xia2.settings.unify_setting:
-                    continue
+            for epoch in epochs:
 
                 pl = self._factory.Pointless()
 
@@ -714,9 +722,17 @@ class CCP4ScalerA(Scaler):
                 # construct a reference or a tree of correlations to ensure correct
                 # reference setting - however if small molecule assume has been
                 # multi-sweep-indexed so can ignore "fatal errors" - temporary hack
-                pl.decide_pointgroup(
-                    ignore_errors=PhilIndex.params.xia2.settings.small_molecule
+                scheduler.submit(
+                    pl.decide_pointgroup,
+                    ignore_errors=PhilIndex.params.xia2.settings.small_molecule,
                 )
+                pointless_jobs[epoch] = pl
+
+            scheduler.wait()
+
+            for epoch in epochs:
+                pl = pointless_jobs[epoch]
+                si = self._sweep_handler.get_sweep_information(epoch)
 
                 logger.debug("Reindexing analysis of %s", pl.get_hklin())
 
@@ -332,10 +332,9 @@ class CCP4ScalerHelper:
             logger.debug("No solution found: assuming lattice from refiner")
 
         if need_to_return:
-            if (
-                PhilIndex.params.xia2.settings.integrate_p1
-                and not PhilIndex.params.xia2.settings.reintegrate_correct_lattice
-            ):
+            # the refiners are only reset if the data must be integrated again,
+            # otherwise the integrated reflections are just reindexed
+            if all(refiner.get_refiner_done() for refiner in refiners):
                 need_to_return = False
                 rerun_pointless = True
             else:
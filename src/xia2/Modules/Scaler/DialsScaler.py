@@ -4,9 +4,11 @@
 from __future__ import annotations
 
 import bz2
+import concurrent.futures
 import logging
 import math
 import os
+import threading
 
 import numpy as np
 from orderedset import OrderedSet
@@ -24,6 +26,7 @@ from iotbx import mtz
 from iotbx.scalepack import no_merge_original_index
 from iotbx.scalepack.merge import write as merge_scalepack_write
 
+from xia2.Driver.JobScheduler import CpuBudget
 from xia2.Handlers.CIF import CIF, mmCIF
 from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Files import FileHandler
@@ -56,6 +59,91 @@ from xia2.Wrappers.Dials.TwoThetaRefine import TwoThetaRefine
 logger = logging.getLogger("xia2.Modules.Scaler.DialsScaler")
 
 
+# dials.symmetry jobs on the data from single sweeps, started as soon as
+# each sweep has been integrated (see prepare_sweep_symmetry) and keyed on the
+# integrater, to be picked up by dials_symmetry_decide_pointgroup if they were
+# run on the same files. The jobs are dropped when the integrater is reset,
+# and the threads shut down once the DIALS scaler has decided the symmetry.
+# Only this step is started early: the rest of the per-sweep preparation
+# (export, batch renumbering, resolution analysis) depends on the scaler
+# state or on the other sweeps. The integration of the remaining sweeps, which
+# does not draw on the CpuBudget, is still using the processors meanwhile, so
+# the jobs are run one at a time.
+_prepared_symmetry = {}
+_prepared_symmetry_lock = threading.Lock()
+_prepared_symmetry_executor = None
+
+
+def prepare_sweep_symmetry(integrater, working_directory):
+    """Start the dials.symmetry analysis of the data from one integrater in
+    the background, as it will be needed by _standard_scale_prepare."""
+
+    global _prepared_symmetry_executor
+
+    experiments = [integrater.get_integrated_experiments()]
+    reflections = [integrater.get_integrated_reflections()]
+
+    def decide_pointgroup():
+        n = CpuBudget.acquire(1)
+        try:
+            symmetry_analyser = DialsSymmetry()
+            symmetry_analyser.set_working_directory(working_directory)
+            auto_logfiler(symmetry_analyser)
+            for (exp, refl) in zip(experiments, reflections):
+                symmetry_analyser.add_experiments(exp)
+                symmetry_analyser.add_reflections(refl)
+            symmetry_analyser.decide_pointgroup()
+            return symmetry_analyser
+        finally:
+            CpuBudget.release(n)
+
+    with _prepared_symmetry_lock:
+        if _prepared_symmetry_executor is None:
+            _prepared_symmetry_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="xia2-symmetry"
+            )
+        previous = _prepared_symmetry.pop(integrater, None)
+        if previous is not None:
+            previous[-1].cancel()
+        logger.debug("Starting symmetry analysis of %s", " ".join(reflections))
+        _prepared_symmetry[integrater] = (
+            (tuple(experiments), tuple(reflections), working_directory),
+            _prepared_symmetry_executor.submit(decide_pointgroup),
+        )
+
+
+def _take_prepared_symmetry(experiments, reflections, working_directory):
+    """The symmetry analysis started for these files, if there is one."""
+
+    key = (tuple(experiments), tuple(reflections), working_directory)
+    with _prepared_symmetry_lock:
+        for integrater, (files, future) in _prepared_symmetry.items():
+            if files == key:
+                del _prepared_symmetry[integrater]
+                return future
+    return None
+
+
+def discard_sweep_symmetry(integrater=None, working_directory=None):
+    """Drop the symmetry analysis started for integrater, or for all of the
+    integraters scaled in working_directory, shutting down the threads once
+    none are left."""
+
+    global _prepared_symmetry_executor
+
+    executor = None
+    with _prepared_symmetry_lock:
+        for key, (files, future) in list(_prepared_symmetry.items()):
+            if key is integrater or files[-1] == working_directory:
+                future.cancel()
+                del _prepared_symmetry[key]
+        if not _prepared_symmetry:
+            executor = _prepared_symmetry_executor
+            _prepared_symmetry_executor = None
+    if executor is not None:
+        executor.shutdown()
+
+
 class DialsScaler(Scaler):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -450,6 +538,9 @@ class DialsScaler(Scaler):
         else:
             need_to_return = self._standard_scale_prepare()
 
+        # any symmetry analysis started in advance has now been used
+        discard_sweep_symmetry(working_directory=self.get_working_directory())
+
         if need_to_return:
             self.set_scaler_done(False)
             self.set_scaler_prepare_done(False)
@@ -1315,10 +1406,9 @@ Passing multple datasets to indexer_jiffy but not set multisweep=True"""
         ) = decide_correct_lattice_using_refiner(possible, refiners[0])
 
         if need_to_return and multisweep:
-            if (
-                PhilIndex.params.xia2.settings.integrate_p1
-                and not PhilIndex.params.xia2.settings.reintegrate_correct_lattice
-            ):
+            # the refiners are only reset if the data must be integrated again,
+            # otherwise the integrated reflections are just reindexed
+            if all(refiner.get_refiner_done() for refiner in refiners):
                 need_to_return = False
                 rerun_symmetry = True
             else:
@@ -1358,6 +1448,21 @@ Passing multple datasets to indexer_jiffy but not set multisweep=True"""
 
     def dials_symmetry_decide_pointgroup(self, experiments, reflections):
         """Run the symmetry analyser and return it for later inspection."""
+        prepared = _take_prepared_symmetry(
+            experiments, reflections, self.get_working_directory()
+        )
+        if prepared is not None:
+            try:
+                symmetry_analyser = prepared.result()
+            except Exception as e:
+                logger.debug("Symmetry analysis started in advance failed: %s", e)
+            else:
+                FileHandler.record_log_file(
+                    f"{self._scalr_pname} {self._scalr_xname} SYMMETRY",
+                    symmetry_analyser.get_log_file(),
+                )
+                return symmetry_analyser
+
         symmetry_analyser = DialsSymmetry()
         symmetry_analyser.set_working_directory(self.get_working_directory())
         auto_logfiler(symmetry_analyser)
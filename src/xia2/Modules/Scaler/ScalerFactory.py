@@ -10,7 +10,7 @@ from xia2.Handlers.PipelineSelection import get_preferences
 
 # scaler implementations
 from xia2.Modules.Scaler.CCP4ScalerA import CCP4ScalerA
-from xia2.Modules.Scaler.DialsScaler import DialsScaler
+from xia2.Modules.Scaler.DialsScaler import DialsScaler, prepare_sweep_symmetry
 from xia2.Modules.Scaler.XDSScalerA import XDSScalerA
 
 logger = logging.getLogger("xia2.Modules.Scaler.ScalerFactory")
@@ -46,3 +46,10 @@ def Scaler(*args, **kwargs):
                 raise RuntimeError("preselected scaler dials not available")
 
     return scaler
+
+
+def prepare_sweep(integrater, working_directory):
+    """Start any of the preparation for scaling by the Scaler implementation
+    which will be used which needs only the data from this integrater."""
+    if get_preferences().get("scaler") == "dials":
+        prepare_sweep_symmetry(integrater, working_directory)
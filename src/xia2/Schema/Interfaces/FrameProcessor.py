@@ -28,7 +28,7 @@ from xia2.Experts.FindImages import (
     image2template_directory,
     template_directory_number2image,
 )
-from xia2.Schema import load_imagesets
+from xia2.Schema import load_imagesets, own_models
 
 logger = logging.getLogger("xia2.Schema.Interfaces.FrameProcessor")
 
@@ -124,6 +124,7 @@ class FrameProcessor:
         return self._fp_matching_images
 
     def set_wavelength(self, wavelength):
+        own_models(self._fp_imageset, "beam")
         self.get_beam_obj().set_wavelength(wavelength)
 
     def get_wavelength(self):
@@ -148,6 +149,7 @@ class FrameProcessor:
         return self._fp_polarization
 
     def set_beam_centre(self, beam_centre):
+        own_models(self._fp_imageset, "detector")
         try:
             set_mosflm_beam_centre(
                 self.get_detector(), self.get_beam_obj(), beam_centre
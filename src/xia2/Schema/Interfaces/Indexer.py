@@ -47,7 +47,7 @@ from functools import reduce
 
 from cctbx.sgtbx import bravais_types
 
-from xia2.Experts.LatticeExpert import SortLattices
+from xia2.Experts.LatticeExpert import SameLattice, SortLattices
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Handlers.Streams import banner
 
@@ -699,16 +699,55 @@ class Indexer:
         # ok this means that we need to do something - work through
         # eliminating lattices until the "correct" one is found...
 
+        reintegrate = self._indxr_lattice_needs_reintegration(asserted_lattice)
+
         while self._indxr_helper.get()[0] != asserted_lattice:
             self._indxr_helper.eliminate()
-            if (
-                not PhilIndex.params.xia2.settings.integrate_p1
-                or PhilIndex.params.xia2.settings.reintegrate_correct_lattice
-            ):
+            if reintegrate:
                 self.set_indexer_done(False)
 
         return self.LATTICE_POSSIBLE
 
+    def _indxr_lattice_needs_reintegration(self, asserted_lattice):
+        """Check whether the data must be indexed and integrated again for
+        the asserted lattice, or whether the reflections already integrated
+        may simply be reindexed: the latter if they were integrated in P1,
+        or if the cell found for the asserted lattice is just a change of
+        basis of the current one."""
+
+        settings = PhilIndex.params.xia2.settings
+
+        if settings.integrate_p1:
+            return settings.reintegrate_correct_lattice
+
+        if not settings.reindex_lattice_change:
+            return True
+
+        lattice = self.get_indexer_lattice()
+        cell = self.get_indexer_cell()
+        asserted_cell = dict(self._indxr_helper.get_all())[asserted_lattice]
+
+        if not SameLattice(
+            lattice,
+            cell,
+            asserted_lattice,
+            asserted_cell,
+            relative_length_tolerance=settings.reindex_lattice_change_tolerance,
+        ):
+            logger.debug(
+                "Cell %s for lattice %s differs from %s: will reintegrate"
+                % (asserted_cell, asserted_lattice, cell)
+            )
+            return True
+
+        logger.info(
+            "Lattice %s is a change of basis of the %s cell: will reindex "
+            "rather than reintegrate",
+            asserted_lattice,
+            lattice,
+        )
+        return False
+
     def set_indexer_experiment_list(self, experiments_list):
         self._indxr_experiment_list = experiments_list
 
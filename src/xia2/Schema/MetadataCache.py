@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+
+logger = logging.getLogger("xia2.Schema.MetadataCache")
+
+
+def file_signature(paths):
+    """The path, size and modification time of each of the files, which
+    change if any of the files is replaced or rewritten."""
+
+    signature = []
+    for path in paths:
+        st = os.stat(path)
+        signature.append([os.path.abspath(path), st.st_size, st.st_mtime_ns])
+    return signature
+
+
+class MetadataCache:
+    """A persistent cache of the models read from image headers, in an
+    SQLite database which may be shared between xia2 runs and processes.
+    Each entry is keyed on a description of what was read (e.g. the
+    template and the options used) and is only valid while the files it
+    was read from have the same paths, sizes and modification times. Beyond
+    max_entries entries, the least recently used are removed."""
+
+    def __init__(self, filename, max_entries=10000):
+        self._filename = os.path.abspath(filename)
+        self._max_entries = max_entries
+        directory = os.path.dirname(self._filename)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS metadata ("
+                    "key TEXT PRIMARY KEY, files TEXT, value TEXT, last_used REAL)"
+                )
+        finally:
+            connection.close()
+
+    def get_filename(self):
+        return self._filename
+
+    def _connect(self):
+        # a new connection each time, so the cache can be used from threads
+        return sqlite3.connect(self._filename, timeout=60)
+
+    @staticmethod
+    def key(description):
+        """The key for description, any JSON-serialisable object."""
+        text = json.dumps(description, sort_keys=True)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get(self, description, files):
+        """Return the value stored for description, or None if there is none
+        or if it was stored with a different signature of the files read
+        (e.g. from file_signature)."""
+
+        key = self.key(description)
+        connection = self._connect()
+        try:
+            with connection:
+                row = connection.execute(
+                    "SELECT files, value FROM metadata WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or json.loads(row[0]) != files:
+                    return None
+                connection.execute(
+                    "UPDATE metadata SET last_used = ? WHERE key = ?",
+                    (time.time(), key),
+                )
+            return json.loads(row[1])
+        except (sqlite3.Error, ValueError) as e:
+            logger.debug("Could not read from %s: %s" % (self._filename, e))
+            return None
+        finally:
+            connection.close()
+
+    def put(self, description, files, value):
+        """Store value, a JSON-serialisable object, for description as read
+        from files with the given JSON-serialisable signature."""
+
+        key = self.key(description)
+        connection = self._connect()
+        try:
+            with connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(files), json.dumps(value), time.time()),
+                )
+                connection.execute(
+                    "DELETE FROM metadata WHERE key NOT IN ("
+                    "SELECT key FROM metadata ORDER BY last_used DESC LIMIT ?)",
+                    (self._max_entries,),
+                )
+        except sqlite3.Error as e:
+            logger.debug("Could not write to %s: %s" % (self._filename, e))
+        finally:
+            connection.close()
+
+    def __len__(self):
+        connection = self._connect()
+        try:
+            return connection.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+        finally:
+            connection.close()
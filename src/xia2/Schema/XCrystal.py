@@ -12,7 +12,7 @@ from xia2.Handlers.Phil import PhilIndex
 from xia2.Handlers.Streams import banner
 from xia2.Handlers.Syminfo import get_pointgroup
 from xia2.lib.NMolLib import compute_nmol, compute_solvent
-from xia2.Modules.Scaler.ScalerFactory import Scaler
+from xia2.Modules.Scaler.ScalerFactory import Scaler, prepare_sweep
 
 
 class _aa_sequence:
@@ -754,6 +754,29 @@ class XCrystal:
         """Get the scaling statistics for this sample."""
         return self._get_scaler().get_scaler_statistics()
 
+    def _get_scale_path(self):
+        from libtbx import Auto
+
+        scale_dir = PhilIndex.params.xia2.settings.scale.directory
+        if scale_dir is Auto:
+            scale_dir = "scale"
+        working_path = self._project.path.joinpath(self._name, scale_dir)
+        working_path.mkdir(parents=True, exist_ok=True)
+        return working_path
+
+    def prepare_for_scaling(self, integrater):
+        """Start any of the preparation for scaling which depends only on
+        the data from this integrater, once it has finished, while the other
+        sweeps are still being integrated."""
+
+        if self._scaler is not None or self._user_spacegroup:
+            return
+        n_sweeps = sum(len(w.get_sweeps()) for w in self._wavelengths.values())
+        if n_sweeps > 1 and PhilIndex.params.xia2.settings.multi_sweep_indexing:
+            # the symmetry of all of the sweeps is analysed together
+            return
+        prepare_sweep(integrater, str(self._get_scale_path()))
+
     def _get_scaler(self):
         if self._scaler is None:
 
@@ -765,13 +788,7 @@ class XCrystal:
             # if both of these are true then produce a null scaler
             # which will wrap this information
 
-            from libtbx import Auto
-
-            scale_dir = PhilIndex.params.xia2.settings.scale.directory
-            if scale_dir is Auto:
-                scale_dir = "scale"
-            working_path = self._project.path.joinpath(self._name, scale_dir)
-            working_path.mkdir(parents=True, exist_ok=True)
+            working_path = self._get_scale_path()
 
             self._scaler = Scaler(base_path=self._project.path)
 
@@ -21,6 +21,37 @@ from xia2.Schema.XWavelength import XWavelength
 logger = logging.getLogger("xia2.Schema.XProject")
 
 
+# the first characters of the strings which float() may accept
+_numeric_start = frozenset("0123456789+-. \t\n\r\x0b\x0ciInN")
+
+
+def _decode_dict(data):
+    """Decode possible float and int keys: used as the object_hook of
+    json.loads, which calls it for the innermost objects first."""
+    rv = {}
+    for key, value in data.items():
+        # most keys are attribute names, which are quickly passed over
+        if key[:1] in _numeric_start:
+            try:
+                key = float(key)
+                if int(key) == key:
+                    key = int(key)
+            except (ValueError, OverflowError):
+                pass
+        rv[key] = value
+    return rv
+
+
+def dict_from_json(filename=None, string=None):
+    """Read the dictionary representation of a project (or of any part of
+    it) from a file or string written by as_json, without creating it."""
+    assert [filename, string].count(None) == 1
+    if filename:
+        with open(filename, "rb") as f:
+            string = f.read()
+    return json.loads(string, object_hook=_decode_dict)
+
+
 class XProject:
     """A representation of a complete project. This will contain a dictionary
     of crystals."""
@@ -88,21 +119,6 @@ class XProject:
 
     @classmethod
     def from_json(cls, filename=None, string=None):
-        def _decode_dict(data):
-            """Recursively decode possible float and int values."""
-            rv = {}
-            for key, value in data.items():
-                if isinstance(value, dict):
-                    value = _decode_dict(value)
-                try:
-                    key = float(key)
-                    if int(key) == key:
-                        key = int(key)
-                except ValueError:
-                    pass
-                rv[key] = value
-            return rv
-
         assert [filename, string].count(None) == 1
         if filename:
             with open(filename, "rb") as f:
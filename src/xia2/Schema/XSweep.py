@@ -8,6 +8,7 @@ from __future__ import annotations
 
 import copy
 import inspect
+import json
 import logging
 import math
 import os
@@ -16,7 +17,11 @@ import time
 
 from xia2.Experts.Filenames import expand_path
 from xia2.Experts.FindImages import (
+    file_mtimes,
+    find_unreadable_files,
     image2template_directory,
+    sample_images,
+    summarise_ranges,
     template_directory_number2image,
 )
 from xia2.Handlers.Phil import PhilIndex
@@ -182,7 +187,7 @@ class XSweep:
                 os.path.join(directory, image)
             )
 
-            from xia2.Schema import load_imagesets
+            from xia2.Schema import load_imagesets, share_imageset
 
             imagesets = load_imagesets(
                 self._template,
@@ -194,7 +199,9 @@ class XSweep:
             assert len(imagesets) == 1, "one imageset expected, %d found" % len(
                 imagesets
             )
-            self._imageset = copy.deepcopy(imagesets[0])
+            # the models are shared with the cached imageset, so are copied
+            # before being changed in place (see own_models)
+            self._imageset = share_imageset(imagesets[0])
             start, end = self._imageset.get_array_range()
             self._images = list(range(start + 1, end + 1))
 
@@ -207,24 +214,30 @@ class XSweep:
 
             start, end = self._frames_to_process
 
-            error = False
-
+            check_params = params.general.check_images
             if params.general.check_image_files_readable:
-                for j in range(start, end + 1):
-                    if j not in self._images:
-                        logger.debug(
-                            "image %i missing for %s"
-                            % (j, self.get_imageset().get_template())
+                missing = set(range(start, end + 1)).difference(self._images)
+                if missing:
+                    logger.debug(
+                        "images %s missing for %s"
+                        % (
+                            summarise_ranges(missing),
+                            self.get_imageset().get_template(),
                         )
-                        error = True
-                        continue
-                    image_name = self.get_imageset().get_path(j - start)
-                    if not os.access(image_name, os.R_OK):
-                        logger.debug("image %s unreadable" % image_name)
-                        error = True
-                        continue
-
-                if error:
+                    )
+
+                present = [j for j in range(start, end + 1) if j not in missing]
+                unreadable = find_unreadable_files(
+                    [
+                        self.get_imageset().get_path(j - start)
+                        for j in sample_images(present, check_params.every)
+                    ],
+                    nproc=check_params.nproc,
+                )
+                for image_name in unreadable:
+                    logger.debug("image %s unreadable" % image_name)
+
+                if missing or unreadable:
                     raise RuntimeError("problem with sweep %s" % self._name)
 
             beam_ = self._imageset.get_beam()
@@ -269,12 +282,18 @@ class XSweep:
             else:
                 images = self._images
 
-            for j in images:
-                epoch = scan.get_image_epoch(j)
-                if epoch == 0.0:
-                    epoch = float(
-                        os.stat(self._imageset.get_path(j - images[0])).st_mtime
-                    )
+            epochs = [scan.get_image_epoch(j) for j in images]
+
+            # use the file modification times for images without an epoch
+            no_epoch = [i for i, epoch in enumerate(epochs) if epoch == 0.0]
+            mtimes = file_mtimes(
+                [self._imageset.get_path(i) for i in no_epoch],
+                nproc=check_params.nproc,
+            )
+            for i, mtime in zip(no_epoch, mtimes):
+                epochs[i] = mtime
+
+            for j, epoch in zip(images, epochs):
                 self._epoch_to_image[epoch] = j
                 self._image_to_epoch[j] = epoch
 
@@ -285,7 +304,12 @@ class XSweep:
                 % (self._template, min(epochs), max(epochs))
             )
 
-        self._input_imageset = copy.deepcopy(self._imageset)
+        if self._imageset is not None:
+            from xia2.Schema import share_imageset
+
+            self._input_imageset = share_imageset(self._imageset)
+        else:
+            self._input_imageset = None
 
         # + get the lattice - can this be a pointer, so that when
         #   this object updates lattice it is globally-for-this-crystal
@@ -316,6 +340,9 @@ class XSweep:
         if beam is not None:
             from dxtbx.model.detector_helpers import set_mosflm_beam_centre
 
+            from xia2.Schema import own_models
+
+            own_models(self.get_imageset(), "detector")
             try:
                 set_mosflm_beam_centre(
                     self.get_imageset().get_detector(),
@@ -370,21 +397,7 @@ class XSweep:
         return_obj = cls(name=None, sample=None, wavelength=None)
         for k, v in obj.items():
             if k in ("_indexer", "_refiner", "_integrater") and v is not None:
-                from libtbx.utils import import_python_object
-
-                cls = import_python_object(
-                    import_path=".".join((v["__module__"], v["__name__"])),
-                    error_prefix="",
-                    target_must_be="",
-                    where_str="",
-                ).object
-                v = cls.from_dict(v)
-                if k == "_indexer":
-                    v.add_indexer_sweep(return_obj)
-                elif k == "_refiner":
-                    v.add_refiner_sweep(return_obj)
-                elif k == "_integrater":
-                    v.set_integrater_sweep(return_obj, reset=False)
+                v = return_obj._processing_object_from_dict(k, v)
             if isinstance(v, dict):
                 # if v.get('__id__') == 'ExperimentList':
                 # from dxtbx.model.experiment_list import ExperimentListFactory
@@ -394,16 +407,62 @@ class XSweep:
 
                     v = imageset_from_dict(v, check_format=False)
             setattr(return_obj, k, v)
-        if return_obj._indexer is not None and return_obj._integrater is not None:
-            return_obj._integrater._intgr_indexer = return_obj._indexer
-        if return_obj._integrater is not None and return_obj._refiner is not None:
-            return_obj._integrater._intgr_refiner = return_obj._refiner
-        if return_obj._indexer is not None and return_obj._refiner is not None:
-            return_obj._refiner._refinr_indexers[
-                return_obj.get_epoch(1)
-            ] = return_obj._indexer
+        return_obj._link_processing_objects()
         return return_obj
 
+    def _processing_object_from_dict(self, k, v):
+        """Create the indexer, refiner or integrater k from its dictionary
+        representation v, attached to this sweep."""
+        from libtbx.utils import import_python_object
+
+        cls = import_python_object(
+            import_path=".".join((v["__module__"], v["__name__"])),
+            error_prefix="",
+            target_must_be="",
+            where_str="",
+        ).object
+        v = cls.from_dict(v)
+        if k == "_indexer":
+            v.add_indexer_sweep(self)
+        elif k == "_refiner":
+            v.add_refiner_sweep(self)
+        elif k == "_integrater":
+            v.set_integrater_sweep(self, reset=False)
+        return v
+
+    def _link_processing_objects(self):
+        if self._indexer is not None and self._integrater is not None:
+            self._integrater._intgr_indexer = self._indexer
+        if self._integrater is not None and self._refiner is not None:
+            self._integrater._intgr_refiner = self._refiner
+        if self._indexer is not None and self._refiner is not None:
+            self._refiner._refinr_indexers[self.get_epoch(1)] = self._indexer
+
+    def get_processing_state(self):
+        """The dictionary representation of the indexer, refiner and
+        integrater of this sweep, as it would be read back from xia2.json,
+        for set_processing_state."""
+        from xia2.Schema.XProject import dict_from_json
+
+        obj = {"__id__": "XSweep"}
+        for k in ("_indexer", "_refiner", "_integrater"):
+            v = getattr(self, k)
+            obj[k] = v.to_dict() if v is not None else None
+        return dict_from_json(string=json.dumps(obj, skipkeys=True))
+
+    def set_processing_state(self, obj):
+        """Replace the indexer, refiner and integrater of this sweep with
+        those from obj, the dictionary representation of this sweep after it
+        was processed elsewhere (see process_one_sweep), without recreating
+        the rest of the sweep."""
+        assert obj["__id__"] == "XSweep"
+        for k in ("_indexer", "_refiner", "_integrater"):
+            v = obj.get(k)
+            if v is not None:
+                v = self._processing_object_from_dict(k, v)
+            setattr(self, k, v)
+        self._link_processing_objects()
+
     def get_image_name(self, number):
         """Convert an image number into a name."""
 
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import collections
+import copy
 import glob
 import itertools
 import logging
@@ -16,21 +17,101 @@ from dxtbx.model.experiment_list import (
     ExperimentListFactory,
     GoniometerComparison,
 )
-from dxtbx.sequence_filenames import locate_files_matching_template_string
 from scitbx.array_family import flex
 
+from xia2.Experts.FindImages import (
+    find_matching_images,
+    template_directory_number2image,
+)
 from xia2.Handlers.Phil import PhilIndex
 
 logger = logging.getLogger("xia2.Schema")
 
 
-class _ImagesetCache(dict):
-    pass
+class _ImagesetCache(collections.OrderedDict):
+    """The imagesets for each template, by the first image number of each:
+    those added by add_imageset are kept, and otherwise only those for the
+    max_size most recently used templates. The models read from the image
+    headers may also be kept in a MetadataCache (see set_metadata_cache)."""
+
+    def __init__(self, max_size=1000):
+        super().__init__()
+        self._max_size = max_size
+        self._keep = set()
+        self._metadata_cache = None
+
+    def __getitem__(self, template):
+        value = super().__getitem__(template)
+        self.move_to_end(template)
+        return value
+
+    def __setitem__(self, template, value):
+        super().__setitem__(template, value)
+        self.move_to_end(template)
+        self._evict()
+
+    def _evict(self):
+        for template in list(self):
+            if len(self) <= self._max_size:
+                break
+            if template not in self._keep:
+                del self[template]
+
+    def add_imageset(self, template, imageset):
+        """Add an imageset which can not be made again from the images,
+        e.g. one loaded from an experiment list, so must not be evicted."""
+        self._keep.add(template)
+        if template not in self:
+            self[template] = collections.OrderedDict()
+        self[template][imageset.get_scan().get_image_range()[0]] = imageset
+
+    def set_max_size(self, max_size):
+        self._max_size = max_size
+        self._evict()
+
+    def set_metadata_cache(self, metadata_cache):
+        """Keep the models read from the image headers in metadata_cache (a
+        MetadataCache, or None) and look them up there before reading the
+        image headers."""
+        self._metadata_cache = metadata_cache
+
+    def get_metadata_cache(self):
+        return self._metadata_cache
 
 
 imageset_cache = _ImagesetCache()
 
 
+def _read_experiments(description, paths, read, image_numbers=None):
+    """Return the experiments from read(), or those it returned before for
+    the same description if the files in paths, which read() opens, have not
+    changed since, nor the image_numbers found for the template, if given."""
+
+    metadata_cache = imageset_cache.get_metadata_cache()
+    if metadata_cache is None:
+        return read()
+
+    from xia2.Schema.MetadataCache import file_signature
+
+    try:
+        files = [file_signature(paths), image_numbers]
+    except OSError:
+        return read()
+
+    obj = metadata_cache.get(description, files)
+    if obj is not None:
+        try:
+            experiments = ExperimentListFactory.from_dict(obj)
+            logger.debug("Using cached image headers for %s" % description["path"])
+            return experiments
+        except Exception as e:
+            logger.debug("Could not use cached image headers: %s" % e)
+
+    experiments = read()
+    metadata_cache.put(description, files, experiments.to_dict())
+    return experiments
+
+
 def longest_common_substring(s1, s2):
     m = [[0] * (1 + len(s2)) for i in range(1 + len(s1))]
     longest, x_longest = 0, 0
@@ -86,6 +167,25 @@ def load_imagesets(
             "multi_panel": params.input.format.multi_panel,
         }
 
+        # what is read from the images, as a key for the metadata cache
+        description = {
+            "path": full_template_path,
+            "format_kwargs": format_kwargs,
+            "tolerances": [
+                params.input.tolerance.beam.wavelength,
+                params.input.tolerance.beam.direction,
+                params.input.tolerance.beam.polarization_normal,
+                params.input.tolerance.beam.polarization_fraction,
+                params.input.tolerance.detector.fast_axis,
+                params.input.tolerance.detector.slow_axis,
+                params.input.tolerance.detector.origin,
+                params.input.tolerance.goniometer.rotation_axis,
+                params.input.tolerance.goniometer.fixed_rotation,
+                params.input.tolerance.goniometer.setting_rotation,
+                scan_tolerance,
+            ],
+        }
+
         if os.path.splitext(full_template_path)[-1] in known_hdf5_extensions:
             # if we are passed the correct file, use this, else look for a master
             # file (i.e. something_master.h5)
@@ -97,44 +197,20 @@ def load_imagesets(
             else:
                 g = glob.glob(os.path.join(directory, "*_master.h5"))
                 master_file = None
+                longest = 0
                 for p in g:
                     substr = longest_common_substring(template, p)
-                    if substr:
-                        if master_file is None or (
-                            len(substr)
-                            > len(longest_common_substring(template, master_file))
-                        ):
-                            master_file = p
+                    if len(substr) > longest:
+                        master_file = p
+                        longest = len(substr)
 
             if master_file is None:
                 raise RuntimeError("Can't find master file for %s" % full_template_path)
 
-            unhandled = []
-            experiments = ExperimentListFactory.from_filenames(
-                [master_file],
-                unhandled=unhandled,
-                compare_beam=compare_beam,
-                compare_detector=compare_detector,
-                compare_goniometer=compare_goniometer,
-                scan_tolerance=scan_tolerance,
-                format_kwargs=format_kwargs,
-            )
-
-            assert len(unhandled) == 0, (
-                "unhandled image files identified: %s" % unhandled
-            )
-
-        else:
-            params = PhilIndex.get_python_object()
-            read_all_image_headers = params.xia2.settings.read_all_image_headers
-
-            if read_all_image_headers:
-                paths = sorted(
-                    locate_files_matching_template_string(full_template_path)
-                )
+            def read():
                 unhandled = []
                 experiments = ExperimentListFactory.from_filenames(
-                    paths,
+                    [master_file],
                     unhandled=unhandled,
                     compare_beam=compare_beam,
                     compare_detector=compare_detector,
@@ -142,25 +218,77 @@ def load_imagesets(
                     scan_tolerance=scan_tolerance,
                     format_kwargs=format_kwargs,
                 )
+
                 assert len(unhandled) == 0, (
                     "unhandled image files identified: %s" % unhandled
                 )
+                return experiments
+
+            paths = [master_file]
+            image_numbers = None
+            description["path"] = master_file
+
+        else:
+            params = PhilIndex.get_python_object()
+            read_all_image_headers = params.xia2.settings.read_all_image_headers
+            image_numbers = find_matching_images(template, directory)
+
+            if read_all_image_headers:
+                paths = [
+                    template_directory_number2image(template, directory, image)
+                    for image in image_numbers
+                ]
+
+                def read():
+                    unhandled = []
+                    experiments = ExperimentListFactory.from_filenames(
+                        paths,
+                        unhandled=unhandled,
+                        compare_beam=compare_beam,
+                        compare_detector=compare_detector,
+                        compare_goniometer=compare_goniometer,
+                        scan_tolerance=scan_tolerance,
+                        format_kwargs=format_kwargs,
+                    )
+                    assert len(unhandled) == 0, (
+                        "unhandled image files identified: %s" % unhandled
+                    )
+                    return experiments
 
             else:
                 from xia2.Handlers.CommandLine import CommandLine
 
-                experiments = ExperimentList()
                 start_ends = CommandLine.get_start_ends(full_template_path)
                 if not start_ends:
                     start_ends.append(None)
-                for start_end in start_ends:
-                    experiments.extend(
-                        ExperimentList.from_templates(
-                            [full_template_path],
-                            format_kwargs=format_kwargs,
-                            image_range=start_end,
-                        )
+                description["start_ends"] = start_ends
+                # only the first image of each range is opened, so rather than
+                # every image file only these are checked, with the numbers
+                # of the images found
+                paths = [
+                    template_directory_number2image(
+                        template,
+                        directory,
+                        start_end[0] if start_end else min(image_numbers, default=0),
                     )
+                    for start_end in start_ends
+                ]
+
+                def read():
+                    experiments = ExperimentList()
+                    for start_end in start_ends:
+                        experiments.extend(
+                            ExperimentList.from_templates(
+                                [full_template_path],
+                                format_kwargs=format_kwargs,
+                                image_range=start_end,
+                            )
+                        )
+                    return experiments
+
+            description["read_all_image_headers"] = read_all_image_headers
+
+        experiments = _read_experiments(description, paths, read, image_numbers)
 
         imagesets = [
             iset for iset in experiments.imagesets() if isinstance(iset, ImageSequence)
@@ -235,6 +363,24 @@ def load_imagesets(
     return list(imageset_cache[full_template_path].values())
 
 
+def share_imageset(imageset):
+    """A new imageset of the same images as imageset, sharing its image
+    reader and its models rather than copying them as copy.deepcopy() would:
+    the models may be replaced freely, but must be copied with own_models()
+    before they are changed in place."""
+    return imageset[0 : len(imageset)]
+
+
+def own_models(imageset, *models):
+    """Replace each of the named models ("beam", "detector", "goniometer" or
+    "scan") of imageset with a copy of its own, so that changing it in place
+    does not change the imagesets it was shared with by share_imageset()."""
+    for model in models:
+        value = getattr(imageset, "get_%s" % model)()
+        if value is not None:
+            getattr(imageset, "set_%s" % model)(copy.deepcopy(value))
+
+
 def update_with_reference_geometry(imagesets, reference_geometry_list):
     assert reference_geometry_list is not None
     assert len(reference_geometry_list) >= 1
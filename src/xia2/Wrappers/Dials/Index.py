@@ -57,6 +57,7 @@ def Index(DriverType=None):
             self._phil_file = None
             self._outlier_algorithm = None
             self._close_to_spindle_cutoff = None
+            self._nproc = None
 
         def add_sweep_filename(self, sweep_filename):
             self._sweep_filenames.append(sweep_filename)
@@ -121,6 +122,9 @@ def Index(DriverType=None):
         def set_close_to_spindle_cutoff(self, close_to_spindle_cutoff):
             self._close_to_spindle_cutoff = close_to_spindle_cutoff
 
+        def set_nproc(self, nproc):
+            self._nproc = nproc
+
         def run(self, method):
             logger.debug("Running dials.index")
 
@@ -132,7 +136,7 @@ def Index(DriverType=None):
             if len(self._sweep_filenames) > 1:
                 self.add_command_line("auto_reduction.action=fix")
             self.add_command_line("indexing.method=%s" % method)
-            nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
+            nproc = self._nproc or PhilIndex.params.xia2.settings.multiprocessing.nproc
             self.set_cpu_threads(nproc)
             self.add_command_line("indexing.nproc=%i" % nproc)
             if PhilIndex.params.xia2.settings.small_molecule:
@@ -200,6 +204,12 @@ def Index(DriverType=None):
             self.add_command_line("output.experiments=%s" % self._experiment_filename)
             self.add_command_line("output.reflections=%s" % self._indexed_filename)
 
+            input_files = self._sweep_filenames + self._spot_filenames
+            if self._phil_file is not None:
+                input_files.append(self._phil_file)
+            self.set_input_files(input_files)
+            self.set_output_files([self._experiment_filename, self._indexed_filename])
+
             self.start()
             self.close_wait()
 
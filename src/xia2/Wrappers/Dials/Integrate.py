@@ -42,6 +42,7 @@ def Integrate(DriverType=None):
             self._d_min = None
             self._scan_range = []
             self._reflections_per_degree = None
+            self._nproc = None
 
             # The minimum number of spots required for profile modelling, per degree
             # and overall.
@@ -119,6 +120,9 @@ def Integrate(DriverType=None):
         def add_scan_range(self, start, stop):
             self._scan_range.append((start, stop))
 
+        def set_nproc(self, nproc):
+            self._nproc = nproc
+
         def get_integrated_reflections(self):
             return self._integrated_reflections
 
@@ -136,7 +140,7 @@ def Integrate(DriverType=None):
 
             self.clear_command_line()
             self.add_command_line("input.experiments=%s" % self._experiments_filename)
-            nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
+            nproc = self._nproc or PhilIndex.params.xia2.settings.multiprocessing.nproc
             njob = PhilIndex.params.xia2.settings.multiprocessing.njob
             mp_mode = PhilIndex.params.xia2.settings.multiprocessing.mode
             mp_type = PhilIndex.params.xia2.settings.multiprocessing.type
@@ -202,6 +206,18 @@ def Integrate(DriverType=None):
                     "gaussian_rs.min_spots.overall=%d" % self._min_spots_overall
                 )
 
+            input_files = [self._experiments_filename, self._reflections_filename]
+            if self._phil_file is not None:
+                input_files.append(self._phil_file)
+            self.set_input_files(input_files)
+            self.set_output_files(
+                [
+                    self._integrated_experiments,
+                    self._integrated_reflections,
+                    self._integration_report_filename,
+                ]
+            )
+
             self.start()
             self.close_wait()
 
@@ -36,6 +36,7 @@ def Spotfinder(DriverType=None):
             self._hot_mask_prefix = None
             self._gain = None
             self._maximum_trusted_value = None
+            self._nproc = None
 
         def set_input_sweep_filename(self, sweep_filename):
             self._input_sweep_filename = sweep_filename
@@ -91,6 +92,9 @@ def Spotfinder(DriverType=None):
         def set_gain(self, gain):
             self._gain = gain
 
+        def set_nproc(self, nproc):
+            self._nproc = nproc
+
         def set_maximum_trusted_value(self, maximum_trusted_value):
             self._maximum_trusted_value = maximum_trusted_value
 
@@ -104,7 +108,7 @@ def Spotfinder(DriverType=None):
                     "output.experiments=%s" % self._output_sweep_filename
                 )
             self.add_command_line("output.reflections=%s" % self._input_spot_filename)
-            nproc = PhilIndex.params.xia2.settings.multiprocessing.nproc
+            nproc = self._nproc or PhilIndex.params.xia2.settings.multiprocessing.nproc
             njob = PhilIndex.params.xia2.settings.multiprocessing.njob
             mp_mode = PhilIndex.params.xia2.settings.multiprocessing.mode
             mp_type = PhilIndex.params.xia2.settings.multiprocessing.type
@@ -148,6 +152,19 @@ def Spotfinder(DriverType=None):
                 self.add_command_line(
                     "maximum_trusted_value=%f" % self._maximum_trusted_value
                 )
+
+            input_files = [self._input_sweep_filename]
+            if self._phil_file is not None:
+                input_files.append(self._phil_file)
+            self.set_input_files(input_files)
+            # the hot mask files are not declared, so cannot be cached
+            output_files = []
+            if not self._write_hot_mask:
+                output_files.append(self._input_spot_filename)
+                if self._output_sweep_filename is not None:
+                    output_files.append(self._output_sweep_filename)
+            self.set_output_files(output_files)
+
             self.start()
             self.close_wait()
             self.check_for_errors()
@@ -21,6 +21,7 @@ def Integrate(DriverType=None):
             self._njob = None
             self._mp_mode = None
             self._phil_file = None
+            self._project_directory = None
 
         def add_command_line_args(self, args):
             self._argv.extend(args)
@@ -37,6 +38,9 @@ def Integrate(DriverType=None):
         def set_phil_file(self, phil_file):
             self._phil_file = phil_file
 
+        def set_project_directory(self, project_directory):
+            self._project_directory = project_directory
+
         def run(self):
             logger.debug("Running xia2.integrate")
 
@@ -57,6 +61,9 @@ def Integrate(DriverType=None):
             if self._mp_mode is not None:
                 self.add_command_line("multiprocessing.mode=%s" % self._mp_mode)
 
+            if self._project_directory is not None:
+                self.add_command_line("project_directory=%s" % self._project_directory)
+
             self.add_command_line("failover=False")
 
             self.start()
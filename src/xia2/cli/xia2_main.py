@@ -1,6 +1,8 @@
 from __future__ import annotations
 
+import concurrent.futures
 import logging
+import multiprocessing
 import os
 import sys
 import time
@@ -13,7 +15,11 @@ from libtbx import group_args
 import xia2.Driver.timing
 import xia2.Handlers.Streams
 import xia2.XIA2Version
-from xia2.Applications.xia2_helpers import process_one_sweep
+from xia2.Applications.xia2_helpers import (
+    init_sweep_worker,
+    process_one_sweep,
+    process_sweep_in_worker,
+)
 from xia2.Applications.xia2_main import (
     check_environment,
     get_command_line,
@@ -23,7 +29,6 @@ from xia2.Applications.xia2_main import (
 from xia2.Handlers.Citations import Citations
 from xia2.Handlers.Files import cleanup
 from xia2.Schema.XProject import XProject
-from xia2.Schema.XSweep import XSweep
 
 logger = logging.getLogger("xia2.cli.xia2_main")
 
@@ -137,11 +142,19 @@ def xia2_main(stop_after=None):
 
     failover = params.xia2.settings.failover
 
+    # start the per-sweep preparation for scaling as each sweep finishes
+    pipeline_scaling = mp_params.pipeline_scaling and stop_after not in (
+        "index",
+        "integrate",
+    )
+
     with cleanup(xinfo.path):
         if mp_params.mode == "parallel" and njob > 1:
             driver_type = mp_params.type
             command_line_args = CommandLine.get_argv()[1:]
             jobs = []
+            costs = []
+            job_sweeps = []
             for crystal_id in crystals:
                 for wavelength_id in crystals[crystal_id].get_wavelength_names():
                     wavelength = crystals[crystal_id].get_xwavelength(wavelength_id)
@@ -164,6 +177,11 @@ def xia2_main(stop_after=None):
                                 ),
                             )
                         )
+                        # the time to process a sweep is roughly proportional
+                        # to the number of images
+                        start, end = sweep.get_image_range()
+                        costs.append(end - start + 1)
+                        job_sweeps.append((crystals[crystal_id], sweep))
 
             from xia2.Driver.DriverFactory import DriverFactory
 
@@ -174,23 +192,49 @@ def xia2_main(stop_after=None):
                 if (i_job % njob) == 0:
                     arg[0].driver_type = default_driver_type
 
-            nproc = mp_params.nproc
-            qsub_command = mp_params.qsub_command or "qsub"
-            qsub_command = "%s -V -cwd -pe smp %d" % (qsub_command, nproc)
+            # share the njob * nproc processors between the sweeps according
+            # to their size, rather than giving each sweep nproc
+            from xia2.Driver.CoreScheduler import CoreScheduler
 
-            from libtbx import easy_mp
+            scheduler = CoreScheduler(total_cores=njob * mp_params.nproc, max_jobs=njob)
 
-            results = easy_mp.parallel_map(
-                process_one_sweep,
-                jobs,
-                processes=njob,
-                method="multiprocessing",
-                qsub_command=qsub_command,
-                preserve_order=True,
-                preserve_exception_message=True,
+            # with sweep_workers, the sweeps are processed in processes forked
+            # from this one, which already hold the parameters and imagesets,
+            # rather than each in a new xia2.integrate
+            sweep_workers = (
+                mp_params.sweep_workers
+                and driver_type == "simple"
+                and "fork" in multiprocessing.get_all_start_methods()
             )
+            if sweep_workers:
+                for job, cost in zip(jobs, costs):
+                    scheduler.submit(cost, process_sweep_in_worker, job)
+                executor = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=njob,
+                    mp_context=multiprocessing.get_context("fork"),
+                    initializer=init_sweep_worker,
+                    initargs=(xinfo,),
+                )
+            else:
+                for job, cost in zip(jobs, costs):
+                    scheduler.submit(cost, process_one_sweep, job)
+                executor = concurrent.futures.ProcessPoolExecutor(max_workers=njob)
+
+            # update each sweep with the serialized indexer/refiner/integrater
+            # as soon as it has been processed, while others are still running
+            def sweep_finished(i_job, result):
+                success, _, xsweep_dict, _ = result
+                if not success:
+                    return
+                crystal, sweep = job_sweeps[i_job]
+                sweep.set_processing_state(xsweep_dict)
+                if pipeline_scaling:
+                    crystal.prepare_for_scaling(sweep._get_integrater())
+
+            with executor:
+                results = scheduler.run(executor, callback=sweep_finished)
+            logger.info(scheduler.summary())
 
-            # Hack to update sweep with the serialized indexers/refiners/integraters
             i_sweep = 0
             for crystal_id in crystals:
                 for wavelength_id in crystals[crystal_id].get_wavelength_names():
@@ -198,7 +242,9 @@ def xia2_main(stop_after=None):
                     remove_sweeps = []
                     sweeps = wavelength.get_sweeps()
                     for sweep in sweeps:
-                        success, output, xsweep_dict = results[i_sweep]
+                        success, output, xsweep_dict, timing = results[i_sweep]
+                        for record in timing:
+                            xia2.Driver.timing.record(record)
                         if output is not None:
                             logger.info(output)
                         if not success:
@@ -207,10 +253,6 @@ def xia2_main(stop_after=None):
                         else:
                             assert xsweep_dict is not None
                             logger.info("Loading sweep: %s", sweep.get_name())
-                            new_sweep = XSweep.from_dict(xsweep_dict)
-                            sweep._indexer = new_sweep._indexer
-                            sweep._refiner = new_sweep._refiner
-                            sweep._integrater = new_sweep._integrater
                         i_sweep += 1
                     for sweep in remove_sweeps:
                         wavelength.remove_sweep(sweep)
@@ -242,6 +284,10 @@ def xia2_main(stop_after=None):
                             else:
                                 sweep.get_integrater_intensities()
                             sweep.serialize()
+                            if pipeline_scaling:
+                                crystals[crystal_id].prepare_for_scaling(
+                                    sweep._get_integrater()
+                                )
                         except Exception as e:
                             if failover:
                                 logger.info(
@@ -295,6 +341,9 @@ def xia2_main(stop_after=None):
             "Processing took %s", time.strftime("%Hh %Mm %Ss", time.gmtime(duration))
         )
 
+        xia2.Driver.timing.write_json("xia2-timing.json")
+        xia2.Driver.timing.write_trace("xia2-trace.json")
+
         write_citations()
 
 
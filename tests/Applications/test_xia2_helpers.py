@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from xia2.Applications.xia2_helpers import find_by_name
+from xia2.Schema.XProject import dict_from_json
+
+
+def test_find_by_name():
+    # names which look like numbers are read back from xia2.json as numbers
+    xinfo = dict_from_json(
+        string=json.dumps(
+            {
+                "_crystals": {
+                    "1": {
+                        "_name": "1",
+                        "_wavelengths": {"0.9795": {"_name": "0.9795"}},
+                    },
+                    "PROT": {"_name": "PROT", "_wavelengths": {}},
+                }
+            }
+        )
+    )
+    assert list(xinfo["_crystals"]) == [1, "PROT"]
+
+    crystal = find_by_name(xinfo["_crystals"], "1")
+    assert find_by_name(crystal["_wavelengths"], "0.9795") == {"_name": "0.9795"}
+    assert find_by_name(xinfo["_crystals"], "PROT")["_wavelengths"] == {}
+    with pytest.raises(RuntimeError, match="NATIVE not found"):
+        find_by_name(crystal["_wavelengths"], "NATIVE")
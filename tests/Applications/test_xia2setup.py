@@ -5,6 +5,7 @@ import subprocess
 
 import pytest
 
+from xia2.Applications.xia2setup import _crawl, visit
 from xia2.Handlers.XInfo import XInfo
 
 
@@ -98,3 +99,31 @@ def test_write_xinfo_unroll(dials_data, tmp_path):
     assert x.get_crystals()["DEFAULT"]["sweeps"]["SWEEP1"]["start_end"] == [1, 15]
     assert x.get_crystals()["DEFAULT"]["sweeps"]["SWEEP2"]["start_end"] == [16, 30]
     assert x.get_crystals()["DEFAULT"]["sweeps"]["SWEEP3"]["start_end"] == [31, 45]
+
+
+def test_crawl(tmp_path):
+    for sweep in ("a", "b/c", "b/d/e"):
+        tmp_path.joinpath(sweep).mkdir(parents=True)
+        for j in range(1, 4):
+            tmp_path.joinpath(sweep, f"x_{j:03d}.cbf").touch()
+    tmp_path.joinpath("b", "notes.log.1").touch()
+    # a symbolic link back up the tree must not be followed round forever
+    tmp_path.joinpath("b", "d", "loop").symlink_to(tmp_path / "b")
+
+    found = _crawl([str(tmp_path)])
+    assert [os.path.relpath(d, tmp_path) for d, _ in found] == [
+        ".",
+        "a",
+        "b",
+        "b/c",
+        "b/d",
+        "b/d/e",
+    ]
+    assert sum(len(files) for _, files in found) == 10
+
+    templates = set()
+    for directory, files in found:
+        templates.update(visit(directory, files, known_files=True))
+    assert templates == {
+        str(tmp_path / sweep / "x_###.cbf") for sweep in ("a", "b/c", "b/d/e")
+    }
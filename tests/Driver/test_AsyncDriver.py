@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import os
+import sys
+import time
+
+import pytest
+
+import xia2.Driver.AsyncDriver
+import xia2.Driver.JobScheduler
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="requires a posix shell")
+
+
+@pytest.fixture
+def cpu_budget(monkeypatch):
+    """The CpuBudget shared by every scheduler, as it was before the test
+    once the test is over."""
+    budget = xia2.Driver.JobScheduler.CpuBudget
+    monkeypatch.setattr(budget, "_capacity", budget._capacity)
+    monkeypatch.setattr(budget, "_in_use", budget._in_use)
+    return budget
+
+
+def run_python(code, working_directory):
+    d = xia2.Driver.AsyncDriver.AsyncDriver()
+    d.set_executable(sys.executable)
+    d.set_working_directory(str(working_directory))
+    d.add_command_line(["-c", code])
+    d.start()
+    d.input("hello")
+    d.close_wait()
+    return d
+
+
+def test_async_driver(tmp_path):
+    d = run_python('import sys; print(sys.stdin.read().strip(), "world")', tmp_path)
+    d.check_for_errors()
+    assert "".join(d.get_all_output()) == "hello world\n"
+
+
+def test_async_driver_return_code(tmp_path):
+    d = run_python("import sys; sys.exit(3)", tmp_path)
+    with pytest.raises(RuntimeError, match="exitcode 3"):
+        d.check_for_errors()
+
+
+def test_job_scheduler_runs_jobs_concurrently(tmp_path, cpu_budget):
+    cpu_budget.set_capacity(4)
+    scheduler = xia2.Driver.JobScheduler.JobScheduler(max_jobs=4)
+    for i in range(4):
+        scheduler.submit(
+            run_python, "import time; time.sleep(1); print(%d)" % i, tmp_path
+        )
+    t0 = time.time()
+    drivers = scheduler.wait()
+    assert time.time() - t0 < 3.5
+    assert ["".join(d.get_all_output()) for d in drivers] == [
+        "%d\n" % i for i in range(4)
+    ]
+
+
+def test_job_scheduler_raises_first_exception(cpu_budget):
+    cpu_budget.set_capacity(2)
+    scheduler = xia2.Driver.JobScheduler.JobScheduler(max_jobs=2)
+
+    def fail(message):
+        raise RuntimeError(message)
+
+    scheduler.submit(fail, "first")
+    scheduler.submit(fail, "second")
+    with pytest.raises(RuntimeError, match="first"):
+        scheduler.wait()
+    assert len(scheduler) == 0
+
+
+def test_job_scheduler_dependencies(cpu_budget):
+    cpu_budget.set_capacity(4)
+    scheduler = xia2.Driver.JobScheduler.JobScheduler(max_jobs=4)
+    finished = []
+
+    def job(name, delay):
+        time.sleep(delay)
+        finished.append(name)
+        return name
+
+    # two chains, the first slower to start than the second
+    a1 = scheduler.submit(job, "a1", 0.5)
+    b1 = scheduler.submit(job, "b1", 0.1)
+    scheduler.submit(job, "a2", 0, after=[a1])
+    scheduler.submit(job, "b2", 0, after=[b1])
+    scheduler.submit(job, "ab", 0, after=[a1, b1])
+    assert scheduler.wait() == ["a1", "b1", "a2", "b2", "ab"]
+    assert finished.index("b2") < finished.index("a1")
+    assert finished.index("a2") > finished.index("a1")
+    assert finished[-1] in ("a2", "ab")
+
+    with pytest.raises(RuntimeError, match="only follow"):
+        scheduler.submit(job, "c", 0, after=[5])
+
+
+def test_job_scheduler_skips_jobs_after_failure(cpu_budget):
+    cpu_budget.set_capacity(2)
+    scheduler = xia2.Driver.JobScheduler.JobScheduler(max_jobs=2)
+    ran = []
+
+    def fail():
+        raise RuntimeError("failed")
+
+    first = scheduler.submit(fail)
+    scheduler.submit(ran.append, "after", after=[first])
+    scheduler.submit(ran.append, "independent")
+    with pytest.raises(RuntimeError, match="failed"):
+        scheduler.wait()
+    assert ran == ["independent"]
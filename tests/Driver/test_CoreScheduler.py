@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import concurrent.futures
+import threading
+import time
+
+import pytest
+
+from xia2.Driver.CoreScheduler import CoreScheduler, allocate_cores
+
+
+def test_allocate_cores():
+    assert allocate_cores(16, [3600, 90]) == [15, 1]
+    assert allocate_cores(8, [100, 100, 100, 100]) == [2, 2, 2, 2]
+    assert allocate_cores(4, [1, 1, 1, 1]) == [1, 1, 1, 1]
+    assert allocate_cores(10, [300, 100]) == [7, 3]
+    assert sum(allocate_cores(7, [5, 3, 2])) == 7
+
+
+def test_core_scheduler():
+    lock = threading.Lock()
+    in_use = []
+
+    def job(name, duration, nproc=None):
+        with lock:
+            in_use.append(nproc)
+            assert sum(in_use) <= 8
+        time.sleep(duration)
+        with lock:
+            in_use.remove(nproc)
+        return name, nproc
+
+    scheduler = CoreScheduler(total_cores=8, max_jobs=2)
+    scheduler.submit(10, job, "small", 0.05)
+    scheduler.submit(70, job, "large", 0.5)
+    scheduler.submit(10, job, "backfill", 0.05)
+    assert len(scheduler) == 3
+
+    finished = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        results = scheduler.run(
+            executor, callback=lambda index, result: finished.append(index)
+        )
+
+    # the callback sees each job as it finishes
+    assert finished == [0, 2, 1]
+    # results are in the order the jobs were submitted; the large job starts
+    # first with most of the cores, and the last job gets the cores freed by
+    # the first small job
+    assert results == [("small", 1), ("large", 7), ("backfill", 1)]
+    assert 0 < scheduler.utilisation() <= 1
+
+    # 70 units of work on 7 cores take 10, and the small jobs then run on
+    # one core each, one after the other: 90 units over 20 time * 8 cores
+    assert scheduler.plan() == (20.0, pytest.approx(90 / 160))
+    assert "3 jobs on 8 cores: 56% planned" in scheduler.summary()
+
+
+def test_core_scheduler_failure():
+    def job(fail, nproc=None):
+        if fail:
+            raise ValueError("failed")
+        return nproc
+
+    scheduler = CoreScheduler(total_cores=2)
+    scheduler.submit(1, job, False)
+    scheduler.submit(1, job, True)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        with pytest.raises(ValueError, match="failed"):
+            scheduler.run(executor)
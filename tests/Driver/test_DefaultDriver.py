@@ -9,3 +9,52 @@ def test_defaultdriver_fails_on_start():
     d = xia2.Driver.DefaultDriver.DefaultDriver()
     with pytest.raises(NotImplementedError):
         d.start()
+
+
+class ListDriver(xia2.Driver.DefaultDriver.DefaultDriver):
+    """A driver which "runs" by returning a list of records as output."""
+
+    def __init__(self, records):
+        super().__init__()
+        self._executable = "/bin/program"
+        self._records = list(records)
+
+    def close(self):
+        pass
+
+    def _output(self):
+        return self._records.pop(0) if self._records else ""
+
+    def _status(self):
+        return 0
+
+
+@pytest.mark.parametrize("keep_all_output", [False, True])
+def test_defaultdriver_streams_output_to_log_file(tmp_path, keep_all_output):
+    records = ["line %d\n" % i for i in range(1000)] + ["no newline at end"]
+    d = ListDriver(records)
+    d.set_keep_all_output(keep_all_output)
+    d.write_log_file(tmp_path / "program.log")
+    d.close_wait()
+
+    assert d.get_all_output() == records + [""]
+    if keep_all_output:
+        assert len(d._standard_output_records) == len(records) + 1
+    else:
+        assert d._standard_output_records == [""]
+    log = (tmp_path / "program.log").read_text()
+    assert log.startswith("".join(records))
+    assert "# command line:" in log
+
+
+def test_defaultdriver_checks_tail_for_errors(tmp_path):
+    d = ListDriver(["Segmentation fault\n"] + ["ok\n"] * 30)
+    d.write_log_file(tmp_path / "program.log")
+    d.close_wait()
+    d.check_for_errors()
+
+    d = ListDriver(["ok\n"] * 30 + ["Segmentation fault\n"])
+    d.write_log_file(tmp_path / "program.log")
+    d.close_wait()
+    with pytest.raises(RuntimeError, match="segmentation fault"):
+        d.check_for_errors()
@@ -12,3 +12,15 @@ def test_instantiate_driver():
 def test_instantiate_nonexistent_driver_fails():
     with pytest.raises(RuntimeError):
         DF.DriverFactory.Driver("nosuchtype")
+
+
+def test_instantiate_worker_driver():
+    assert DF.DriverFactory.Driver("worker")
+
+
+def test_instantiate_async_driver():
+    assert DF.DriverFactory.Driver("async")
+
+
+def test_instantiate_qsub_array_driver():
+    assert DF.DriverFactory.Driver("qsub_array")
@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import os
+import stat
+import sys
+
+import pytest
+
+import xia2.Driver.QSubArrayDriver as QAD
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="requires bash")
+
+# run each task of the array in the background, as a queue would
+fake_qsub = """#!/bin/bash
+echo "$@" >> %(log)s
+while [ $# -gt 1 ]; do
+  if [ "$1" == "-t" ]; then N=${2#1-}; fi
+  shift
+done
+for i in $(seq 1 $N); do
+  SGE_TASK_ID=$i bash "$1" > /dev/null 2>&1 &
+done
+echo "Your job-array 4242.1-$N:1 (\\"$(basename $1)\\") has been submitted"
+"""
+
+fake_qstat = """#!/bin/bash
+echo "Following jobs do not exist: $2" >&2
+exit 1
+"""
+
+
+@pytest.fixture
+def submitter(tmp_path, monkeypatch):
+    for name, script in (("qsub", fake_qsub), ("qstat", fake_qstat)):
+        path = tmp_path / name
+        path.write_text(script % {"log": tmp_path / "qsub.log"})
+        path.chmod(path.stat().st_mode | stat.S_IEXEC)
+
+    submitter = QAD._ArraySubmitter()
+    submitter.qsub = str(tmp_path / "qsub")
+    submitter.submit_template = QAD.default_submit_template
+    submitter.status_template = str(tmp_path / "qstat") + " -j {job_id}"
+    submitter.resources_template = QAD.default_resources_template
+    submitter.job_gone_pattern = QAD.default_job_gone_pattern
+    submitter.poll_interval = 0.05
+    monkeypatch.setattr(QAD, "ArraySubmitter", submitter)
+    return submitter
+
+
+def make_driver(working_directory, code):
+    d = QAD.QSubArrayDriver()
+    d.set_executable(sys.executable)
+    d.set_working_directory(str(working_directory))
+    d.add_command_line(["-c", code])
+    d.start()
+    return d
+
+
+def test_jobs_started_together_are_one_array(submitter, tmp_path, monkeypatch):
+    from xia2.Driver.JobScheduler import CpuBudget, JobScheduler
+
+    monkeypatch.setattr(CpuBudget, "_capacity", 3)
+    monkeypatch.setattr(CpuBudget, "_in_use", 0)
+    scheduler = JobScheduler(max_jobs=3)
+    drivers = [make_driver(tmp_path, "print(%d)" % i) for i in range(3)]
+    for d in drivers:
+        scheduler.submit(d.close_wait)
+    scheduler.wait()
+
+    for i, d in enumerate(drivers):
+        d.check_for_errors()
+        assert "".join(d.get_all_output()) == "%d\n" % i
+
+    submissions = (tmp_path / "qsub.log").read_text().splitlines()
+    assert len(submissions) == 1
+    assert "-t 1-3" in submissions[0]
+
+
+def test_exit_status_is_returned(submitter, tmp_path):
+    d = make_driver(tmp_path, "import sys; sys.exit(3)")
+    d.close_wait()
+    with pytest.raises(RuntimeError, match="exitcode 3"):
+        d.check_for_errors()
+
+
+def test_lost_job_is_reported(submitter, tmp_path):
+    submitter.submit_template = "echo Your job-array 4243.1-{n_tasks}:1"
+    submitter.queue_check_interval = 0.1
+    d = make_driver(tmp_path, "print(1)")
+    with pytest.raises(RuntimeError, match="left the queue"):
+        d.close()
+
+
+def test_queue_specific_settings(submitter, tmp_path):
+    # e.g. for SLURM, whose squeue says nothing of a job which has gone
+    (tmp_path / "qstat").write_text('#!/bin/bash\necho "JOBID STATE"\n')
+    submitter.resources_template = "--cpus-per-task={cpu_threads}"
+    submitter.job_gone_pattern = r"^JOBID STATE\s*$"
+
+    d = make_driver(tmp_path, "print(1)")
+    d.set_cpu_threads(2)
+    d.close_wait()
+    d.check_for_errors()
+    assert "--cpus-per-task=2" in (tmp_path / "qsub.log").read_text()
+
+    submitter.submit_template = "echo Your job-array 4243.1-{n_tasks}:1"
+    submitter.queue_check_interval = 0.1
+    d = make_driver(tmp_path, "print(1)")
+    with pytest.raises(RuntimeError, match="left the queue"):
+        d.close()
@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import importlib.metadata
+import os
+import sys
+
+import pytest
+
+import xia2.Driver.ResultCache
+import xia2.Driver.timing
+from xia2.Driver.ResultCache import (
+    CachedDriverFactory,
+    ResultCache,
+    executable_identity,
+)
+from xia2.Driver.SimpleDriver import SimpleDriver
+
+
+@pytest.fixture
+def fake_program(tmp_path):
+    # copies the input file to the output file and counts how often it ran
+    program = tmp_path / "fake_program.py"
+    program.write_text(
+        """
+import sys
+
+with open("runs", "a") as fh:
+    fh.write("run\\n")
+with open(sys.argv[1]) as fh:
+    data = fh.read()
+with open(sys.argv[2], "w") as fh:
+    fh.write(data + sys.stdin.read())
+print("copied", len(data))
+"""
+    )
+    return program
+
+
+def run_cached(cache, program, directory, hklin, hklout, record="extra"):
+    d = CachedDriverFactory(SimpleDriver(), cache)
+    d.set_executable(sys.executable)
+    d.set_working_directory(str(directory))
+    d.add_command_line([str(program), hklin, hklout])
+    d.set_input_files([hklin])
+    d.set_output_files([hklout])
+    d.start()
+    d.input(record)
+    d.close_wait()
+    d.check_for_errors()
+    return d
+
+
+def test_result_cache(fake_program, tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    xia2.Driver.timing.reset()
+    (tmp_path / "input").write_text("data")
+
+    d = run_cached(cache, fake_program, tmp_path, "input", "1_output")
+    assert "".join(d.get_all_output()) == "copied 4\n"
+    assert (tmp_path / "1_output").read_text() == "data" + "extra\n"
+    assert (tmp_path / "runs").read_text() == "run\n"
+
+    # the same job with a different output file name is taken from the cache
+    d = run_cached(cache, fake_program, tmp_path, "input", "2_output")
+    assert "".join(d.get_all_output()) == "copied 4\n"
+    assert (tmp_path / "2_output").read_text() == "data" + "extra\n"
+    assert (tmp_path / "runs").read_text() == "run\n"
+    timing = xia2.Driver.timing.records()
+    assert len(timing) == 2
+    assert "cached" not in timing[0]
+    assert timing[1]["cached"] is True
+    assert any(
+        "1 results taken from the result cache" in line
+        for line in xia2.Driver.timing.report()
+    )
+
+    # but changing the input file, or the standard input, runs it again
+    (tmp_path / "input").write_text("different data")
+    run_cached(cache, fake_program, tmp_path, "input", "3_output")
+    assert (tmp_path / "runs").read_text() == "run\n" * 2
+    run_cached(cache, fake_program, tmp_path, "input", "4_output", record="other")
+    assert (tmp_path / "runs").read_text() == "run\n" * 3
+    assert (tmp_path / "4_output").read_text() == "different data" + "other\n"
+
+
+def test_result_cache_not_used_without_output_files(fake_program, tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"))
+    (tmp_path / "input").write_text("data")
+    for _ in range(2):
+        d = CachedDriverFactory(SimpleDriver(), cache)
+        d.set_executable(sys.executable)
+        d.set_working_directory(str(tmp_path))
+        d.add_command_line([str(fake_program), "input", "output"])
+        d.start()
+        d.close_wait()
+    assert (tmp_path / "runs").read_text() == "run\n" * 2
+    assert not cache.entries()
+
+
+def test_result_cache_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path / "cache"), max_size=2500)
+    for j in range(3):
+        output = tmp_path / ("%d_output" % j)
+        output.write_bytes(b"x" * 1000)
+        cache.store("%064d" % j, [str(output)], ["record\n"], 1.0)
+        # make sure the entries have distinct last used times
+        for _, _, path in cache.entries():
+            result = os.path.join(path, "result.json")
+            os.utime(result, (os.path.getmtime(result) - 10,) * 2)
+
+    # the least recently used entry was removed to make space
+    assert len(cache.entries()) == 2
+    assert cache.restore("%064d" % 0, [str(tmp_path / "restored")]) is None
+    assert cache.restore("%064d" % 1, [str(tmp_path / "restored")]) == (
+        ["record\n"],
+        1.0,
+    )
+
+
+def test_executable_identity(monkeypatch, tmp_path):
+    versions = {"dials": "3.1"}
+    lookups = []
+
+    def version(package):
+        lookups.append(package)
+        if package not in versions:
+            raise importlib.metadata.PackageNotFoundError(package)
+        return versions[package]
+
+    monkeypatch.setattr(importlib.metadata, "version", version)
+    monkeypatch.setattr(xia2.Driver.ResultCache, "_package_versions", {})
+
+    program = tmp_path / "dials.integrate"
+    program.write_text("#!/bin/sh\n")
+    other = tmp_path / "aimless"
+    other.write_text("#!/bin/sh\n")
+    identity = executable_identity(str(program))
+    assert identity.endswith(":3.1")
+    assert executable_identity(str(other)).endswith(":None")
+
+    # the version is looked up once for each package
+    assert executable_identity(str(program)) == identity
+    assert lookups == ["dials", "aimless"]
+
+    # and updating the package changes the identity of the unchanged launcher
+    versions["dials"] = "3.2"
+    monkeypatch.setattr(xia2.Driver.ResultCache, "_package_versions", {})
+    assert executable_identity(str(program)) != identity
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import os
+import sys
+
+import pytest
+
+import xia2.Driver.WorkerDriver as WD
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="requires os.fork")
+
+
+@pytest.fixture
+def fake_program(tmp_path, monkeypatch):
+    (tmp_path / "fake_program.py").write_text(
+        """
+import os
+import sys
+
+print("argv", " ".join(sys.argv[1:]))
+print("cwd", os.getcwd())
+print("env", os.environ.get("XIA2_TEST_VARIABLE"))
+for line in sys.stdin:
+    print("input", line.strip())
+sys.exit(int(os.environ.get("XIA2_TEST_EXIT_CODE", "0")))
+"""
+    )
+    monkeypatch.setenv("PYTHONPATH", os.pathsep.join([str(tmp_path)] + sys.path))
+    monkeypatch.setattr(WD, "worker_target", lambda executable: "fake_program")
+    yield
+    WD.WorkerPool.shutdown()
+
+
+def test_worker_driver_runs_program_in_worker(fake_program, tmp_path):
+    for _ in range(2):
+        d = WD.WorkerDriver()
+        d.set_executable(sys.executable)
+        d.set_working_directory(str(tmp_path))
+        d.set_working_environment("XIA2_TEST_VARIABLE", "sentinel")
+        d.add_command_line(["a=1", "b=2"])
+        d.start()
+        d.input("hello")
+        d.close_wait()
+        d.check_for_errors()
+        output = "".join(d.get_all_output())
+        assert "argv a=1 b=2" in output
+        assert "cwd %s" % tmp_path in output
+        assert "env sentinel" in output
+        assert "input hello" in output
+    # the worker is reused for the second job
+    assert len(WD.WorkerPool._idle) == 1
+
+
+def test_worker_driver_reports_exit_code(fake_program, tmp_path):
+    d = WD.WorkerDriver()
+    d.set_executable(sys.executable)
+    d.set_working_directory(str(tmp_path))
+    d.set_working_environment("XIA2_TEST_EXIT_CODE", "3")
+    d.start()
+    d.close_wait()
+    with pytest.raises(RuntimeError, match="exitcode 3"):
+        d.check_for_errors()
+
+
+def test_non_dials_programs_are_not_run_in_workers():
+    assert WD.worker_target("/usr/bin/pointless") is None
@@ -1,7 +1,13 @@
 from __future__ import annotations
 
+import json
+import os
 import re
+import sys
 
+import pytest
+
+import xia2.Driver.SimpleDriver
 import xia2.Driver.timing
 
 
@@ -265,3 +271,58 @@ def test_timing_visualisation():
 
     # thinking time should appear in the tree
     assert re.search("^13.* T[0-9] .*xia2 thinking time.*$", tree, re.MULTILINE)
+
+
+def test_record_step_resources():
+    xia2.Driver.timing.reset()
+    with xia2.Driver.timing.record_step("busy"):
+        sum(range(1000000))
+    (step,) = xia2.Driver.timing.records()
+    if os.name == "posix":
+        assert step["resources"]["cpu_user"] > 0
+        assert step["resources"]["max_rss"] > 0
+    assert step["pid"] == os.getpid()
+    xia2.Driver.timing.reset()
+
+
+@pytest.mark.skipif(os.name != "posix", reason="requires os.wait4")
+def test_simple_driver_resources():
+    xia2.Driver.timing.reset()
+    d = xia2.Driver.SimpleDriver.SimpleDriver()
+    d.set_executable(sys.executable)
+    d.add_command_line(["-c", "sum(range(1000000))"])
+    d.start()
+    d.close_wait()
+    (step,) = xia2.Driver.timing.records()
+    assert step["resources"] == d.get_resource_usage()
+    assert step["resources"]["cpu_user"] > 0
+    xia2.Driver.timing.reset()
+
+
+def test_timing_json_and_trace(tmp_path):
+    db = [
+        {
+            "command": "dials.find_spots  'nproc=4'",
+            "time_start": 10.0,
+            "time_end": 12.5,
+            "details": {"process start": 10.0},
+            "resources": {"cpu_user": 8.0, "max_rss": 1024},
+            "pid": 1,
+            "thread": 2,
+        },
+        {"command": "xia2.report", "time_start": 13.0, "time_end": 14.0},
+    ]
+    xia2.Driver.timing.visualise_db(db)
+    xia2.Driver.timing.write_json(tmp_path / "timing.json", db)
+    steps = json.loads((tmp_path / "timing.json").read_text())["steps"]
+    assert steps[0]["resources"]["cpu_user"] == 8.0
+    assert "runtime_readable" not in steps[0]
+
+    xia2.Driver.timing.write_trace(tmp_path / "trace.json", db)
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    assert [(e["name"], e["cat"], e["ts"], e["dur"]) for e in events] == [
+        ("dials.find_spots", "program", 0, 2500000),
+        ("xia2.report", "step", 3000000, 1000000),
+    ]
+    assert events[0]["pid"] == 1 and events[0]["tid"] == 2
+    assert events[0]["args"]["max_rss"] == 1024
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import os
+
+from xia2.Experts.FindImages import (
+    directory_index,
+    file_mtimes,
+    find_matching_images,
+    find_unreadable_files,
+    sample_images,
+    summarise_ranges,
+)
+
+
+def test_find_matching_images(tmp_path):
+    for j in (3, 1, 2, 10):
+        tmp_path.joinpath(f"x_{j:03d}.cbf").touch()
+    tmp_path.joinpath("x_004.cbf.gz").touch()
+    tmp_path.joinpath("x_0005.cbf").touch()
+    tmp_path.joinpath("y+1_001.cbf").touch()
+
+    assert find_matching_images("x_###.cbf", str(tmp_path)) == [1, 2, 3, 10]
+    assert find_matching_images("x_0##.cbf", str(tmp_path)) == [1, 2, 3, 10]
+    assert find_matching_images("y+1_###.cbf", str(tmp_path)) == [1]
+
+
+def test_find_matching_images_new_files(tmp_path):
+    for j in (1, 2):
+        tmp_path.joinpath(f"x_{j:03d}.cbf").touch()
+    # pretend that the directory was listed long after it was last changed
+    os.utime(tmp_path, (0, 0))
+    assert find_matching_images("x_###.cbf", str(tmp_path)) == [1, 2]
+
+    # the listing is reused until the directory changes
+    tmp_path.joinpath("x_003.cbf").touch()
+    os.utime(tmp_path, (0, 0))
+    assert find_matching_images("x_###.cbf", str(tmp_path)) == [1, 2]
+
+    os.utime(tmp_path, (1, 1))
+    assert find_matching_images("x_###.cbf", str(tmp_path)) == [1, 2, 3]
+
+    directory_index.clear()
+    assert find_matching_images("x_###.cbf", str(tmp_path)) == [1, 2, 3]
+
+
+def test_summarise_ranges():
+    assert summarise_ranges([9, 1, 2, 3, 7, 10, 11, 12]) == "1-3, 7, 9-12"
+    assert summarise_ranges([5]) == "5"
+    assert summarise_ranges([]) == ""
+
+
+def test_sample_images():
+    images = list(range(1, 11))
+    assert sample_images(images) == images
+    assert sample_images(images, 1) == images
+    assert sample_images(images, 4) == [1, 5, 9, 10]
+    assert sample_images(images, 3) == [1, 4, 7, 10]
+    assert sample_images([], 3) == []
+
+
+def test_find_unreadable_files(tmp_path):
+    paths = []
+    for j in range(1, 6):
+        path = tmp_path / f"x_{j:03d}.cbf"
+        path.touch()
+        os.utime(path, (j, j))
+        paths.append(str(path))
+    missing = str(tmp_path / "x_006.cbf")
+
+    for nproc in (1, 4):
+        assert find_unreadable_files(paths + [missing], nproc=nproc) == [missing]
+        assert file_mtimes(paths, nproc=nproc) == [1.0, 2.0, 3.0, 4.0, 5.0]
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import h5py
+import numpy as np
+
+from xia2.Experts.HDF5Files import inspect_hdf5, inspect_hdf5_files
+
+
+def test_inspect_hdf5(tmp_path):
+    with h5py.File(tmp_path / "x_data_000001.h5", "w") as f:
+        f.create_dataset("/data", data=np.zeros((2, 4, 4)))
+
+    for master in ("x_master.h5", "x.nxs"):
+        with h5py.File(tmp_path / master, "w") as f:
+            f["/entry/data/data_000001"] = h5py.ExternalLink(
+                "x_data_000001.h5", "/data"
+            )
+            detector_specific = f.create_group(
+                "/entry/instrument/detector/detectorSpecific"
+            )
+            detector_specific["ntrigger"] = 2
+            detector_specific["nimages"] = 1
+
+    master, nxs, data = inspect_hdf5_files(
+        [
+            tmp_path / "x_master.h5",
+            tmp_path / "x.nxs",
+            tmp_path / "x_data_000001.h5",
+        ],
+        nproc=2,
+    )
+    assert master.is_master and nxs.is_master
+    assert not data.is_master
+    # both master files link to the same data
+    assert master.data_files == {str(tmp_path / "x_data_000001.h5")}
+    assert nxs.data_files == master.data_files
+    assert (master.ntrigger, master.nimages) == (2, 1)
+
+    # the file is only read again once it changes
+    assert inspect_hdf5(tmp_path / "x_master.h5") is master
+    with h5py.File(tmp_path / "x_master.h5", "a") as f:
+        f["/entry/instrument/detector/detectorSpecific/ntrigger"][()] = 3
+    assert inspect_hdf5(tmp_path / "x_master.h5").ntrigger == 3
+
+    assert not inspect_hdf5(tmp_path / "missing.h5").is_master
@@ -28,3 +28,16 @@ def test_SortLattices():
     r0 = [r[0] for r in result]
 
     assert r0 == ["tP", "oC", "oP", "mC", "mP", "aP"]
+
+
+def test_SameLattice():
+    SameLattice = xia2.Experts.LatticeExpert.SameLattice
+
+    tP = (57.70, 57.70, 149.80, 90.00, 90.00, 90.00)
+    # the same lattice, described in other settings
+    assert SameLattice("tP", tP, "oC", (81.60, 81.60, 149.80, 90.00, 90.00, 90.00))
+    assert SameLattice("tP", tP, "mP", (57.75, 149.70, 57.65, 90.00, 90.02, 90.00))
+    assert SameLattice("tP", tP, "aP", (57.70, 57.70, 149.80, 90.00, 90.00, 90.00))
+    # but not once the cell itself has changed
+    assert not SameLattice("tP", tP, "oP", (56.90, 58.50, 149.80, 90.00, 90.00, 90.00))
+    assert not SameLattice("tP", tP, "mP", (57.70, 149.80, 57.70, 90.00, 92.00, 90.00))
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import pytest
+
+from xia2.Experts.WatchImages import ImageWatcher, contiguous, wait_for_file
+
+
+def collect(directory, images, delay):
+    """Write the images into directory one at a time, as a detector would."""
+    for i in images:
+        time.sleep(delay)
+        directory.joinpath("x_%04d.cbf" % i).write_bytes(b"frame %d" % i)
+
+
+def start_collection(directory, images, delay=0.05):
+    thread = threading.Thread(target=collect, args=(directory, images, delay))
+    thread.start()
+    return thread
+
+
+def test_contiguous():
+    assert contiguous([]) == []
+    assert contiguous([3, 1, 2, 5]) == [1, 2, 3]
+    assert contiguous([1, 2, 3]) == [1, 2, 3]
+
+
+def test_wait_for_file(tmp_path):
+    thread = start_collection(tmp_path, [1], delay=0.1)
+    wait_for_file(str(tmp_path / "x_0001.cbf"), interval=0.01, timeout=10)
+    thread.join()
+    with pytest.raises(RuntimeError, match="timed out"):
+        wait_for_file(str(tmp_path / "x_0002.cbf"), interval=0.01, timeout=0.05)
+
+
+def test_image_watcher(tmp_path):
+    thread = start_collection(tmp_path, range(1, 31))
+    watcher = ImageWatcher(
+        "x_####.cbf", str(tmp_path), interval=0.01, quiet_period=0.5, timeout=30
+    )
+
+    # the first wedge is available while the rest are still being collected
+    assert watcher.wait_for_images(10) == (1, 10)
+    assert tmp_path.joinpath("x_0011.cbf").exists()
+    assert not tmp_path.joinpath("x_0030.cbf").exists()
+
+    # and the sweep is complete once the images stop arriving
+    assert watcher.wait_for_completion() == (1, 30)
+    thread.join()
+    assert watcher.is_quiet()
+
+
+def test_image_watcher_expected(tmp_path):
+    thread = start_collection(tmp_path, range(1, 21))
+    watcher = ImageWatcher(
+        "x_####.cbf", str(tmp_path), interval=0.01, quiet_period=60, timeout=30
+    )
+    assert watcher.wait_for_completion(expected=20) == (1, 20)
+    thread.join()
+    assert not watcher.is_quiet()
+
+
+def test_image_watcher_short_sweep(tmp_path):
+    # collection stops before the first wedge is complete
+    start_collection(tmp_path, range(1, 6)).join()
+    watcher = ImageWatcher(
+        "x_####.cbf", str(tmp_path), interval=0.01, quiet_period=0.1, timeout=30
+    )
+    assert watcher.wait_for_images(10) == (1, 5)
+
+
+def test_image_watcher_timeout(tmp_path):
+    watcher = ImageWatcher(
+        "x_####.cbf", str(tmp_path), interval=0.01, quiet_period=60, timeout=0.1
+    )
+    with pytest.raises(RuntimeError, match="timed out waiting for 10 images"):
+        watcher.wait_for_images(10)
+
+
+def test_image_watcher_wedges(tmp_path):
+    thread = start_collection(tmp_path, range(1, 26))
+    watcher = ImageWatcher(
+        "x_####.cbf", str(tmp_path), interval=0.01, quiet_period=0.5, timeout=30
+    )
+    wedges = []
+    for first, last in watcher.wedges(10):
+        # each wedge is handed over while the rest are still being collected
+        if not wedges:
+            assert not tmp_path.joinpath("x_0025.cbf").exists()
+        wedges.append((first, last))
+    thread.join()
+    assert wedges == [(1, 10), (11, 20), (21, 25)]
+
+    # the sweep is complete once the last expected image has landed
+    watcher = ImageWatcher(
+        "x_####.cbf", str(tmp_path), interval=0.01, quiet_period=60, timeout=30
+    )
+    assert list(watcher.wedges(20, expected=25)) == [(1, 20), (21, 25)]
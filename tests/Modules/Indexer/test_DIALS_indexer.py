@@ -1,15 +1,21 @@
 from __future__ import annotations
 
 import os
+import random
 import sys
+import time
 from unittest import mock
 
 import pytest
 
+import libtbx
+from dials.array_family import flex
+from dials.model.data import Shoebox
 from dxtbx.model import ExperimentList
 
+from xia2.Driver.JobScheduler import CpuBudget
 from xia2.Handlers.Phil import PhilIndex
-from xia2.Modules.Indexer.DialsIndexer import DialsIndexer
+from xia2.Modules.Indexer.DialsIndexer import DialsIndexer, overload_histograms
 from xia2.Schema.XCrystal import XCrystal
 from xia2.Schema.XSample import XSample
 from xia2.Schema.XSweep import XSweep
@@ -72,3 +78,262 @@ def _exercise_dials_indexer(dials_data, tmp_path):
 def test_dials_indexer_serial(ccp4, dials_data, run_in_tmp_path):
     with mock.patch.object(sys, "argv", []):
         _exercise_dials_indexer(dials_data, run_in_tmp_path)
+
+
+def _overload_histograms_per_shoebox(shoeboxes, count_limit):
+    # the histogram for each shoebox in turn, as this was once done
+    maxima = flex.double()
+    pixel_histogram = flex.histogram(
+        flex.double(), data_min=0, data_max=1.25 * count_limit, n_slots=5
+    )
+    for b in shoeboxes:
+        pixel_histogram.update(
+            flex.histogram(
+                b.data.as_double().as_1d(),
+                data_min=0,
+                data_max=1.25 * count_limit,
+                n_slots=5,
+            )
+        )
+        maxima.append(flex.max(b.data))
+    maximum_histogram = flex.histogram(
+        maxima, data_min=0, data_max=1.25 * count_limit, n_slots=5
+    )
+    return maximum_histogram.slots(), pixel_histogram.slots()
+
+
+def _shoeboxes(n, count_limit):
+    rng = random.Random(42)
+    shoeboxes = []
+    for _ in range(n):
+        nx, ny, nz = rng.randint(1, 7), rng.randint(1, 7), rng.randint(1, 3)
+        shoebox = Shoebox((0, nx, 0, ny, 0, nz))
+        shoebox.allocate()
+        data = flex.float(
+            rng.uniform(-1, 1.5 * count_limit) if rng.random() < 0.1 else 10.0
+            for _ in range(nx * ny * nz)
+        )
+        data.reshape(flex.grid(nz, ny, nx))
+        shoebox.data = data
+        shoeboxes.append(shoebox)
+    return shoeboxes
+
+
+def test_overload_histograms():
+    count_limit = 1000
+    shoeboxes = _shoeboxes(500, count_limit)
+    maximum_counts, pixel_counts = overload_histograms(shoeboxes, count_limit)
+    expected = _overload_histograms_per_shoebox(shoeboxes, count_limit)
+    assert list(maximum_counts) == list(expected[0])
+    assert list(pixel_counts) == list(expected[1])
+    assert sum(maximum_counts) == 500
+    assert list(overload_histograms([], count_limit)[0]) == [0] * 5
+
+
+def test_overload_histograms_empty_shoeboxes():
+    count_limit = 1000
+    shoeboxes = _shoeboxes(10, count_limit)
+    empty = Shoebox((0, 0, 0, 0, 0, 0))
+    empty.allocate()
+    assert empty.data.size() == 0
+
+    # empty shoeboxes have no maximum, wherever they are
+    expected = _overload_histograms_per_shoebox(shoeboxes, count_limit)
+    for shoeboxes in (
+        [empty] + shoeboxes,
+        shoeboxes[:5] + [empty, empty] + shoeboxes[5:],
+        shoeboxes + [empty],
+    ):
+        maximum_counts, pixel_counts = overload_histograms(shoeboxes, count_limit)
+        assert list(maximum_counts) == list(expected[0])
+        assert list(pixel_counts) == list(expected[1])
+    assert list(overload_histograms([empty], count_limit)[0]) == [0] * 5
+
+
+def test_overload_histograms_benchmark(timing_benchmark):
+    count_limit = 1000
+    shoeboxes = _shoeboxes(20000, count_limit)
+
+    t0 = time.perf_counter()
+    expected = _overload_histograms_per_shoebox(shoeboxes, count_limit)
+    t1 = time.perf_counter()
+    result = overload_histograms(shoeboxes, count_limit)
+    t2 = time.perf_counter()
+    print("20000 shoeboxes: per shoebox %.3fs, all together %.3fs" % (t1 - t0, t2 - t1))
+    assert [list(slots) for slots in result] == [list(slots) for slots in expected]
+
+
+def test_try_indexing_methods_in_parallel(monkeypatch):
+    monkeypatch.setattr(PhilIndex.params.xia2.settings.multiprocessing, "nproc", 8)
+    calls = []
+
+    def do_indexing(self, method=None, nproc=None, report=True):
+        calls.append((method, nproc, report))
+        if method == "fft1d":
+            raise RuntimeError("fft1d failed")
+        indexer = mock.Mock()
+        indexer.get_nref_rmsds.return_value = (100, (0.1, 0.1, 0.1))
+        return indexer
+
+    monkeypatch.setattr(DialsIndexer, "_do_indexing", do_indexing)
+    indexer = DialsIndexer()
+    attempts = indexer._try_indexing_methods(("fft3d", "fft1d"), in_parallel=True)
+    (fft3d, nref_3d, rmsd_3d), (fft1d, nref_1d, rmsd_1d) = attempts
+    assert sorted(calls) == [("fft1d", 4, False), ("fft3d", 4, False)]
+    assert (nref_3d, rmsd_3d) == (100, (0.1, 0.1, 0.1))
+    assert isinstance(fft1d, RuntimeError) and nref_1d is None and rmsd_1d is None
+
+    calls.clear()
+    indexer._try_indexing_methods(("fft3d", "fft1d"))
+    assert calls == [("fft3d", None, True), ("fft1d", None, True)]
+
+
+def test_try_indexing_methods_in_parallel_one_processor(monkeypatch):
+    # with one processor the methods are still tried one at a time
+    monkeypatch.setattr(PhilIndex.params.xia2.settings.multiprocessing, "nproc", 1)
+    monkeypatch.setattr(CpuBudget, "_capacity", None)
+    monkeypatch.setattr(CpuBudget, "_in_use", 0)
+    running = []
+    overlapped = []
+
+    def do_indexing(self, method=None, nproc=None, report=True):
+        running.append(method)
+        overlapped.append(len(running) > 1)
+        time.sleep(0.1)
+        running.remove(method)
+        indexer = mock.Mock()
+        indexer.get_nref_rmsds.return_value = (100, (0.1, 0.1, 0.1))
+        return indexer
+
+    monkeypatch.setattr(DialsIndexer, "_do_indexing", do_indexing)
+    attempts = DialsIndexer()._try_indexing_methods(
+        ("fft3d", "fft1d"), in_parallel=True
+    )
+    assert [nref for _, nref, _ in attempts] == [100, 100]
+    assert overlapped == [False, False]
+
+
+def test_bravais_setting_lattice_cell(tmp_path):
+    summary = {
+        "bravais": "tP",
+        "unit_cell": [57.8, 57.8, 150.0, 90.0, 90.0, 90.0],
+        "experiments_file": os.fspath(tmp_path / "bravais_setting_9.expt"),
+    }
+    # read from the summary without the experiments, which are not there
+    assert DialsIndexer._bravais_setting_lattice_cell(summary) == (
+        "tP",
+        (57.8, 57.8, 150.0, 90.0, 90.0, 90.0),
+    )
+
+
+def test_pending_solution_replaced(monkeypatch):
+    indexer = DialsIndexer()
+    reindexed = []
+    monkeypatch.setattr(
+        DialsIndexer, "Reindex", lambda self: mock.Mock(run=lambda: reindexed.append(1))
+    )
+    monkeypatch.setattr(
+        "xia2.Modules.Indexer.DialsIndexer.load.experiment_list", mock.Mock()
+    )
+
+    solution = {"experiments_file": "1.expt", "cb_op": "a,b,c", "lattice": "aP"}
+    indexer._pending_solution = (solution, "indexed.refl")
+    indexer._discard_pending_solution()
+    indexer._pending_solution = (solution, "indexed.refl")
+    indexer._make_pending_solution()
+    assert indexer._reindex_avoided == 1
+    assert len(reindexed) == 1
+    assert indexer._indxr_payload["experiments_filename"] == "1.expt"
+
+
+def test_index_prepare_concurrently(monkeypatch):
+    monkeypatch.setattr(PhilIndex.params.xia2.settings.multiprocessing, "nproc", 4)
+    monkeypatch.setattr(PhilIndex.params.xia2.settings.input, "gain", libtbx.Auto)
+    monkeypatch.setattr(PhilIndex.params.xia2.settings, "trust_beam_centre", False)
+    monkeypatch.setattr(PhilIndex.params.dials, "fast_mode", False)
+    events = []
+    gains = {}
+
+    def generate_mask(self, imageset, name):
+        genmask = mock.Mock()
+        genmask.run = lambda: events.append(("mask", name)) or (f"{name}.expt", None)
+        return genmask, f"{name}_masked.expt"
+
+    def estimate_gain(self):
+        def run():
+            # slower than masking and spot finding
+            time.sleep(0.2)
+            events.append(("gain", None))
+            gain_estimater.get_gain.return_value = 1.5
+
+        gain_estimater = mock.Mock(run=run)
+        gain_estimater.get_gain.return_value = None
+        return gain_estimater
+
+    def prepare_spotfinder(self, imageset, name, sweep_filename):
+        spotfinder = mock.Mock()
+        spotfinder.set_gain = lambda gain: gains.__setitem__(name, gain)
+        # the later sweeps finish first
+        spotfinder.run = lambda: time.sleep(0.1 * (name == "SWEEP1")) or events.append(
+            ("spots", name)
+        )
+        spotfinder.get_spot_filename.return_value = f"{name}_strong.refl"
+        spotfinder.get_output_sweep_filename.return_value = f"{name}_strong.expt"
+        return spotfinder
+
+    def search_beam_position(self):
+        discovery = mock.Mock()
+        discovery.get_optimized_experiments_filename.return_value = "optimised.expt"
+        return discovery
+
+    monkeypatch.setattr(DialsIndexer, "_prepare_generate_mask", generate_mask)
+    monkeypatch.setattr(DialsIndexer, "EstimateGain", estimate_gain)
+    monkeypatch.setattr(DialsIndexer, "_prepare_spotfinder", prepare_spotfinder)
+    monkeypatch.setattr(DialsIndexer, "DetectBlanks", lambda self: mock.Mock())
+    monkeypatch.setattr(DialsIndexer, "SearchBeamPosition", search_beam_position)
+    monkeypatch.setattr(DialsIndexer, "_read_spots", staticmethod(lambda s: "spots"))
+    monkeypatch.setattr(DialsIndexer, "_check_spots", lambda *args: None)
+    monkeypatch.setattr(DialsIndexer, "_remove_blanks", lambda *args: False)
+    monkeypatch.setattr(
+        DialsIndexer, "_beam_search_image_range", staticmethod(lambda *args: None)
+    )
+    monkeypatch.setattr(DialsIndexer, "_watched_spots", lambda *args: None)
+
+    indexer = DialsIndexer()
+    names = ("SWEEP1", "SWEEP2", "SWEEP3")
+    indexer._indxr_imagesets = [mock.Mock() for name in names]
+    indexer._indxr_sweeps = [
+        mock.Mock(get_name=mock.Mock(return_value=n)) for n in names
+    ]
+    indexer._index_prepare_concurrently()
+
+    # spot finding for every sweep waits for the gain estimated for the first
+    assert gains == {name: 1.5 for name in names}
+    gain_estimated = events.index(("gain", None))
+    assert events.index(("mask", "SWEEP1")) < gain_estimated
+    for name in names:
+        assert events.index(("mask", name)) < events.index(("spots", name))
+        assert gain_estimated < events.index(("spots", name))
+    # the results are in the order of the sweeps, however they finished
+    assert events.index(("spots", "SWEEP1")) > events.index(("spots", "SWEEP3"))
+    assert indexer._indxr_payload["spot_lists"] == [f"{n}_strong.refl" for n in names]
+    assert indexer._indxr_payload["experiments"] == ["optimised.expt"] * 3
+    assert PhilIndex.params.xia2.settings.input.gain == 1.5
+
+    # the spots of a sweep found in watch mode are not found again
+    def watched_spots(self, imageset, name):
+        if name == "SWEEP2":
+            return "SWEEP2_watched_strong.refl", "spots"
+
+    monkeypatch.setattr(DialsIndexer, "_watched_spots", watched_spots)
+    monkeypatch.setattr(PhilIndex.params.xia2.settings.input, "gain", libtbx.Auto)
+    events.clear()
+    gains.clear()
+    indexer._index_prepare_concurrently()
+    assert ("spots", "SWEEP2") not in events
+    assert gains == {"SWEEP1": 1.5, "SWEEP3": 1.5}
+    assert indexer._indxr_payload["spot_lists"] == [
+        "SWEEP1_strong.refl",
+        "SWEEP2_watched_strong.refl",
+        "SWEEP3_strong.refl",
+    ]
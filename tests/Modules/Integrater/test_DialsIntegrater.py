@@ -12,7 +12,11 @@ from iotbx.reflection_file_reader import any_reflection_file
 
 from xia2.Handlers.Phil import PhilIndex
 from xia2.Modules.Indexer.DialsIndexer import DialsIndexer
-from xia2.Modules.Integrater.DialsIntegrater import DialsIntegrater
+from xia2.Modules.Integrater.DialsIntegrater import (
+    DialsIntegrater,
+    merge_wedge_reflections,
+    wedge_ranges,
+)
 from xia2.Modules.Refiner.DialsRefiner import DialsRefiner
 from xia2.Schema.XCrystal import XCrystal
 from xia2.Schema.XSample import XSample
@@ -164,3 +168,46 @@ def test_dials_integrater_high_pressure_set(monkeypatch):
     monkeypatch.setattr(PhilIndex.params.dials.high_pressure, "correction", True)
     integrater = DialsIntegrater()
     assert integrater.high_pressure
+
+
+def test_wedge_ranges():
+    assert wedge_ranges(1, 9, 9, 2) == [((1, 9), (1, 9))]
+    assert wedge_ranges(1, 9, 4, 2) == [
+        ((1, 3), (1, 5)),
+        ((4, 6), (2, 8)),
+        ((7, 9), (5, 9)),
+    ]
+    assert wedge_ranges(101, 200, 30, 0) == [
+        ((101, 125), (101, 125)),
+        ((126, 150), (126, 150)),
+        ((151, 175), (151, 175)),
+        ((176, 200), (176, 200)),
+    ]
+    assert wedge_ranges(1, 2, 1, 5) == [((1, 1), (1, 2)), ((2, 2), (1, 2))]
+
+
+def test_merge_wedge_reflections(tmp_path):
+    # the reflections of two overlapping wedges of images 1-4 and 5-8, with
+    # the experiment identifiers of the jobs which integrated them
+    wedges = []
+    for j, (images, z) in enumerate(
+        (((1, 4), (0.5, 3.5, 4.5, 5.5)), ((5, 8), (2.5, 3.9, 4.0, 7.5)))
+    ):
+        reflections = flex.reflection_table()
+        reflections["xyzcal.px"] = flex.vec3_double([(10.0, 20.0, z_) for z_ in z])
+        reflections["id"] = flex.int(len(z), 0)
+        reflections.experiment_identifiers()[0] = "wedge%d" % j
+        filename = str(tmp_path / ("wedge%d.refl" % j))
+        reflections.as_file(filename)
+        wedges.append((images, filename))
+
+    filename = str(tmp_path / "merged.refl")
+    assert merge_wedge_reflections(wedges, "sweep", filename) == 4
+
+    # each reflection is taken from the wedge of the image it is centred on
+    merged = flex.reflection_table.from_file(filename)
+    assert list(merged["xyzcal.px"].parts()[2]) == [0.5, 3.5, 4.0, 7.5]
+    assert list(merged["id"]) == [0] * 4
+    identifiers = merged.experiment_identifiers()
+    assert list(identifiers.keys()) == [0]
+    assert list(identifiers.values()) == ["sweep"]
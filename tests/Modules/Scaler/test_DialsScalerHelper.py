@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import random
+import threading
 
 import pytest
 
@@ -11,6 +12,7 @@ from dxtbx.model import Beam, Crystal, Experiment, Scan
 from dxtbx.model.experiment_list import ExperimentList
 from dxtbx.serialize import load
 
+from xia2.Modules.Scaler import DialsScaler
 from xia2.Modules.Scaler.DialsScaler import decide_correct_lattice_using_refiner
 
 flex.set_random_seed(42)
@@ -400,3 +402,74 @@ def test_dials_symmetry_indexer_jiffy(
     if expected_output[3]:
         for refiner in refiners[1:]:
             assert refiner.get_refiner_reset()
+
+
+def test_prepared_symmetry(monkeypatch, tmp_path):
+    """The symmetry analysis started while the other sweeps are integrated
+    is used if the files are the same, and dropped on reset or once the
+    symmetry has been decided."""
+
+    started = threading.Event()
+    release = threading.Event()
+    analysed = []
+
+    class DialsSymmetry:
+        def set_working_directory(self, working_directory):
+            pass
+
+        def add_experiments(self, experiments):
+            self.experiments = experiments
+
+        def add_reflections(self, reflections):
+            self.reflections = reflections
+
+        def decide_pointgroup(self):
+            started.set()
+            release.wait(10)
+            analysed.append(self.reflections)
+
+    class Integrater:
+        def __init__(self, name):
+            self.name = name
+
+        def get_integrated_experiments(self):
+            return "%s.expt" % self.name
+
+        def get_integrated_reflections(self):
+            return "%s.refl" % self.name
+
+    monkeypatch.setattr(DialsScaler, "DialsSymmetry", DialsSymmetry)
+    monkeypatch.setattr(DialsScaler, "auto_logfiler", lambda program: None)
+    directory = str(tmp_path)
+
+    first, second, third = Integrater("1"), Integrater("2"), Integrater("3")
+    DialsScaler.prepare_sweep_symmetry(first, directory)
+    assert started.wait(10)
+    DialsScaler.prepare_sweep_symmetry(second, directory)
+    DialsScaler.prepare_sweep_symmetry(third, directory)
+    assert DialsScaler._prepared_symmetry_executor._max_workers == 1
+
+    # a reset integrater drops the job, before it is run
+    DialsScaler.discard_sweep_symmetry(second)
+    assert (
+        DialsScaler._take_prepared_symmetry(["2.expt"], ["2.refl"], directory) is None
+    )
+    release.set()
+
+    # the others are picked up for the same files only
+    assert (
+        DialsScaler._take_prepared_symmetry(["1.expt"], ["1.refl"], "elsewhere") is None
+    )
+    prepared = DialsScaler._take_prepared_symmetry(["1.expt"], ["1.refl"], directory)
+    assert prepared.result(10).reflections == "1.refl"
+    assert (
+        DialsScaler._take_prepared_symmetry(["1.expt"], ["1.refl"], directory) is None
+    )
+
+    # and the threads are shut down once the scaler is done with them
+    executor = DialsScaler._prepared_symmetry_executor
+    DialsScaler.discard_sweep_symmetry(working_directory=directory)
+    assert DialsScaler._prepared_symmetry == {}
+    assert DialsScaler._prepared_symmetry_executor is None
+    assert executor._shutdown
+    assert "2.refl" not in analysed
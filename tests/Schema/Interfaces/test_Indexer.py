@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import pytest
+
+from xia2.Handlers.Phil import PhilIndex
+from xia2.Schema.Interfaces import Indexer as indexer_module
+from xia2.Schema.Interfaces.Indexer import Indexer, _IndexerHelper
+
+# the indexing solutions for a sweep indexed in the oC lattice
+solutions = {
+    "oC": (60.0, 80.0, 40.0, 90.0, 90.0, 90.0),
+    "mC": (60.0, 80.0, 40.0, 90.0, 90.5, 90.0),
+    "mP": (50.0, 40.0, 50.0, 90.0, 106.3, 90.0),
+    "aP": (40.0, 50.0, 50.0, 106.3, 90.0, 90.0),
+}
+
+
+class _Indexer(Indexer):
+    """An indexer which has indexed the sweep in the oC lattice."""
+
+    def __init__(self):
+        super().__init__()
+        self._indxr_helper = _IndexerHelper(solutions)
+        self._indxr_prepare_done = True
+        self._indxr_done = True
+        self._indxr_finish_done = True
+
+    def get_indexer_lattice(self):
+        return "oC"
+
+    def get_indexer_cell(self):
+        return solutions["oC"]
+
+
+@pytest.fixture
+def settings(monkeypatch):
+    settings = PhilIndex.params.xia2.settings
+    monkeypatch.setattr(settings, "integrate_p1", False)
+    monkeypatch.setattr(settings, "reintegrate_correct_lattice", True)
+    monkeypatch.setattr(settings, "reindex_lattice_change", True)
+    monkeypatch.setattr(settings, "reindex_lattice_change_tolerance", 0.01)
+    return settings
+
+
+@pytest.fixture
+def same_lattice(monkeypatch):
+    """Record the comparisons made, treating only mC as the same lattice
+    as oC."""
+
+    calls = []
+
+    def SameLattice(lattice1, cell1, lattice2, cell2, relative_length_tolerance):
+        calls.append((lattice1, lattice2, relative_length_tolerance))
+        return lattice2 == "mC"
+
+    monkeypatch.setattr(indexer_module, "SameLattice", SameLattice)
+    return calls
+
+
+def test_lattice_needs_reintegration(settings, same_lattice):
+    indexer = _Indexer()
+    assert not indexer._indxr_lattice_needs_reintegration("mC")
+    assert indexer._indxr_lattice_needs_reintegration("mP")
+    assert same_lattice == [("oC", "mC", 0.01), ("oC", "mP", 0.01)]
+
+    # reintegrating is the default
+    settings.reindex_lattice_change = False
+    assert indexer._indxr_lattice_needs_reintegration("mC")
+
+    # and data integrated in P1 only need reintegrating if asked
+    settings.integrate_p1 = True
+    settings.reintegrate_correct_lattice = False
+    assert not indexer._indxr_lattice_needs_reintegration("mP")
+    settings.reintegrate_correct_lattice = True
+    assert indexer._indxr_lattice_needs_reintegration("mP")
+    assert len(same_lattice) == 2
+
+
+def test_set_indexer_asserted_lattice(settings, same_lattice):
+    # a change of basis leaves the indexing in place
+    indexer = _Indexer()
+    assert indexer.set_indexer_asserted_lattice("mC") == Indexer.LATTICE_POSSIBLE
+    assert indexer._indxr_helper.get()[0] == "mC"
+    assert indexer.get_indexer_done()
+    assert indexer.get_indexer_finish_done()
+
+    # anything else means indexing and integrating again
+    indexer = _Indexer()
+    assert indexer.set_indexer_asserted_lattice("mP") == Indexer.LATTICE_POSSIBLE
+    assert indexer._indxr_helper.get()[0] == "mP"
+    assert not indexer.get_indexer_done()
+
+    # as does any lattice change unless asked otherwise
+    settings.reindex_lattice_change = False
+    indexer = _Indexer()
+    assert indexer.set_indexer_asserted_lattice("mC") == Indexer.LATTICE_POSSIBLE
+    assert not indexer.get_indexer_done()
+
+    assert indexer.set_indexer_asserted_lattice("hP") == Indexer.LATTICE_IMPOSSIBLE
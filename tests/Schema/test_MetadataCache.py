@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import os
+import time
+
+from xia2.Schema.MetadataCache import MetadataCache, file_signature
+
+
+def test_metadata_cache(tmp_path):
+    image = tmp_path / "x_001.cbf"
+    image.write_text("header")
+    description = {"path": str(tmp_path / "x_###.cbf"), "format_kwargs": {}}
+
+    cache = MetadataCache(str(tmp_path / "cache" / "metadata.sqlite"))
+    files = file_signature([str(image)])
+    assert cache.get(description, files) is None
+    cache.put(description, files, {"imageset": [1, 2]})
+    assert cache.get(description, files) == {"imageset": [1, 2]}
+    assert len(cache) == 1
+
+    # the cache is shared with other processes through the file
+    cache = MetadataCache(cache.get_filename())
+    assert cache.get(description, files) == {"imageset": [1, 2]}
+    assert cache.get(dict(description, format_kwargs={"a": 1}), files) is None
+
+    # and entries are no longer used once the image files change
+    image.write_text("new header")
+    os.utime(image, ns=(0, 0))
+    assert file_signature([str(image)]) != files
+    assert cache.get(description, file_signature([str(image)])) is None
+
+
+def test_metadata_cache_eviction(tmp_path, monkeypatch):
+    image = tmp_path / "x_001.cbf"
+    image.write_text("header")
+    files = file_signature([str(image)])
+
+    clock = iter(range(100))
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+    cache = MetadataCache(str(tmp_path / "metadata.sqlite"), max_entries=2)
+    cache.put({"path": "a"}, files, 1)
+    cache.put({"path": "b"}, files, 2)
+    # using a makes b the least recently used, which goes to make room for c
+    assert cache.get({"path": "a"}, files) == 1
+    cache.put({"path": "c"}, files, 3)
+    assert len(cache) == 2
+    assert cache.get({"path": "b"}, files) is None
+    assert cache.get({"path": "a"}, files) == 1
+    assert cache.get({"path": "c"}, files) == 3
@@ -1,8 +1,24 @@
 from __future__ import annotations
 
+import copy
+import time
+import tracemalloc
+
+from dials.array_family import flex
+from dxtbx.imageset import ImageSetFactory
 from dxtbx.model import ExperimentList
 
-from xia2.Schema import compare_geometries, load_reference_geometries
+import xia2.Schema.MetadataCache
+from xia2.Handlers.Phil import PhilIndex
+from xia2.Schema import (
+    _ImagesetCache,
+    compare_geometries,
+    imageset_cache,
+    load_imagesets,
+    load_reference_geometries,
+    own_models,
+    share_imageset,
+)
 
 
 def test_load_reference_geometries(dials_data):
@@ -26,3 +42,150 @@ def test_load_reference_geometries(dials_data):
 
     detectors = (geom["detector"] for geom in unique_geometries)
     assert not compare_geometries(*detectors), "Unique detectors cannot be equivalent."
+
+
+def test_imageset_cache_lru(dials_data):
+    experiments = ExperimentList.from_file(
+        dials_data("l_cysteine_dials_output", pathlib=True) / "indexed.expt",
+        check_format=False,
+    )
+    imageset = experiments.imagesets()[0]
+
+    cache = _ImagesetCache(max_size=2)
+    cache.add_imageset("kept", imageset)
+    for template in ("a", "b", "c"):
+        cache[template] = {}
+    # the least recently used template is evicted, but not one which was added
+    # from an experiment list
+    assert list(cache) == ["kept", "b", "c"]
+    cache["b"]
+    cache["d"] = {}
+    assert list(cache) == ["kept", "b", "d"]
+    assert list(cache["kept"].values()) == [imageset]
+
+
+def test_share_imageset(dials_data):
+    experiments = ExperimentList.from_file(
+        dials_data("l_cysteine_dials_output", pathlib=True) / "indexed.expt",
+        check_format=False,
+    )
+    imageset = experiments.imagesets()[0]
+
+    shared = share_imageset(imageset)
+    assert len(shared) == len(imageset)
+    assert shared.get_template() == imageset.get_template()
+    assert shared.get_detector() is imageset.get_detector()
+    assert shared.get_beam() is imageset.get_beam()
+
+    # a model changed in place is copied first, leaving the original alone
+    wavelength = imageset.get_beam().get_wavelength()
+    own_models(shared, "beam")
+    shared.get_beam().set_wavelength(wavelength + 0.1)
+    assert imageset.get_beam().get_wavelength() == wavelength
+    assert shared.get_detector() is imageset.get_detector()
+
+
+def _measure(function, *args):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def test_share_imageset_benchmark(timing_benchmark, dials_data, monkeypatch, tmp_path):
+    """The cost of making the sweeps of a project of 50 sweeps of 3600
+    images, sharing the imagesets with the imageset cache or copying them as
+    they once were."""
+
+    import xia2.Schema
+    from xia2.Handlers.Phil import PhilIndex
+    from xia2.Schema.XCrystal import XCrystal
+    from xia2.Schema.XSample import XSample
+    from xia2.Schema.XSweep import XSweep
+    from xia2.Schema.XWavelength import XWavelength
+
+    experiments = ExperimentList.from_file(
+        dials_data("l_cysteine_dials_output", pathlib=True) / "indexed.expt",
+        check_format=False,
+    )
+    expt = experiments[0]
+    scan = copy.deepcopy(expt.scan)
+    scan.set_image_range((1, 3600))
+    scan.set_exposure_times(flex.double(3600, 0.1))
+    scan.set_epochs(flex.double(range(1, 3601)))
+
+    # the imagesets as read from the images, so that no images are needed
+    monkeypatch.setattr(xia2.Schema, "imageset_cache", _ImagesetCache())
+    for j in range(50):
+        template = "sweep_%d_#####.cbf" % j
+        xia2.Schema.imageset_cache.add_imageset(
+            str(tmp_path / template),
+            ImageSetFactory.make_sequence(
+                str(tmp_path / template),
+                list(range(1, 3601)),
+                beam=expt.beam,
+                detector=expt.detector,
+                goniometer=expt.goniometer,
+                scan=scan,
+                check_format=False,
+            ),
+        )
+    monkeypatch.setattr(PhilIndex.params.general, "check_image_files_readable", False)
+
+    crystal = XCrystal("CRYST1", None)
+    wavelength = XWavelength("WAVE1", crystal, expt.beam.get_wavelength())
+    sample = XSample("X1", crystal)
+
+    def make_sweeps():
+        return [
+            XSweep(
+                "SWEEP%d" % j,
+                wavelength,
+                sample,
+                directory=str(tmp_path),
+                image="sweep_%d_00001.cbf" % j,
+            )
+            for j in range(50)
+        ]
+
+    shared, share_time, share_peak = _measure(make_sweeps)
+    monkeypatch.setattr(xia2.Schema, "share_imageset", copy.deepcopy)
+    copied, copy_time, copy_peak = _measure(make_sweeps)
+    print(
+        "50 sweeps of 3600 images: deepcopy %.3fs %.1f MB, shared %.3fs %.1f MB"
+        % (copy_time, copy_peak / 2**20, share_time, share_peak / 2**20)
+    )
+    assert [len(s.get_imageset()) for s in shared] == [3600] * 50
+    assert [len(s.get_imageset()) for s in copied] == [3600] * 50
+
+
+def test_load_imagesets_metadata_cache(dials_data, tmp_path, monkeypatch):
+    directory = dials_data("centroid_test_data", pathlib=True)
+    template = "centroid_####.cbf"
+    file_signature = xia2.Schema.MetadataCache.file_signature
+    signed = []
+
+    def signature(paths):
+        signed.append(list(paths))
+        return file_signature(paths)
+
+    monkeypatch.setattr(xia2.Schema.MetadataCache, "file_signature", signature)
+    monkeypatch.setattr(
+        imageset_cache,
+        "_metadata_cache",
+        xia2.Schema.MetadataCache.MetadataCache(tmp_path / "metadata.sqlite"),
+    )
+    PhilIndex.update("xia2.settings.read_all_image_headers=False")
+    try:
+        for _ in range(2):
+            imagesets = load_imagesets(template, str(directory), use_cache=False)
+            assert imagesets[0].get_scan().get_image_range() == (1, 9)
+    finally:
+        PhilIndex.update("xia2.settings.read_all_image_headers=True")
+        imageset_cache.pop(str(directory / template), None)
+    # only the image which is read is checked, rather than all of them
+    assert signed == [[str(directory / "centroid_0001.cbf")]] * 2
+    assert len(imageset_cache.get_metadata_cache()) == 1
@@ -132,3 +132,22 @@ def _exercise_serialization(dials_data, tmp_path):
 def test_serialization(regression_test, ccp4, dials_data, run_in_tmp_path):
     with mock.patch.object(sys, "argv", []):
         _exercise_serialization(dials_data, run_in_tmp_path)
+
+
+def test_dict_from_json():
+    from xia2.Schema.XProject import dict_from_json
+
+    obj = dict_from_json(
+        string=json.dumps(
+            {
+                "_name": "SWEEP1",
+                "_epochs": {"1": {"2.5": 1000.5, "-3": "x"}},
+                "NATIVE": 3,
+            }
+        )
+    )
+    assert obj == {
+        "_name": "SWEEP1",
+        "_epochs": {1: {2.5: 1000.5, -3: "x"}},
+        "NATIVE": 3,
+    }
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import subprocess
+import sys
 
 import pytest
 
@@ -145,6 +146,81 @@ def test_dials(regression_test, dials_data, tmp_path, ccp4):
     assert success, issues
 
 
+# run a command, then print the wall time and the peak RSS in kB of the largest
+# process it ran, which is measured for the children of this process alone
+_MEASURE = """
+import resource, subprocess, sys, time
+start = time.perf_counter()
+returncode = subprocess.run(sys.argv[1:]).returncode
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+sys.exit(returncode)
+"""
+
+
+def test_dials_integrate_wedges(regression_test, dials_data, tmp_path, ccp4):
+    """Integrate in wedges of images, which should give the same results as
+    integrating each sweep in one job, reporting the wall time and peak RSS of
+    the two."""
+
+    command_line = [
+        "xia2",
+        "pipeline=dials",
+        "nproc=2",
+        "trust_beam_centre=True",
+        "read_all_image_headers=False",
+        "truncate=cctbx",
+        dials_data("x4wide", pathlib=True),
+    ]
+    wedges = ["dials.integrate.wedges.max_memory=3", "dials.integrate.wedges.overlap=1"]
+
+    benchmark = {}
+    reflections = {}
+    wedge_logs = {}
+    for name, extra in (("one job", []), ("wedges", wedges)):
+        working_directory = tmp_path / name.replace(" ", "_")
+        working_directory.mkdir()
+        result = subprocess.run(
+            [sys.executable, "-c", _MEASURE] + command_line + extra,
+            cwd=working_directory,
+            capture_output=True,
+        )
+        output = result.stdout.decode("latin-1").splitlines()
+        wall_time, peak_rss = output[-1].split()
+        benchmark[name] = (float(wall_time), int(peak_rss) / 1024)
+        mtz_obj = iotbx.mtz.object(
+            str(
+                working_directory
+                / "DataFiles"
+                / "AUTOMATIC_DEFAULT_scaled_unmerged.mtz"
+            )
+        )
+        reflections[name] = mtz_obj.n_reflections()
+        # the log of each wedge is named for its images
+        wedge_logs[name] = list(
+            (working_directory / "LogFiles").glob("*_INTEGRATE_*-*.log")
+        )
+
+    print(
+        "X4_wide: one job %.1fs %.0f MB, wedges %.1fs %.0f MB"
+        % (benchmark["one job"] + benchmark["wedges"])
+    )
+    assert not wedge_logs["one job"]
+    assert len(wedge_logs["wedges"]) > 1
+    assert reflections["wedges"] == pytest.approx(reflections["one job"], rel=0.01)
+    success, issues = xia2.Test.regression.check_result(
+        "X4_wide.dials",
+        result,
+        tmp_path / "wedges",
+        ccp4,
+        expected_data_files=[
+            "AUTOMATIC_DEFAULT_scaled.mtz",
+            "AUTOMATIC_DEFAULT_scaled_unmerged.mtz",
+        ],
+        expected_space_group="P41212",
+    )
+    assert success, issues
+
+
 def test_dials_aimless_split(regression_test, dials_data, tmp_path, ccp4):
     command_line = [
         "xia2",
@@ -5,6 +5,7 @@ import os
 import pathlib
 import shutil
 import subprocess
+import time
 from typing import List
 
 import pytest
@@ -265,6 +266,66 @@ def test_slice_cbfs(dials_data, tmp_path, refined_expt):
     assert images == ["17002", "17003", "17004"]
 
 
+def test_watch_mode(dials_data, tmp_path, refined_expt):
+    """
+    Test processing while the images are still being collected: the first
+    batch is there at the start, and the rest of the images are copied into
+    the data directory one at a time once it has been integrated.
+    """
+    refined_expt.as_file(tmp_path / "refined.expt")
+
+    ssx = dials_data("cunir_serial", pathlib=True)
+    images = sorted(ssx.glob("merlin0047_1700*.cbf"))
+    data = tmp_path / "data"
+    data.mkdir()
+    for image in images[:2]:
+        shutil.copy(image, data)
+
+    args = [
+        "xia2.ssx",
+        "unit_cell=96.4,96.4,96.4,90,90,90",
+        "space_group=P213",
+        "integration.algorithm=stills",
+        f"reference_geometry={os.fspath(tmp_path / 'refined.expt')}",
+        "steps=find_spots+index+integrate",
+        "batch_size=2",
+        "watch.enabled=True",
+        "watch.interval=1",
+        "watch.quiet_period=30",
+        "template=" + os.fspath(data / "merlin0047_1700#.cbf"),
+    ]
+    process = subprocess.Popen(
+        args, cwd=tmp_path, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    integrated = tmp_path / "batch_1" / "integrated_1.expt"
+    deadline = time.monotonic() + 300
+    while not integrated.is_file():
+        assert process.poll() is None, "xia2.ssx finished before batch 1"
+        assert time.monotonic() < deadline, "batch 1 was not integrated in time"
+        time.sleep(0.5)
+    for image in images[2:]:
+        time.sleep(2)
+        shutil.copy(image, data)
+    _, stderr = process.communicate(timeout=600)
+    assert not process.returncode and not stderr
+    check_output(tmp_path, find_spots=True, index=True, integrate=True)
+
+    # the first batch was processed before the last image arrived, and then
+    # xia2.ssx waited for more images rather than finishing
+    assert integrated.stat().st_mtime < (data / images[-1].name).stat().st_mtime
+    log = (tmp_path / "xia2.ssx.log").read_text()
+    assert "2 images imported, 0 awaiting processing; waiting for new images" in log
+
+    # two full batches were processed as the images arrived, then the last
+    # image was processed on its own once collection had finished
+    n_images = [
+        len(load.experiment_list(tmp_path / f"batch_{i}" / "imported.expt"))
+        for i in (1, 2, 3)
+    ]
+    assert n_images == [2, 2, 1]
+    assert not (tmp_path / "batch_4").exists()
+
+
 def test_full_run_without_reference(dials_data, tmp_path):
     ssx = dials_data("cunir_serial", pathlib=True)
 